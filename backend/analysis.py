@@ -0,0 +1,303 @@
+import hashlib
+import json
+import os
+import uuid
+from contextlib import ExitStack
+from git import Repo
+from artifact_store import ArtifactStore
+from budget import Budget, current, limiting
+from cache import CACHE_DIR, DiskCache, MemoryCache, TieredCache
+from detectors import ANALYZER_VERSION
+from git_analyzer import GitArchaeologist
+from git_cmd import git_output
+import metrics
+from metrics import stage, track_request
+from mirror_store import MirrorStore, normalize_url
+from story_generator import StoryGenerator
+
+# Directory to store temporary cloned repos
+TEMP_REPOS_DIR = os.path.join(os.path.dirname(__file__), 'temp_repos')
+os.makedirs(TEMP_REPOS_DIR, exist_ok=True)
+
+# Bare mirrors of remote repositories, refreshed with `git fetch` instead of recloned
+MIRROR_STORE = MirrorStore(
+    os.getenv('MIRROR_DIR', TEMP_REPOS_DIR),
+    max_bytes=int(os.getenv('MIRROR_QUOTA_MB', 10 * 1024)) * 1024 * 1024
+)
+
+# Number of processes used to analyze files during an excavation
+EXCAVATION_WORKERS = int(os.getenv('EXCAVATION_WORKERS', os.cpu_count() or 1))
+
+# Seconds an analysis may run, and each part of its excavation, before returning what it has (0: no limit)
+ANALYSIS_TIME_BUDGET = float(os.getenv('ANALYSIS_TIME_BUDGET', 600))
+STAGE_TIME_BUDGET = float(os.getenv('STAGE_TIME_BUDGET', 180))
+
+# Maximum number of concurrent `git blame` processes per excavation
+BLAME_WORKERS = int(os.getenv('BLAME_WORKERS', 4))
+
+# Per-blob detector findings, reused across excavations of unchanged files
+ANALYSIS_CACHE = DiskCache(
+    os.path.join(CACHE_DIR, 'analysis.db'),
+    max_bytes=int(os.getenv('ANALYSIS_CACHE_MB', 256)) * 1024 * 1024
+)
+
+# Complete /api/analyze responses keyed by repository HEAD
+RESULT_CACHE_TTL = int(os.getenv('RESULT_CACHE_TTL', 24 * 60 * 60))
+RESULT_CACHE = TieredCache(
+    MemoryCache(max_entries=int(os.getenv('RESULT_CACHE_MEMORY_ENTRIES', 32)), ttl=RESULT_CACHE_TTL),
+    DiskCache(
+        os.path.join(CACHE_DIR, 'results.db'),
+        max_bytes=int(os.getenv('RESULT_CACHE_MB', 64)) * 1024 * 1024,
+        ttl=RESULT_CACHE_TTL
+    )
+)
+
+# Every finding of recent analyses, paged through /api/analyses/<id>/artifacts/<category>
+ARTIFACT_STORE = ArtifactStore(
+    os.path.join(CACHE_DIR, 'artifacts.db'),
+    max_analyses=int(os.getenv('ARTIFACT_STORE_ANALYSES', 50))
+)
+
+# Artifact categories that get their own story, in presentation order
+STORY_CATEGORIES = (
+    'dead_code', 'commented_code', 'todos', 'oldest_code', 'hall_of_shame', 'complexity_heatmap', 'duplicate_code'
+)
+
+# Story generation: concurrent requests, per-request timeout in seconds and retries with backoff
+STORY_CONCURRENCY = int(os.getenv('STORY_CONCURRENCY', 4))
+STORY_TIMEOUT = float(os.getenv('STORY_TIMEOUT', 60))
+STORY_RETRIES = int(os.getenv('STORY_RETRIES', 2))
+# Ask for all category stories in a single structured request
+STORY_BATCHED = os.getenv('STORY_BATCHED', '').lower() in ('1', 'true')
+
+# Claude replies keyed by model, token limit and prompt, so unchanged artifacts don't cost a new call
+STORY_CACHE_TTL = int(os.getenv('STORY_CACHE_TTL', 7 * 24 * 60 * 60))
+STORY_CACHE = TieredCache(
+    MemoryCache(max_entries=int(os.getenv('STORY_CACHE_MEMORY_ENTRIES', 256)), ttl=STORY_CACHE_TTL),
+    DiskCache(
+        os.path.join(CACHE_DIR, 'stories.db'),
+        max_bytes=int(os.getenv('STORY_CACHE_MB', 16)) * 1024 * 1024,
+        ttl=STORY_CACHE_TTL
+    )
+)
+
+
+class AnalysisError(Exception):
+    """A problem with the request itself (bad path, failed clone, ...)."""
+
+
+def repo_identity(repo_path=None, repo_url=None):
+    """Normalized name of a repository, so equivalent spellings compare equal."""
+    if repo_url:
+        return normalize_url(repo_url)
+    return os.path.realpath(repo_path)
+
+
+def pathspec_scope(include=None, exclude=None):
+    """Key suffix telling analyses narrowed by pathspecs apart ('' for the whole repository)."""
+    if not include and not exclude:
+        return ''
+    return ':' + json.dumps([sorted(include or []), sorted(exclude or [])])
+
+
+def result_cache_key(repo_path=None, repo_url=None, include=None, exclude=None, ref=None):
+    """
+    Key identifying a repository at its current HEAD commit (or the commit ref
+    points to), or None if the result can't be cached (e.g. a local working
+    tree with uncommitted changes).
+    """
+    if repo_url:
+        # Ask the remote for its HEAD without cloning anything
+        output = git_output(TEMP_REPOS_DIR, 'ls-remote', '--', repo_url, ref or 'HEAD').decode().split()
+        if not output:
+            return None
+        head = output[0]
+    elif ref:
+        # Excavations of a commit don't depend on the working tree
+        head = Repo(repo_path).commit(ref).hexsha
+    else:
+        repo = Repo(repo_path)
+        if repo.is_dirty(untracked_files=True):
+            return None
+        head = repo.head.commit.hexsha
+    return f'response:{ANALYZER_VERSION}:{repo_identity(repo_path, repo_url)}:{head}{pathspec_scope(include, exclude)}'
+
+
+def with_cache_status(result, status):
+    """Copy of a response with the cache status recorded in its metadata."""
+    return {**result, 'metadata': {**result['metadata'], 'cache': status}}
+
+
+def with_timings(result, recorder):
+    """Copy of a response with the timing breakdown of this request in its metadata."""
+    return {**result, 'metadata': {**result['metadata'], 'timings': recorder.to_dict()}}
+
+
+def replay_result(result):
+    """Events describing an already finished analysis."""
+    for category, value in result['artifacts'].items():
+        yield {'event': 'artifact', 'category': category, 'data': value}
+    for key, story in result['stories'].items():
+        yield {'event': 'story', 'key': key, 'data': story}
+    yield {'event': 'result', 'data': result}
+
+
+def iter_analysis(repo_path=None, repo_url=None, refresh=False, include=None, exclude=None, ref=None, stories=True):
+    """
+    Run a full analysis, yielding events as it progresses:
+
+    - {'event': 'status', 'stage': 'cloning' | 'excavating' | 'storytelling'}
+    - {'event': 'artifact', 'category': ..., 'data': ...} as each detector finishes
+    - {'event': 'story', 'key': ..., 'data': ...} as each story is generated
+    - {'event': 'result', 'data': {...}} last, with the complete response
+
+    include/exclude are optional lists of git pathspecs narrowing which files
+    the detectors look at. With a ref (branch, tag or commit) the repository
+    is excavated at that commit, read from the object database without a
+    checkout; remote repositories are always read this way (at HEAD by
+    default). With stories=False no stories are generated (and the story-less
+    result is not cached). Raises AnalysisError for problems with the request
+    itself.
+
+    The response metadata includes a timing breakdown of this request: stage
+    durations, files and bytes scanned, git subprocesses and Claude calls.
+
+    The analysis runs within ANALYSIS_TIME_BUDGET (and each excavation stage
+    within STAGE_TIME_BUDGET), under any budget the caller set, e.g. to be
+    able to cancel it. Stages that run out return what they finished; they
+    are listed in metadata.timed_out, and metadata.truncated tells whether
+    anything (including files too large or slow to analyze) was left out.
+    Such results are not cached.
+    """
+    with track_request() as recorder, limiting(Budget(ANALYSIS_TIME_BUDGET, parent=current())):
+        for event in _iter_analysis(repo_path, repo_url, refresh, include, exclude, ref, stories):
+            if event['event'] == 'result':
+                event = {'event': 'result', 'data': with_timings(event['data'], recorder)}
+            yield event
+
+
+def _iter_analysis(repo_path, repo_url, refresh, include, exclude, ref, with_stories):
+    """The events of iter_analysis, before the timing breakdown is attached."""
+    if not repo_path and not repo_url:
+        raise AnalysisError('Either repo_path or repo_url is required')
+
+    # Serve a previous analysis of the same HEAD if we have one
+    try:
+        cache_key = result_cache_key(repo_path, repo_url, include, exclude, ref)
+    except Exception as e:
+        print(f"Result cache unavailable for this request: {e}")
+        cache_key = None
+
+    # Analyses that can be cached keep a stable id, so a cached response still points at its findings
+    analysis_id = hashlib.sha1(cache_key.encode()).hexdigest()[:16] if cache_key else uuid.uuid4().hex[:16]
+
+    if cache_key and not refresh:
+        cached = RESULT_CACHE.get(cache_key)
+        if cached is not None and ARTIFACT_STORE.totals(analysis_id) is not None:
+            print("Serving cached analysis")
+            yield from replay_result(with_cache_status(cached, 'hit'))
+            return
+
+    # Mirrors in use are protected from eviction until the analysis ends
+    with ExitStack() as cleanup:
+        # If URL provided, bring its mirror up to date and read straight from it
+        if repo_url:
+            yield {'event': 'status', 'stage': 'cloning'}
+            print(f"Syncing mirror of {repo_url}...")
+            try:
+                # Full history is kept in the mirror (needed for timeline/oldest code analysis)
+                with stage('sync'):
+                    repo_path = cleanup.enter_context(MIRROR_STORE.use(repo_url))
+                ref = ref or 'HEAD'
+                print(f"Repository mirrored at {repo_path}")
+            except Exception as e:
+                raise AnalysisError(f'Failed to clone repository: {str(e)}')
+
+        # Validate path exists
+        if not os.path.exists(repo_path):
+            raise AnalysisError(f'Repository path does not exist: {repo_path}')
+
+        # Check if it's a git repository
+        try:
+            repo = Repo(repo_path)
+        except Exception as e:
+            raise AnalysisError(f'Not a valid git repository: {str(e)}')
+
+        if ref:
+            try:
+                repo.commit(ref)
+            except Exception:
+                raise AnalysisError(f'Unknown ref: {ref}')
+
+        print(f"Starting excavation of {repo_path}...")
+        yield {'event': 'status', 'stage': 'excavating'}
+
+        # Run archaeological analysis, passing on each category as it is dug up
+        archaeologist = GitArchaeologist(
+            repo_path, workers=EXCAVATION_WORKERS, cache=ANALYSIS_CACHE, blame_workers=BLAME_WORKERS,
+            include=include, exclude=exclude, rev=ref, stage_seconds=STAGE_TIME_BUDGET
+        )
+        artifacts = {}
+        for category, value in archaeologist.iter_excavate():
+            artifacts[category] = value
+            yield {'event': 'artifact', 'category': category, 'data': value}
+
+        budget = current()
+        stories = {}
+        failures = 0
+        if with_stories and budget.expired():
+            budget.timed_out.append('stories')
+        elif with_stories:
+            # Generate AI stories
+            print("Generating AI narratives...")
+            yield {'event': 'status', 'stage': 'storytelling'}
+            story_gen = StoryGenerator(
+                max_concurrency=STORY_CONCURRENCY, timeout=STORY_TIMEOUT, max_retries=STORY_RETRIES,
+                batched=STORY_BATCHED, cache=STORY_CACHE
+            )
+            with stage('stories'):
+                for key, story in story_gen.iter_stories(artifacts, STORY_CATEGORIES):
+                    stories[key] = story
+                    yield {'event': 'story', 'key': key, 'data': story}
+            # Stories finish in any order; keep the response in presentation order
+            story_keys = ['excavation_summary'] + [f'{category}_story' for category in STORY_CATEGORIES]
+            stories = {key: stories[key] for key in story_keys}
+            failures = story_gen.failures
+
+        skipped = {
+            name[len('files_skipped_'):]: count
+            for name, count in metrics.current().counters.items() if name.startswith('files_skipped_')
+        }
+
+        # Combine artifacts and stories
+        result = {
+            'artifacts': artifacts,
+            'stories': stories,
+            'metadata': {
+                'repo_path': repo_path,
+                'commit': archaeologist.rev,
+                'total_artifacts': sum(len(v) if isinstance(v, list) else 0 for v in artifacts.values()),
+                # Every finding stays on the server; the response only has the top ones
+                'analysis_id': analysis_id,
+                'artifact_totals': ARTIFACT_STORE.save(analysis_id, archaeologist.complete),
+                # Parts of the analysis cut short by its time budget, or by cancellation
+                'timed_out': budget.timed_out,
+                'cancelled': budget.cancelled,
+                'skipped_files': skipped,
+                'truncated': bool(budget.timed_out or skipped)
+            }
+        }
+
+        print("Analysis complete!")
+
+        # Don't keep results without stories, whose stories fell back to placeholder text, or cut short
+        if cache_key and with_stories and failures == 0 and not budget.timed_out:
+            RESULT_CACHE.set(cache_key, result)
+        yield {'event': 'result', 'data': with_cache_status(result, 'miss' if cache_key else 'bypass')}
+
+
+def run_analysis(repo_path=None, repo_url=None, refresh=False, include=None, exclude=None, ref=None, stories=True):
+    """Run a full analysis and return the complete response."""
+    for event in iter_analysis(repo_path, repo_url, refresh, include, exclude, ref, stories):
+        if event['event'] == 'result':
+            return event['data']
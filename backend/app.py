@@ -1,19 +1,114 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
+import gzip
+import json
 import os
-import tempfile
-import shutil
-import traceback
-from git import Repo
-from git_analyzer import GitArchaeologist
-from story_generator import StoryGenerator
+import time
+from analysis import (
+    ANALYSIS_CACHE,
+    ARTIFACT_STORE,
+    MIRROR_STORE,
+    RESULT_CACHE,
+    STORY_CACHE,
+    AnalysisError,
+    pathspec_scope,
+    repo_identity,
+)
+from jobs import JobManager
+from metrics import HTTP_SECONDS, REGISTRY
+
+try:
+    import msgpack
+except ImportError:
+    # Optional: without it every response is JSON
+    msgpack = None
 
 app = Flask(__name__)
 CORS(app)
 
-# Directory to store temporary cloned repos
-TEMP_REPOS_DIR = os.path.join(os.path.dirname(__file__), 'temp_repos')
-os.makedirs(TEMP_REPOS_DIR, exist_ok=True)
+# Responses smaller than this are not worth compressing
+GZIP_MIN_BYTES = 1024
+
+# Background analyses: a fixed number run at once, finished ones are kept for a while
+JOB_MANAGER = JobManager(
+    max_workers=int(os.getenv('JOB_WORKERS', 2)),
+    max_finished=int(os.getenv('JOB_RETENTION_COUNT', 100)),
+    retention_seconds=int(os.getenv('JOB_RETENTION_SECONDS', 60 * 60))
+)
+
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+
+
+@app.after_request
+def record_request_time(response):
+    """Observe each request once its response is closed, so streamed analyses are timed in full."""
+    started = g.get('started')
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        method, status = request.method, response.status_code
+        response.call_on_close(
+            lambda: HTTP_SECONDS.observe(time.perf_counter() - started, method=method, endpoint=endpoint, status=status)
+        )
+    return response
+
+
+def encoded(payload, status=200):
+    """
+    Response for payload in the best encoding the client accepts: msgpack
+    (when installed) or JSON, gzip-compressed if the client allows it.
+    """
+    if msgpack is not None and request.accept_mimetypes.best_match(['application/json', 'application/msgpack']) == 'application/msgpack':
+        body, mimetype = msgpack.packb(payload), 'application/msgpack'
+    else:
+        body, mimetype = json.dumps(payload).encode(), 'application/json'
+
+    response = Response(body, status=status, mimetype=mimetype)
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    if len(body) >= GZIP_MIN_BYTES and request.accept_encodings['gzip']:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def analysis_params():
+    """Analysis parameters from the JSON body of an analyze request."""
+    data = request.json or {}
+    params = {
+        'repo_path': data.get('repo_path'),
+        'repo_url': data.get('repo_url'),
+        'refresh': bool(data.get('refresh')) or request.args.get('refresh') in ('1', 'true'),
+        'include': data.get('include'),
+        'exclude': data.get('exclude'),
+        'ref': data.get('ref')
+    }
+    if not params['repo_path'] and not params['repo_url']:
+        raise AnalysisError('Either repo_path or repo_url is required')
+    for name in ('include', 'exclude'):
+        patterns = params[name]
+        if patterns is not None and not (isinstance(patterns, list) and all(isinstance(p, str) for p in patterns)):
+            raise AnalysisError(f'{name} must be a list of pathspecs')
+    url = params['repo_url']
+    if url is not None and not (isinstance(url, str) and url[:1] != '-' and not url.lower().startswith('ext::')):
+        # Would be read by git as an option, or run a command through the ext transport
+        raise AnalysisError('repo_url must be a repository URL')
+    if params['ref'] is not None and not (isinstance(params['ref'], str) and params['ref'] and params['ref'][0] != '-'):
+        raise AnalysisError('ref must be a branch, tag or commit name')
+    return params
+
+
+def submit_analysis(params):
+    """
+    Queue an analysis on the job pool, so at most JOB_WORKERS excavations run
+    at once however they were requested. Returns (job, created); a request for
+    a repository already being analyzed joins that job.
+    """
+    key = repo_identity(params['repo_path'], params['repo_url']) + pathspec_scope(params['include'], params['exclude'])
+    if params['ref']:
+        key += f"@{params['ref']}"
+    return JOB_MANAGER.submit(key, **params)
 
 
 @app.route('/api/health', methods=['GET'])
@@ -29,105 +124,202 @@ def analyze_repository():
 
     Expected JSON body:
     {
-        "repo_path": "/path/to/repo" OR "repo_url": "https://github.com/user/repo"
+        "repo_path": "/path/to/repo" OR "repo_url": "https://github.com/user/repo",
+        "refresh": false,  (optional; bypass the result cache, also accepted as ?refresh=1)
+        "include": ["src/"],  (optional; git pathspecs of the files to analyze)
+        "exclude": ["*.min.js"],  (optional; git pathspecs of files to leave out)
+        "ref": "v1.0"  (optional; branch, tag or commit to excavate instead of the working tree)
     }
     """
-    temp_dir = None  # Track temp directory for cleanup
+    try:
+        job, _ = submit_analysis(analysis_params())
+    except AnalysisError as e:
+        return jsonify({'error': str(e)}), 400
+
+    job.wait()
+    if job.status == 'failed':
+        return jsonify({'error': job.error}), 400 if job.error_type == 'request' else 500
+    if job.result is None:
+        return jsonify({'error': 'Analysis was cancelled before it started'}), 409
+    return encoded(job.result)
+
+
+@app.route('/api/analyze/stream', methods=['POST'])
+def analyze_repository_stream():
+    """
+    Analyze a git repository, streaming each artifact category and story as
+    soon as it is ready.
 
+    Takes the same JSON body as /api/analyze. Responds with newline-delimited
+    JSON events, or Server-Sent Events if the client accepts text/event-stream:
+    status, artifact (one per category), story (one per story), metadata, then
+    done. Failures are reported as an error event.
+
+    The analysis runs as a job on the shared pool; the stream follows it, and
+    a job already running for the repository is replayed from its start.
+    """
     try:
-        data = request.json
-        repo_path = data.get('repo_path')
-        repo_url = data.get('repo_url')
-
-        if not repo_path and not repo_url:
-            return jsonify({'error': 'Either repo_path or repo_url is required'}), 400
-
-        # If URL provided, clone it
-        if repo_url:
-            print(f"Cloning repository from {repo_url}...")
-            # Create a unique temp directory for this repo
-            temp_dir = tempfile.mkdtemp(dir=TEMP_REPOS_DIR)
-            try:
-                # Full clone to get history (needed for timeline/oldest code analysis)
-                print("This may take a minute for large repositories...")
-                Repo.clone_from(repo_url, temp_dir)
-                repo_path = temp_dir
-                print(f"Repository cloned to {temp_dir}")
-            except Exception as e:
-                shutil.rmtree(temp_dir, ignore_errors=True)
-                return jsonify({'error': f'Failed to clone repository: {str(e)}'}), 400
-
-        # Validate path exists
-        if not os.path.exists(repo_path):
-            return jsonify({'error': f'Repository path does not exist: {repo_path}'}), 400
-
-        # Check if it's a git repository
-        try:
-            test_repo = Repo(repo_path)
-        except Exception as e:
-            return jsonify({'error': f'Not a valid git repository: {str(e)}'}), 400
-
-        print(f"Starting excavation of {repo_path}...")
-
-        # Run archaeological analysis
-        archaeologist = GitArchaeologist(repo_path)
-        artifacts = archaeologist.excavate()
-
-        # Generate AI stories
-        print("Generating AI narratives...")
-        story_gen = StoryGenerator()
-
-        # Generate stories for each artifact type
-        stories = {
-            'excavation_summary': story_gen.generate_excavation_summary(artifacts),
-            'dead_code_story': story_gen.generate_artifact_story('dead_code', artifacts['dead_code']),
-            'commented_code_story': story_gen.generate_artifact_story('commented_code', artifacts['commented_code']),
-            'todos_story': story_gen.generate_artifact_story('todos', artifacts['todos']),
-            'oldest_code_story': story_gen.generate_artifact_story('oldest_code', artifacts['oldest_code']),
-            'hall_of_shame_story': story_gen.generate_artifact_story('hall_of_shame', artifacts['hall_of_shame']),
-            'complexity_heatmap_story': story_gen.generate_artifact_story('complexity_heatmap', artifacts['complexity_heatmap'])
-        }
-
-        # Combine artifacts and stories
-        result = {
-            'artifacts': artifacts,
-            'stories': stories,
-            'metadata': {
-                'repo_path': repo_path,
-                'total_artifacts': sum(len(v) if isinstance(v, list) else 0 for v in artifacts.values())
-            }
-        }
-
-        print("Analysis complete!")
-
-        # Clean up temp directory if it was created
-        if temp_dir and os.path.exists(temp_dir):
-            print(f"Cleaning up temporary repository at {temp_dir}...")
-            shutil.rmtree(temp_dir, ignore_errors=True)
-            print("Cleanup complete!")
-
-        return jsonify(result)
+        job, _ = submit_analysis(analysis_params())
+    except AnalysisError as e:
+        return jsonify({'error': str(e)}), 400
+
+    sse = request.accept_mimetypes.best_match(['application/x-ndjson', 'text/event-stream']) == 'text/event-stream'
+
+    def encode(event):
+        if sse:
+            return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+        return json.dumps(event) + '\n'
+
+    def generate():
+        for event in job.iter_events():
+            if event['event'] == 'result':
+                # Artifacts and stories have already been sent
+                event = {'event': 'metadata', 'data': event['data']['metadata']}
+            yield encode(event)
+        if job.status == 'failed':
+            yield encode({'event': 'error', 'error': job.error})
+        elif job.result is None:
+            yield encode({'event': 'error', 'error': 'Analysis was cancelled before it started'})
+        else:
+            yield encode({'event': 'done'})
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream' if sse else 'application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
-    except Exception as e:
-        print(f"Error during analysis: {str(e)}")
-        traceback.print_exc()
 
-        # Clean up temp directory even on error
-        if temp_dir and os.path.exists(temp_dir):
-            print(f"Cleaning up temporary repository at {temp_dir}...")
-            shutil.rmtree(temp_dir, ignore_errors=True)
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queue an analysis and return its job id right away.
+
+    Takes the same JSON body as /api/analyze. If the same repository is
+    already being analyzed, the existing job is returned instead.
+    """
+    try:
+        job, created = submit_analysis(analysis_params())
+    except AnalysisError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({**job.to_dict(), 'deduplicated': not created}), 202
+
+
+@app.route('/api/jobs', methods=['GET'])
+def job_stats():
+    """Number of analysis jobs queued, running and finished (among those still kept)."""
+    return jsonify(JOB_MANAGER.stats())
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Status and progress of an analysis job."""
+    job = JOB_MANAGER.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """The full analysis response once the job has finished (202 while it is still running)."""
+    job = JOB_MANAGER.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    if not job.finished:
+        return jsonify(job.to_dict()), 202
+    if job.status == 'failed':
+        return jsonify({'error': job.error}), 400 if job.error_type == 'request' else 500
+    if job.result is None:
+        return jsonify({'error': 'Job was cancelled before it started'}), 409
+    return encoded(job.result)
+
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """
+    Cancel an analysis job. A running analysis stops at its next check and
+    its partial result (metadata.cancelled) can still be fetched.
+    """
+    job = JOB_MANAGER.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    return jsonify(job.to_dict()), 202
+
 
-        return jsonify({'error': f'Analysis failed: {str(e)}'}), 500
+@app.route('/api/analyses/<analysis_id>/artifacts', methods=['GET'])
+def artifact_totals(analysis_id):
+    """Number of findings kept for each category of an analysis."""
+    totals = ARTIFACT_STORE.totals(analysis_id)
+    if totals is None:
+        return jsonify({'error': 'Unknown or expired analysis'}), 404
+    return jsonify({'analysis_id': analysis_id, 'totals': totals})
+
+
+@app.route('/api/analyses/<analysis_id>/artifacts/<category>', methods=['GET'])
+def artifact_page(analysis_id, category):
+    """
+    One page of every finding of a category, in rank order.
+
+    Query parameters (all optional):
+        cursor: next_cursor of the previous page
+        limit: findings per page (default 100, at most 1000)
+        prefix: only files under this path
+        min_score: only findings scoring at least this much (complexity_heatmap,
+                   hotspots; function length for hall_of_shame)
+    """
+    totals = ARTIFACT_STORE.totals(analysis_id)
+    if totals is None:
+        return jsonify({'error': 'Unknown or expired analysis'}), 404
+    if category not in totals:
+        return jsonify({'error': f'Unknown category: {category}'}), 404
+
+    try:
+        cursor = request.args.get('cursor')
+        cursor = int(cursor) if cursor else None
+        limit = min(max(int(request.args.get('limit', 100)), 1), 1000)
+        min_score = request.args.get('min_score')
+        min_score = float(min_score) if min_score else None
+    except ValueError:
+        return jsonify({'error': 'cursor and limit must be integers, min_score a number'}), 400
+
+    page = ARTIFACT_STORE.page(analysis_id, category, cursor, limit, request.args.get('prefix'), min_score)
+    return encoded({'analysis_id': analysis_id, 'category': category, **page})
+
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss counters and sizes of the result, per-file analysis and story caches."""
+    return jsonify({
+        'results': RESULT_CACHE.stats(),
+        'analysis': ANALYSIS_CACHE.stats(),
+        'stories': STORY_CACHE.stats(),
+        'mirrors': MIRROR_STORE.stats()
+    })
+
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Request, analysis stage, git, scan and Claude API metrics in the Prometheus text format."""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/api/cleanup', methods=['POST'])
 def cleanup_temp_repos():
-    """Clean up temporary cloned repositories."""
+    """
+    Clean up repository mirrors.
+
+    Idle mirrors are evicted least recently used first until the store is
+    within its disk quota; pass ?all=1 to evict every idle mirror.
+    """
     try:
-        if os.path.exists(TEMP_REPOS_DIR):
-            shutil.rmtree(TEMP_REPOS_DIR)
-            os.makedirs(TEMP_REPOS_DIR)
-        return jsonify({'message': 'Temporary repositories cleaned up'})
+        evict_all = request.args.get('all') in ('1', 'true')
+        evicted = MIRROR_STORE.evict(max_bytes=0 if evict_all else None)
+        return jsonify({
+            'message': 'Temporary repositories cleaned up',
+            'evicted': evicted,
+            'mirrors': MIRROR_STORE.stats()
+        })
     except Exception as e:
         return jsonify({'error': f'Cleanup failed: {str(e)}'}), 500
 
@@ -0,0 +1,110 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+# Value each category can be filtered on with min_score (categories without one can't be)
+SCORE_FIELDS = {
+    'complexity_heatmap': 'score',
+    'hotspots': 'score',
+    'hall_of_shame': 'length',
+    'duplicate_code': 'duplicated_lines',
+    'oldest_files': 'age_days',
+}
+
+
+class ArtifactStore:
+    """
+    Every finding of recent analyses, served a page at a time.
+
+    Responses only carry the top findings of each category; the complete
+    ranked lists are kept here, one SQLite row per finding, so pages can be
+    read with an indexed range query instead of loading a whole category.
+    Pages are addressed by a cursor (the position of the last finding
+    returned) and can be filtered by file prefix and minimum score. Only the
+    max_analyses most recently saved analyses are kept.
+    """
+
+    def __init__(self, path, max_analyses=50):
+        self.path = path
+        self.max_analyses = max_analyses
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS analyses (id TEXT PRIMARY KEY, created REAL NOT NULL, totals TEXT NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS findings ('
+                'analysis TEXT NOT NULL, category TEXT NOT NULL, position INTEGER NOT NULL, '
+                'file TEXT NOT NULL, score REAL, data TEXT NOT NULL, '
+                'PRIMARY KEY (analysis, category, position)) WITHOUT ROWID'
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def save(self, analysis_id, collections):
+        """Store {category: ranked findings} under analysis_id, replacing anything stored there before."""
+        totals = {category: len(findings) for category, findings in collections.items()}
+
+        def rows():
+            for category, findings in collections.items():
+                field = SCORE_FIELDS.get(category)
+                for position, finding in enumerate(findings):
+                    yield (
+                        analysis_id, category, position, finding.get('file', '').lstrip('/'),
+                        finding.get(field) if field else None, json.dumps(finding)
+                    )
+
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM findings WHERE analysis = ?', (analysis_id,))
+            conn.execute(
+                'INSERT OR REPLACE INTO analyses (id, created, totals) VALUES (?, ?, ?)',
+                (analysis_id, time.time(), json.dumps(totals))
+            )
+            conn.executemany('INSERT INTO findings VALUES (?, ?, ?, ?, ?, ?)', rows())
+
+            stale = [row[0] for row in conn.execute(
+                'SELECT id FROM analyses ORDER BY created DESC LIMIT -1 OFFSET ?', (self.max_analyses,)
+            )]
+            for stale_id in stale:
+                conn.execute('DELETE FROM findings WHERE analysis = ?', (stale_id,))
+                conn.execute('DELETE FROM analyses WHERE id = ?', (stale_id,))
+        return totals
+
+    def totals(self, analysis_id):
+        """Number of findings per category of an analysis, or None if it isn't stored."""
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT totals FROM analyses WHERE id = ?', (analysis_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def page(self, analysis_id, category, cursor=None, limit=100, prefix=None, min_score=None):
+        """
+        Up to limit findings of a category in rank order, after the cursor of a
+        previous page. Returns {items, next_cursor, total}: next_cursor is None
+        on the last page, and total counts every finding matching the filters.
+        """
+        conditions = ['analysis = ?', 'category = ?']
+        params = [analysis_id, category]
+        if prefix:
+            prefix = prefix.lstrip('/')
+            conditions.append('substr(file, 1, ?) = ?')
+            params += [len(prefix), prefix]
+        if min_score is not None:
+            conditions.append('score >= ?')
+            params.append(min_score)
+        where = ' AND '.join(conditions)
+
+        with closing(self._connect()) as conn:
+            total = conn.execute(f'SELECT COUNT(*) FROM findings WHERE {where}', params).fetchone()[0]
+            rows = conn.execute(
+                f'SELECT position, data FROM findings WHERE {where} AND position > ? ORDER BY position LIMIT ?',
+                params + [-1 if cursor is None else cursor, limit + 1]
+            ).fetchall()
+
+        next_cursor = str(rows[limit - 1][0]) if len(rows) > limit else None
+        return {'items': [json.loads(data) for _, data in rows[:limit]], 'next_cursor': next_cursor, 'total': total}
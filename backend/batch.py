@@ -0,0 +1,160 @@
+"""
+Excavate many repositories in parallel, appending one JSON line per repository.
+
+The manifest lists one repository per line: a local path, a remote URL, or a
+JSON object with the /api/analyze parameters (repo_path or repo_url, and
+optionally include, exclude and ref). Blank lines and lines starting with #
+are ignored.
+
+Repositories whose HEAD (or ref) is unchanged since they were last recorded
+successfully in the output file are skipped, so an interrupted or nightly run
+can simply be started again. Stories are only generated with --stories.
+
+Usage: python batch.py manifest.txt [--output results.jsonl] [--concurrency N]
+                                    [--workers N] [--stories] [--refresh]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import analysis
+from analysis import MIRROR_STORE, AnalysisError, repo_identity, result_cache_key, run_analysis
+
+
+def read_manifest(path):
+    """Analysis parameters (repo_path or repo_url, include, exclude, ref) for each manifest entry."""
+    entries = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                entry = json.loads(line)
+            elif '://' in line or line.startswith('git@'):
+                entry = {'repo_url': line}
+            else:
+                entry = {'repo_path': os.path.abspath(os.path.expanduser(line))}
+            entries.append({name: entry.get(name) for name in ('repo_path', 'repo_url', 'include', 'exclude', 'ref')})
+    return entries
+
+
+def recorded_keys(output):
+    """Result cache keys (repository, commit and scope) of every successful record in the output file."""
+    keys = set()
+    if not os.path.exists(output):
+        return keys
+    with open(output) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A line cut short by an interrupted run
+            if record.get('status') == 'ok' and record.get('key'):
+                keys.add(record['key'])
+    return keys
+
+
+def _init_worker(workers):
+    # Split the machine between the repositories being excavated at once
+    analysis.EXCAVATION_WORKERS = workers
+
+
+def excavate(repo_path, include, exclude, ref, stories, refresh=False):
+    """Run one analysis in a pool process; refresh bypasses any cached response."""
+    return run_analysis(
+        repo_path=repo_path, include=include, exclude=exclude, ref=ref, stories=stories, refresh=refresh
+    )
+
+
+def _excavate_entry(entry, processes, stories, done, refresh):
+    """Excavate one manifest entry; returns its record, or None if it is unchanged since the last run."""
+    name = entry['repo_url'] or entry['repo_path']
+    record = {'repo': name, 'include': entry['include'], 'exclude': entry['exclude'], 'ref': entry['ref']}
+    start = time.time()
+    try:
+        key = result_cache_key(**entry)
+    except Exception:
+        key = None  # Unreachable remote or bad ref; the analysis reports the details
+    if key and key in done and not refresh:
+        return None
+    record['key'] = key
+
+    try:
+        if entry['repo_url']:
+            # Mirrors are synced in this process, which owns the store, and protected until the analysis ends
+            with MIRROR_STORE.use(entry['repo_url']) as mirror:
+                result = processes.submit(
+                    excavate, mirror, entry['include'], entry['exclude'], entry['ref'] or 'HEAD', stories, refresh
+                ).result()
+            result['metadata']['repo_path'] = entry['repo_url']
+        else:
+            result = processes.submit(
+                excavate, entry['repo_path'], entry['include'], entry['exclude'], entry['ref'], stories, refresh
+            ).result()
+        record.update(status='ok', result=result)
+    except AnalysisError as e:
+        record.update(status='failed', error=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        record.update(status='failed', error=f'Analysis failed: {str(e)}')
+
+    record['seconds'] = round(time.time() - start, 3)
+    return record
+
+
+def run_batch(entries, output, concurrency=4, workers=None, stories=False, refresh=False):
+    """
+    Excavate the manifest entries, at most concurrency at once in separate
+    processes, appending each record to the output JSONL file as soon as its
+    repository finishes. Returns the number of records written.
+    """
+    done = recorded_keys(output)
+    workers = workers or max((os.cpu_count() or 1) // concurrency, 1)
+
+    # Each identical entry is excavated once
+    unique = {}
+    for entry in entries:
+        scope = analysis.pathspec_scope(entry['include'], entry['exclude'])
+        unique.setdefault(repo_identity(entry['repo_path'], entry['repo_url']) + scope + f"@{entry['ref']}", entry)
+
+    written = 0
+    # Spawned workers don't inherit this process's threads and locks
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(concurrency, mp_context=context, initializer=_init_worker, initargs=(workers,)) as processes, \
+            ThreadPoolExecutor(concurrency) as threads, open(output, 'a') as out:
+        futures = [threads.submit(_excavate_entry, entry, processes, stories, done, refresh) for entry in unique.values()]
+        for future in as_completed(futures):
+            record = future.result()
+            if record is None:
+                continue
+            out.write(json.dumps(record) + '\n')
+            out.flush()
+            written += 1
+            print(f"{record['status']:>6}  {record['repo']} ({record['seconds']}s){'  ' + record['error'] if record.get('error') else ''}")
+
+    print(f"{written} repositories excavated, {len(unique) - written} unchanged since the last run")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Excavate many repositories in parallel')
+    parser.add_argument('manifest', help='File listing one repository path, URL or JSON object per line')
+    parser.add_argument('--output', default='excavations.jsonl', help='JSONL file results are appended to')
+    parser.add_argument('--concurrency', type=int, default=int(os.getenv('BATCH_CONCURRENCY', 4)),
+                        help='Repositories excavated at once, each in its own process')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='File analysis processes per repository (default: CPUs / concurrency)')
+    parser.add_argument('--stories', action='store_true', help='Also generate the Claude stories')
+    parser.add_argument('--refresh', action='store_true', help='Excavate repositories even if unchanged')
+    args = parser.parse_args()
+
+    run_batch(read_manifest(args.manifest), args.output, args.concurrency, args.workers, args.stories, args.refresh)
+
+
+if __name__ == '__main__':
+    main()
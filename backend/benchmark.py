@@ -0,0 +1,296 @@
+"""
+Benchmark GitArchaeologist on a deterministic synthetic repository.
+
+Generates a repository with N files and M commits (configurable language mix
+and file sizes), times each analysis method and a full excavate(), and
+reports wall time, peak Python memory and files/sec. Results can be saved as
+a baseline; --check fails (exit status 1) when a benchmark is slower or uses
+more memory than its baseline beyond the tolerance. --compare-workers N also
+times the shared content scan serially and with N worker processes, and
+checks both give identical results.
+
+Usage:
+    python benchmark.py [--files N] [--commits M] [--languages py=6,js=3,java=1]
+                        [--lines MIN:MAX] [--seed S] [--workers W] [--repeat R]
+                        [--save-baseline | --check] [--baseline PATH] [--tolerance T]
+                        [--repo PATH] [--compare-workers N]
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from detectors import CONTENT_DETECTORS
+from git_analyzer import GitArchaeologist
+from scanner import iter_files
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+# Analyses timed on their own, then the whole dig
+METHODS = (
+    'find_dead_code',
+    'find_commented_code',
+    'find_todos',
+    'find_oldest_code',
+    'find_oldest_files',
+    'get_hall_of_shame',
+    'analyze_complexity_heatmap',
+    'find_duplicate_code',
+    'find_hotspots',
+    'get_repository_timeline',
+    'analyze_complexity_history',
+    'excavate',
+)
+
+# File extension per language of the synthetic repository
+EXTENSIONS = {'py': '.py', 'js': '.js', 'ts': '.ts', 'java': '.java'}
+
+# First commit of the synthetic history; commits are an hour apart
+EPOCH = 1500000000
+
+
+def _python_function(rng, name):
+    lines = [f'def {name}(items, limit):']
+    if rng.random() < 0.3:
+        lines.append('    # TODO: handle an empty list')
+    lines.append('    total = 0')
+    for i in range(rng.randint(1, 6)):
+        lines.append('    for item in items:')
+        lines.append(f'        if item > limit and item % {i + 2}:')
+        lines.append(f'            total += item * {i}')
+    if rng.random() < 0.2:
+        lines.append('    # total = sum(items) / len(items)')
+    lines.append('    return total')
+    return lines
+
+
+def _c_family_function(rng, name, language):
+    signature = {'js': f'function {name}(items, limit) {{', 'ts': f'function {name}(items: number[], limit: number) {{',
+                 'java': f'    public int {name}(int[] items, int limit) {{'}[language]
+    lines = [signature]
+    if rng.random() < 0.3:
+        lines.append('  // FIXME: this ignores negative items')
+    lines.append('  let total = 0;' if language != 'java' else '        int total = 0;')
+    for i in range(rng.randint(1, 6)):
+        lines.append('  for (const item of items) {' if language != 'java' else '        for (int item : items) {')
+        lines.append(f'    if (item > limit && item % {i + 2}) {{ total += item * {i}; }}')
+        lines.append('  }')
+    if rng.random() < 0.2:
+        lines.append('  // total = items.reduce((a, b) => a + b, 0);')
+    lines.append('  return total;')
+    lines.append('}' if language != 'java' else '    }')
+    return lines
+
+
+def synthetic_file(rng, language, line_count, index):
+    """Source text of about line_count lines in the given language."""
+    lines = []
+    if language == 'java':
+        lines.append(f'public class Module{index} {{')
+    function = 0
+    while len(lines) < line_count:
+        name = f'compute_{index}_{function}'
+        if language == 'py':
+            lines.extend(_python_function(rng, name))
+        else:
+            lines.extend(_c_family_function(rng, name, language))
+        lines.append('')
+        function += 1
+    if language == 'java':
+        lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+def _parse_languages(spec):
+    """'py=6,js=3' -> (('py', 6.0), ('js', 3.0))"""
+    mix = []
+    for part in spec.split(','):
+        language, _, weight = part.partition('=')
+        if language not in EXTENSIONS:
+            raise ValueError(f'Unknown language: {language}')
+        mix.append((language, float(weight or 1)))
+    return tuple(mix)
+
+
+def generate_repo(path, files=200, commits=100, languages='py=6,js=3,java=1', lines=(20, 400), seed=0):
+    """
+    Create a deterministic synthetic repository at path and return its HEAD SHA.
+
+    The first commit adds every file; each later commit rewrites a few files.
+    Authors, dates and content all derive from the seed, so the same arguments
+    always produce the same commits. History is written with one
+    `git fast-import` rather than one commit at a time.
+    """
+    rng = random.Random(seed)
+    mix = _parse_languages(languages)
+    names = [language for language, _ in mix]
+    weights = [weight for _, weight in mix]
+
+    paths = []
+    for index in range(files):
+        language = rng.choices(names, weights)[0]
+        paths.append((f'src/pkg{index % 20}/module{index}{EXTENSIONS[language]}', language, index))
+
+    stream = []
+    for number in range(commits):
+        author = f'Author {rng.randrange(12)} <author{number % 12}@example.com> {EPOCH + number * 3600} +0000'
+        message = f'Commit {number}'.encode()
+        stream.append(f'commit refs/heads/main\nauthor {author}\ncommitter {author}\ndata {len(message)}\n'.encode() + message + b'\n')
+        changed = paths if number == 0 else rng.sample(paths, min(len(paths), rng.randint(1, 5)))
+        for file_path, language, index in changed:
+            data = synthetic_file(rng, language, rng.randint(*lines), index).encode()
+            stream.append(f'M 100644 inline {file_path}\ndata {len(data)}\n'.encode() + data + b'\n')
+
+    subprocess.run(['git', 'init', '-q', '-b', 'main', path], check=True)
+    subprocess.run(['git', '-C', path, 'fast-import', '--quiet'], input=b''.join(stream), check=True)
+    subprocess.run(['git', '-C', path, 'reset', '-q', '--hard', 'main'], check=True)
+    return subprocess.run(['git', '-C', path, 'rev-parse', 'HEAD'], capture_output=True, check=True).stdout.decode().strip()
+
+
+def measure(repo_path, method, workers=None, repeat=1):
+    """Best wall time over repeat runs, then peak traced memory (MB) of one more run."""
+    best = None
+    for _ in range(repeat):
+        archaeologist = GitArchaeologist(repo_path, workers=workers)
+        start = time.perf_counter()
+        getattr(archaeologist, method)()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # Tracing slows Python down, so memory gets a run of its own
+    archaeologist = GitArchaeologist(repo_path, workers=workers)
+    tracemalloc.start()
+    try:
+        getattr(archaeologist, method)()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak / 1e6
+
+
+def run_benchmarks(repo_path, workers=None, repeat=1, methods=METHODS):
+    """Return {method: {seconds, peak_mb, files_per_sec}}."""
+    file_count = sum(1 for _ in iter_files(repo_path))
+    results = {}
+    for method in methods:
+        seconds, peak_mb = measure(repo_path, method, workers, repeat)
+        results[method] = {
+            'seconds': round(seconds, 4),
+            'peak_mb': round(peak_mb, 2),
+            'files_per_sec': round(file_count / seconds, 1) if seconds else None
+        }
+    return results
+
+
+def compare_workers(repo_path, workers, repeat=1):
+    """
+    Best wall time of the shared content scan run serially and with workers
+    processes, and whether both found the same artifacts:
+    (serial seconds, parallel seconds, identical).
+    """
+    timings = []
+    results = []
+    for count in (None, workers):
+        best = None
+        for _ in range(repeat):
+            archaeologist = GitArchaeologist(repo_path, workers=count)
+            start = time.perf_counter()
+            scanned = archaeologist._scan(*(detector() for detector in CONTENT_DETECTORS))
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings.append(best)
+        results.append(scanned)
+    return timings[0], timings[1], results[0] == results[1]
+
+
+def regressions(results, baseline, tolerance=0.5):
+    """Messages for every benchmark slower or larger than its baseline by more than tolerance (0.5 = 50%)."""
+    problems = []
+    for method, result in results.items():
+        expected = baseline.get(method)
+        if not expected:
+            continue
+        for metric in ('seconds', 'peak_mb'):
+            limit = expected[metric] * (1 + tolerance)
+            if result[metric] > limit:
+                problems.append(f'{method}: {metric} {result[metric]} exceeds baseline {expected[metric]} (+{tolerance:.0%})')
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark GitArchaeologist on a synthetic repository')
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--commits', type=int, default=100)
+    parser.add_argument('--languages', default='py=6,js=3,java=1')
+    parser.add_argument('--lines', default='20:400', help='Minimum and maximum lines per file')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--repo', help='Benchmark an existing repository instead of a synthetic one')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=0.5)
+    parser.add_argument('--compare-workers', type=int, metavar='N',
+                        help='Also compare the content scan with 1 and N worker processes')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--save-baseline', action='store_true')
+    group.add_argument('--check', action='store_true', help='Exit with status 1 on a regression')
+    args = parser.parse_args()
+
+    low, _, high = args.lines.partition(':')
+    scenario = args.repo or f'files={args.files} commits={args.commits} languages={args.languages} lines={args.lines} seed={args.seed}'
+    if args.workers:
+        scenario += f' workers={args.workers}'
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        repo_path = args.repo
+        if not repo_path:
+            repo_path = os.path.join(temp_dir, 'repo')
+            generate_repo(repo_path, args.files, args.commits, args.languages, (int(low), int(high or low)), args.seed)
+        results = run_benchmarks(repo_path, args.workers, args.repeat)
+        if args.compare_workers:
+            comparison = compare_workers(repo_path, args.compare_workers, args.repeat)
+
+    print(f"Scenario: {scenario}")
+    print(f"{'benchmark':<28} {'seconds':>9} {'peak MB':>9} {'files/s':>10}")
+    for method, result in results.items():
+        print(f"{method:<28} {result['seconds']:>9.3f} {result['peak_mb']:>9.2f} {result['files_per_sec'] or 0:>10.1f}")
+
+    if args.compare_workers:
+        serial, parallel, identical = comparison
+        print(f"Content scan, serial:   {serial:.3f}s")
+        print(f"Content scan, parallel: {parallel:.3f}s ({args.compare_workers} workers)")
+        print(f"Speedup:  {serial / parallel:.2f}x")
+        print(f"Identical results: {identical}")
+        if not identical:
+            sys.exit(1)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+
+    if args.save_baseline:
+        baselines[scenario] = results
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baseline saved to {args.baseline}")
+    elif args.check:
+        if scenario not in baselines:
+            print(f"No baseline for this scenario in {args.baseline}; run with --save-baseline first")
+            sys.exit(1)
+        problems = regressions(results, baselines[scenario], args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == '__main__':
+    main()
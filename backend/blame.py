@@ -0,0 +1,189 @@
+import heapq
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from budget import expired
+from git_cmd import GitCommandError, git_output, object_sizes
+from metrics import bind, record_git
+from scanner import MAX_FILE_BYTES, list_tree
+
+# Upper bounds (in days) of the code age histogram buckets
+AGE_BUCKETS = (
+    ('< 1 month', 30),
+    ('1-6 months', 182),
+    ('6-12 months', 365),
+    ('1-2 years', 730),
+    ('2-5 years', 1826),
+    ('5+ years', None),
+)
+
+
+def text_blobs(repo_path, blobs, rev='HEAD', max_bytes=MAX_FILE_BYTES):
+    """
+    The (path, blob sha) of blobs worth blaming: text files of at most
+    max_bytes. Binary files are recognized like git does (a NUL byte near the
+    start, or the binary attribute), by one `git grep -I` over the tree.
+    """
+    sizes = object_sizes(repo_path, sorted({sha for _, sha in blobs}))
+    try:
+        # Every non-empty text file has a line matching the empty pattern
+        output = git_output(repo_path, 'grep', '-I', '-z', '--name-only', '-e', '', rev)
+    except GitCommandError:
+        return []  # No text files at all
+    prefix = len(rev) + 1  # Names are listed as rev:path
+    text = {name[prefix:].decode('utf-8', errors='surrogateescape') for name in output.split(b'\0') if name}
+    return [(path, sha) for path, sha in blobs if path in text and sizes.get(sha, 0) <= max_bytes]
+
+
+def parse_incremental_blame(lines):
+    """
+    Parse `git blame --incremental --porcelain` output.
+
+    Returns (hunks, commits): hunks is a list of [final_line, line_count, sha]
+    and commits maps each sha to [author_time, summary].
+    """
+    hunks = []
+    commits = {}
+    current = None
+
+    for raw in lines:
+        line = raw.rstrip(b'\n').decode('utf-8', errors='replace')
+        if current is None:
+            # Hunk header: <sha> <orig line> <final line> <line count>
+            sha, _, final_line, count = line.split(' ')
+            current = sha
+            hunks.append([int(final_line), int(count), sha])
+            commits.setdefault(sha, [0, ''])
+        elif line.startswith('author-time '):
+            commits[current][0] = int(line[len('author-time '):])
+        elif line.startswith('summary '):
+            commits[current][1] = line[len('summary '):]
+        elif line.startswith('filename '):
+            current = None
+
+    return hunks, commits
+
+
+class BlameEngine:
+    """
+    Runs `git blame` across a bounded pool of worker threads.
+
+    Blame results are cached per (path, blob sha): the lines of a blob at a
+    given path were introduced by the same commits no matter which HEAD it
+    is reached from, so the cache stays valid as the repository moves on.
+    """
+
+    def __init__(self, repo_path, max_workers=4, cache=None, max_bytes=MAX_FILE_BYTES):
+        self.repo_path = repo_path
+        self.max_workers = max_workers
+        self.cache = cache
+        # Larger files are not blamed
+        self.max_bytes = max_bytes
+
+    def blame(self, path, rev='HEAD'):
+        """Blame one file at rev, returning (hunks, commits)."""
+        record_git('blame')
+        process = subprocess.Popen(
+            ['git', '-C', self.repo_path, 'blame', '--incremental', '--porcelain', rev, '--', path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        try:
+            result = parse_incremental_blame(process.stdout)
+            if process.wait() != 0:
+                raise GitCommandError(process.stderr.read().decode('utf-8', errors='ignore').strip())
+            return result
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+            process.stderr.close()
+
+    def iter_blames(self, blobs, rev='HEAD'):
+        """
+        Yield (path, hunks, commits) for each (path, blob sha), in no particular
+        order. Cached blobs are answered without running git; the rest are
+        blamed at most max_workers at a time.
+        """
+        keys = {path: f'blame:{path}:{sha}' for path, sha in blobs}
+
+        pending = []
+        if self.cache is None:
+            pending = [path for path, _ in blobs]
+        else:
+            # Look cached blames up in batches so they are never all in memory at once
+            for i in range(0, len(blobs), 200):
+                batch = [path for path, _ in blobs[i:i + 200]]
+                cached = self.cache.get_many(keys[path] for path in batch)
+                for path in batch:
+                    entry = cached.get(keys[path])
+                    if entry is not None:
+                        yield path, entry['hunks'], entry['commits']
+                    else:
+                        pending.append(path)
+
+        def run(path):
+            if expired():
+                return path, None  # Drain the queue quickly once out of time
+            try:
+                return path, self.blame(path, rev)
+            except GitCommandError:
+                return path, None
+
+        # New blames are stored in batches too: every cache write also checks the cache size
+        fresh = {}
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                for path, result in pool.map(bind(run), pending):
+                    if result is None:
+                        continue
+                    hunks, commits = result
+                    if self.cache is not None:
+                        fresh[keys[path]] = {'hunks': hunks, 'commits': commits}
+                        if len(fresh) >= 200:
+                            self.cache.set_many(fresh)
+                            fresh = {}
+                    yield path, hunks, commits
+        finally:
+            if fresh:
+                self.cache.set_many(fresh)
+
+    def summarize(self, rev='HEAD', top=10, now=None, include=None, exclude=None):
+        """
+        Blame every text file at rev (see text_blobs) that the scan would
+        look at: selected by the include/exclude pathspecs, leaving vendored
+        and generated files out (see scanner.list_tree). Results are reduced
+        on the fly.
+
+        Returns (oldest, histogram): (author_time, path, line, sha, summary) for
+        the `top` files whose oldest surviving line is oldest, and line counts
+        per age bucket across the whole repository. Each file's blame is
+        reduced as it arrives rather than kept around. If the current budget
+        runs out, only the files blamed so far are counted.
+        """
+        now = now or time.time()
+        histogram = [0] * len(AGE_BUCKETS)
+        file_oldest_lines = []
+
+        blobs = text_blobs(self.repo_path, list_tree(self.repo_path, rev, include, exclude), rev, self.max_bytes)
+        for path, hunks, commits in self.iter_blames(blobs, rev):
+            if expired():
+                break
+            file_oldest = None
+            for final_line, count, sha in hunks:
+                author_time, summary = commits[sha]
+                age_days = (now - author_time) / 86400
+                for i, (_, limit) in enumerate(AGE_BUCKETS):
+                    if limit is None or age_days < limit:
+                        histogram[i] += count
+                        break
+                if file_oldest is None or author_time < file_oldest[0]:
+                    file_oldest = (author_time, final_line, sha, summary)
+
+            if file_oldest is not None:
+                author_time, final_line, sha, summary = file_oldest
+                file_oldest_lines.append((author_time, path, final_line, sha, summary))
+
+        oldest = heapq.nsmallest(top, file_oldest_lines, key=lambda entry: (entry[0], entry[1]))
+        return oldest, histogram
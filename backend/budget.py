@@ -0,0 +1,83 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Budget:
+    """
+    Time allowed for an analysis (or one of its stages), and a flag to cancel it.
+
+    Long loops check expired() between units of work (files, commits, blames)
+    and stop early, so whatever finished so far is still returned. A stage
+    budget never outlives the budget it was carved from, and shares its
+    cancellation flag and its list of stages that ran out of time.
+    """
+
+    def __init__(self, seconds=None, parent=None, deadline=None):
+        if seconds:
+            deadline = time.time() + seconds
+        if parent is not None and parent.deadline is not None:
+            deadline = parent.deadline if deadline is None else min(deadline, parent.deadline)
+        # Wall-clock time (time.time()) so it means the same in pool worker processes
+        self.deadline = deadline
+        self.parent = parent
+        self._cancelled = parent._cancelled if parent is not None else threading.Event()
+        # Names of the stages that ran out of time, one list for the whole chain of budgets
+        self.timed_out = parent.timed_out if parent is not None else []
+        self.exhausted = False
+
+    def cancel(self):
+        """Ask everything running under this budget (and its parent) to stop."""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def expired(self):
+        """Whether work should stop: the deadline has passed or the analysis was cancelled."""
+        if not self.exhausted:
+            self.exhausted = self.cancelled or (self.deadline is not None and time.time() >= self.deadline)
+        return self.exhausted
+
+
+# The budget of the analysis running on this thread (or None)
+_current = contextvars.ContextVar('budget', default=None)
+
+
+def current():
+    """Budget of the analysis running on this thread, or None."""
+    return _current.get()
+
+
+def expired():
+    """Whether the analysis running on this thread should stop (False if it has no budget)."""
+    budget = _current.get()
+    return budget is not None and budget.expired()
+
+
+@contextmanager
+def limiting(budget):
+    """Run the block under budget."""
+    previous = _current.get()
+    # Restored explicitly, like metrics.recording: the block may span generator yields
+    _current.set(budget)
+    try:
+        yield budget
+    finally:
+        _current.set(previous)
+
+
+@contextmanager
+def within(name, seconds=None):
+    """
+    Run the block as a stage with at most seconds of its own (and never more
+    than what is left of the current budget). A stage that runs out is listed
+    in timed_out, which every budget of the analysis shares.
+    """
+    budget = Budget(seconds, parent=_current.get())
+    with limiting(budget):
+        yield budget
+    if budget.exhausted:
+        budget.timed_out.append(name)
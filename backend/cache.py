@@ -0,0 +1,220 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+# Default location for on-disk caches
+CACHE_DIR = os.getenv('ARCHAEOLOGY_CACHE_DIR', os.path.join(os.path.dirname(__file__), '.cache'))
+
+
+class DiskCache:
+    """
+    Persistent key/value store with size-bounded LRU eviction.
+
+    Values are stored as JSON in a single SQLite file so several processes
+    can share it. Every read refreshes an entry's access time; once the total
+    stored size exceeds max_bytes the least recently used entries are evicted.
+    Entries older than ttl seconds (if given) are treated as missing.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, ttl=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)'
+            )
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(entries)')]
+            if 'created' not in columns:
+                conn.execute('ALTER TABLE entries ADD COLUMN created REAL NOT NULL DEFAULT 0')
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default."""
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys):
+        """Return a dict of the cached values for whichever keys are present."""
+        keys = list(keys)
+        found = {}
+        now = time.time()
+        oldest = now - self.ttl if self.ttl else 0
+
+        with closing(self._connect()) as conn, conn:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = conn.execute(
+                    f'SELECT key, value FROM entries WHERE key IN ({placeholders}) AND created >= ?',
+                    batch + [oldest]
+                ).fetchall()
+                for key, value in rows:
+                    found[key] = json.loads(value)
+                if rows:
+                    conn.execute(
+                        f'UPDATE entries SET accessed = ? WHERE key IN ({",".join("?" * len(rows))})',
+                        [now] + [key for key, _ in rows]
+                    )
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key, value):
+        """Store a JSON-serializable value under key."""
+        self.set_many({key: value})
+
+    def set_many(self, items):
+        """Store several values at once, then evict if over the size limit."""
+        if not items:
+            return
+
+        now = time.time()
+        rows = []
+        for key, value in items.items():
+            encoded = json.dumps(value)
+            rows.append((key, encoded, len(encoded), now, now))
+
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO entries (key, value, size, accessed, created) VALUES (?, ?, ?, ?, ?)', rows
+            )
+            self._evict(conn)
+
+    def delete(self, key):
+        """Remove a single entry."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def _evict(self, conn):
+        """Drop expired entries, then least recently used ones until the cache fits in max_bytes."""
+        if self.ttl:
+            conn.execute('DELETE FROM entries WHERE created < ?', (time.time() - self.ttl,))
+
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        excess = total - self.max_bytes
+        freed = 0
+        doomed = []
+        for key, size in conn.execute('SELECT key, size FROM entries ORDER BY accessed'):
+            doomed.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany('DELETE FROM entries WHERE key = ?', doomed)
+
+    def clear(self):
+        """Remove every entry."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM entries')
+
+    def stats(self):
+        """Hit/miss counters and current size."""
+        with closing(self._connect()) as conn:
+            entries, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'bytes': size, 'max_bytes': self.max_bytes}
+
+
+class MemoryCache:
+    """Thread-safe in-process LRU cache bounded by entry count, with optional TTL."""
+
+    def __init__(self, max_entries=128, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and time.time() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        """Store value under key, evicting the least recently used entry if full."""
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Remove a single entry."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters and current size."""
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries), 'max_entries': self.max_entries}
+
+
+class TieredCache:
+    """A MemoryCache in front of a DiskCache; disk hits are promoted to memory."""
+
+    def __init__(self, memory, disk):
+        self.memory = memory
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for key from memory or disk, or default."""
+        value = self.memory.get(key)
+        if value is None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        if value is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """Store value in both tiers."""
+        self.memory.set(key, value)
+        self.disk.set(key, value)
+
+    def delete(self, key):
+        """Remove key from both tiers."""
+        self.memory.delete(key)
+        self.disk.delete(key)
+
+    def clear(self):
+        """Remove every entry from both tiers."""
+        self.memory.clear()
+        self.disk.clear()
+
+    def stats(self):
+        """Overall hit/miss counters plus per-tier statistics."""
+        return {'hits': self.hits, 'misses': self.misses, 'memory': self.memory.stats(), 'disk': self.disk.stats()}
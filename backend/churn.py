@@ -0,0 +1,108 @@
+from array import array
+from datetime import datetime
+import numpy as np
+from budget import expired
+from history import iter_log
+
+# Hotspots returned in an excavation's response
+HOTSPOT_LIMIT = 20
+
+
+class ChurnIndex:
+    """
+    Per-path change statistics from a single streaming `git log --numstat`
+    pass, kept in flat array columns (one slot per path) rather than per-commit
+    records, so memory grows with the number of paths, not of commits.
+    """
+
+    def __init__(self):
+        self.paths = []
+        self._index = {}
+        self.commits = array('q')
+        self.added = array('q')
+        self.removed = array('q')
+        self.last_touched = array('q')
+        # One (path slot, author slot) pair per author who touched a path
+        self._authors = {}
+        self._touches = set()
+
+    @classmethod
+    def from_history(cls, repo_path, rev='HEAD', pathspecs=()):
+        """
+        Build the index from every commit reachable from rev, optionally
+        limited to pathspecs. Merge commits are left out: their first-parent
+        diff repeats the changes of the merged branch, whose own commits are
+        already counted. If the current budget runs out, only the newest
+        commits read so far are counted.
+        """
+        index = cls()
+        args = ['--no-merges', rev, '--'] + list(pathspecs)
+        for commit in iter_log(repo_path, *args, numstat=True):
+            if expired():
+                break
+            index.add(commit)
+        return index
+
+    def add(self, commit):
+        """Count one commit (as yielded by history.iter_log with numstat) against its files."""
+        author = self._authors.setdefault(commit['author'], len(self._authors))
+        timestamp = commit['timestamp']
+        for added, removed, path in commit['files']:
+            slot = self._index.get(path)
+            if slot is None:
+                slot = self._index[path] = len(self.paths)
+                self.paths.append(path)
+                self.commits.append(0)
+                self.added.append(0)
+                self.removed.append(0)
+                self.last_touched.append(timestamp)
+            self.commits[slot] += 1
+            self.added[slot] += added
+            self.removed[slot] += removed
+            if timestamp > self.last_touched[slot]:
+                self.last_touched[slot] = timestamp
+            self._touches.add(slot << 32 | author)
+
+    def authors(self):
+        """Number of distinct authors per path slot."""
+        slots = np.fromiter((touch >> 32 for touch in self._touches), dtype=np.int64, count=len(self._touches))
+        return np.bincount(slots, minlength=len(self.paths))
+
+    def hotspots(self, scored, limit=HOTSPOT_LIMIT):
+        """
+        Join complexity with churn: scored is the heatmap's per-file list (file,
+        score, level). Files are ranked by commits × complexity score, reported
+        relative to the top file (100). Files never changed in the history are
+        left out. With limit None every changed file is returned.
+        """
+        if not scored or not self.paths:
+            return []
+
+        count = len(scored)
+        slots = np.fromiter((self._index.get(item['file'], -1) for item in scored), dtype=np.int64, count=count)
+        complexity = np.fromiter((item['score'] for item in scored), dtype=np.float64, count=count)
+        known = slots >= 0
+        commits = np.zeros(count, dtype=np.int64)
+        commits[known] = np.frombuffer(self.commits, dtype=np.int64)[slots[known]]
+
+        heat = commits * complexity
+        if not heat.max() > 0:
+            return []
+        heat *= 100.0 / heat.max()
+
+        authors = self.authors()
+        top = [i for i in np.argsort(-heat, kind='stable')[:limit] if heat[i] > 0]
+        return [
+            {
+                'file': scored[i]['file'],
+                'score': round(float(heat[i]), 1),
+                'complexity': scored[i]['score'],
+                'level': scored[i]['level'],
+                'commits': self.commits[slots[i]],
+                'lines_added': self.added[slots[i]],
+                'lines_removed': self.removed[slots[i]],
+                'authors': int(authors[slots[i]]),
+                'last_touched': datetime.fromtimestamp(self.last_touched[slots[i]]).strftime('%Y-%m-%d')
+            }
+            for i in top
+        ]
@@ -0,0 +1,225 @@
+import keyword
+import re
+import zlib
+import numpy as np
+from complexity import C_TOKEN
+
+# Tokens per k-gram: shorter matches are noise (argument lists, import blocks)
+KGRAM = 30
+# Fingerprints are picked from every window of this many k-grams, so any
+# clone at least KGRAM + WINDOW - 1 tokens long is guaranteed to be found
+WINDOW = 20
+
+# Clones spanning fewer lines than this are not reported
+MIN_CLONE_LINES = 6
+# Fingerprints shared by more places than this are boilerplate, not clones
+MAX_OCCURRENCES = 50
+# Locations listed per clone group
+MAX_LOCATIONS = 10
+
+# Words kept as they are; every other identifier is normalized away
+KEYWORDS = set(keyword.kwlist) | {
+    'if', 'else', 'for', 'while', 'do', 'switch', 'case', 'default', 'break', 'continue', 'return',
+    'try', 'catch', 'finally', 'throw', 'new', 'delete', 'function', 'class', 'struct', 'enum',
+    'const', 'let', 'var', 'static', 'public', 'private', 'protected', 'void', 'this', 'super',
+    'typeof', 'instanceof', 'import', 'export', 'from', 'extends', 'implements', 'interface',
+    'async', 'await', 'yield', 'true', 'false', 'null', 'undefined',
+}
+
+# Python lexer, in the same shape as complexity.C_TOKEN (the tokenize module is several times slower)
+PYTHON_TOKEN = re.compile(r'''
+      (?P<comment>\#[^\n]*)
+    | (?P<string>[rRbBuUfF]{0,2}(?:"""(?:\\.|[^\\])*?(?:"""|\Z)|\'\'\'(?:\\.|[^\\])*?(?:\'\'\'|\Z)
+                                 |"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'))
+    | (?P<word>\w+)
+    | (?P<op>[^\s\w])
+''', re.DOTALL | re.VERBOSE)
+
+# Polynomial base of the k-gram hashes (arithmetic wraps around modulo 2**64)
+BASE = np.uint64(1000003)
+_HASH_MASK = np.uint64(2 ** 63 - 1)
+
+
+def python_tokens(content):
+    """Normalized tokens of a Python file, as (token hashes, line numbers) arrays; comments are dropped."""
+    return _lex(PYTHON_TOKEN, content)
+
+
+def c_family_tokens(content):
+    """Normalized tokens of a JS/TS/Java/C-family file, as (token hashes, line numbers) arrays."""
+    return _lex(C_TOKEN, content)
+
+
+# Hash of each normalized token text; keywords, operators and placeholders are a small set
+_TOKEN_HASHES = {}
+
+
+def _lex(pattern, content):
+    """
+    Identifiers become N, numbers 0 and string literals "; keywords and
+    operators are kept, so renamed copies still match. Token hashes must be
+    stable across processes, so they are CRC-32s rather than hash().
+    """
+    values = []
+    offsets = []
+    hashes = _TOKEN_HASHES
+    for match in pattern.finditer(content):
+        kind = match.lastgroup
+        if kind == 'word':
+            text = match.group()
+            text = '0' if text[0].isdigit() else text if text in KEYWORDS else 'N'
+        elif kind == 'string':
+            text = '"'
+        elif kind == 'op' or kind == 'other':
+            text = match.group()
+        else:
+            continue
+        value = hashes.get(text)
+        if value is None:
+            value = hashes[text] = zlib.crc32(text.encode())
+        values.append(value)
+        offsets.append(match.start())
+
+    newlines = np.flatnonzero(np.frombuffer(content.encode('utf-32-le'), dtype=np.uint32) == 10)
+    lines = np.searchsorted(newlines, np.array(offsets, dtype=np.int64)).astype(np.int32) + 1
+    return np.array(values, dtype=np.uint64), lines
+
+
+def fingerprints(values, lines, k=KGRAM, window=WINDOW):
+    """
+    Winnowed fingerprints of a token sequence (Schleimer et al., 2003), given
+    as token hashes and their line numbers.
+
+    Every k-gram of tokens gets a polynomial (Karp-Rabin) hash; from each
+    window of consecutive k-gram hashes the rightmost minimum is kept. Returns
+    (hashes, first lines, last lines) arrays covering each kept k-gram, or
+    empty arrays if there are fewer than k tokens.
+    """
+    count = len(values) - k + 1
+    if count <= 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty.astype(np.int32), empty.astype(np.int32)
+
+    with np.errstate(over='ignore'):
+        hashes = np.zeros(count, dtype=np.uint64)
+        for offset in range(k):
+            hashes = hashes * BASE + values[offset:offset + count]
+    hashes = (hashes & _HASH_MASK).astype(np.int64)
+
+    if count <= window:
+        picked = np.array([count - 1 - int(np.argmin(hashes[::-1]))])
+    else:
+        windows = np.lib.stride_tricks.sliding_window_view(hashes, window)
+        # Rightmost minimum of each window, so equal runs keep a single fingerprint
+        picked = np.arange(len(windows)) + window - 1 - np.argmin(windows[:, ::-1], axis=1)
+        picked = np.unique(picked)
+
+    return hashes[picked], lines[picked], lines[picked + k - 1]
+
+
+class FingerprintIndex:
+    """
+    Winnowed fingerprints of every file, in flat arrays, grouped into clones.
+
+    Files are added one at a time; clone groups are then found by sorting all
+    fingerprints by hash once, so the work is O(n log n) in the number of
+    fingerprints instead of comparing every pair of files.
+    """
+
+    def __init__(self):
+        self.files = []
+        self._hashes = []
+        self._starts = []
+        self._ends = []
+
+    def add_file(self, file, hashes, starts, ends):
+        slot = len(self.files)
+        self.files.append(file)
+        self._hashes.append(np.asarray(hashes, dtype=np.int64))
+        self._starts.append(np.asarray(starts, dtype=np.int32))
+        self._ends.append(np.asarray(ends, dtype=np.int32))
+        return slot
+
+    def clone_groups(self, min_lines=MIN_CLONE_LINES, max_occurrences=MAX_OCCURRENCES):
+        """
+        Groups of code regions sharing fingerprints, largest duplication first.
+
+        Shared fingerprints that overlap or touch within a file merge into one
+        region; regions sharing any fingerprint join the same group. Each group
+        is {file, line, lines, copies, duplicated_lines, locations}, where
+        file and line point at its first location and lines is the length of
+        its largest copy.
+        """
+        if not self.files:
+            return []
+        hashes = np.concatenate(self._hashes)
+        if not len(hashes):
+            return []
+        slots = np.repeat(np.arange(len(self.files), dtype=np.int32), [len(h) for h in self._hashes])
+        starts = np.concatenate(self._starts)
+        ends = np.concatenate(self._ends)
+
+        # Keep fingerprints found in at least two places, but not everywhere
+        _, inverse, counts = np.unique(hashes, return_inverse=True, return_counts=True)
+        occurrences = counts[inverse]
+        shared = np.flatnonzero((occurrences >= 2) & (occurrences <= max_occurrences))
+        if not len(shared):
+            return []
+
+        # Merge each file's shared fingerprints into regions, in position order
+        order = shared[np.lexsort((starts[shared], slots[shared]))]
+        region_of = np.empty(len(hashes), dtype=np.int64)
+        regions = []  # [slot, start, end]
+        for i in order:
+            slot, start, end = int(slots[i]), int(starts[i]), int(ends[i])
+            last = regions[-1] if regions else None
+            if last is not None and last[0] == slot and start <= last[2] + 1:
+                last[2] = max(last[2], end)
+            else:
+                regions.append([slot, start, end])
+            region_of[i] = len(regions) - 1
+
+        # Regions holding the same fingerprint belong to the same group (union-find)
+        parent = list(range(len(regions)))
+
+        def find(region):
+            while parent[region] != region:
+                parent[region] = parent[parent[region]]
+                region = parent[region]
+            return region
+
+        by_hash = shared[np.argsort(hashes[shared], kind='stable')]
+        for previous, current in zip(by_hash[:-1], by_hash[1:]):
+            if hashes[previous] == hashes[current]:
+                a, b = find(region_of[previous]), find(region_of[current])
+                if a != b:
+                    parent[b] = a
+
+        members = {}
+        for region in range(len(regions)):
+            members.setdefault(find(region), []).append(regions[region])
+
+        groups = []
+        for group in members.values():
+            if len(group) < 2:
+                continue  # A block repeating within itself, e.g. a table of numbers
+            lengths = [end - start + 1 for _, start, end in group]
+            lines = max(lengths)
+            if lines < min_lines:
+                continue
+            locations = [
+                {'file': self.files[slot], 'start_line': start, 'end_line': end}
+                for slot, start, end in group
+            ]
+            groups.append({
+                'file': locations[0]['file'],
+                'line': locations[0]['start_line'],
+                'lines': lines,
+                'copies': len(group),
+                # Lines that would go if every copy but the largest were removed
+                'duplicated_lines': sum(lengths) - lines,
+                'locations': locations[:MAX_LOCATIONS]
+            })
+
+        groups.sort(key=lambda group: (-group['duplicated_lines'], group['file'], group['line']))
+        return groups
@@ -0,0 +1,295 @@
+import ast
+import io
+import re
+import tokenize
+import numpy as np
+
+# Score thresholds separating the low / medium / high / critical levels
+LEVEL_THRESHOLDS = np.array([50, 150, 300])
+LEVELS = np.array(['low', 'medium', 'high', 'critical'])
+
+# Most complex functions reported per file
+TOP_FUNCTIONS = 5
+
+# Keywords adding a path through Python code, for sources the AST can't parse
+PYTHON_DECISION_WORDS = {'if', 'elif', 'for', 'while', 'except', 'and', 'or', 'case'}
+
+# Lexer for the JS/TS/Java/C family: comments and string literals are consumed
+# whole so nothing inside them is counted.
+C_TOKEN = re.compile(r'''
+      (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+    | (?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`)
+    | (?P<word>[\w$]+)
+    | (?P<op>=>|&&=?|\|\|=?|\?\?=?|\?\.|\?(?!\s*[:),.?=>])|[{}();,=])
+    | (?P<newline>\n)
+    | (?P<other>\S)
+''', re.DOTALL | re.VERBOSE)
+
+C_DECISION_WORDS = {'if', 'for', 'while', 'case', 'catch'}
+C_DECISION_OPS = {'&&', '||', '??', '&&=', '||=', '??=', '?'}
+C_CONTROL_WORDS = {'if', 'else', 'for', 'while', 'do', 'switch', 'try', 'catch', 'finally'}
+
+
+def _function(name, line):
+    return {'name': name, 'line': line, 'complexity': 1, 'max_depth': 0}
+
+
+def _top_functions(functions):
+    functions.sort(key=lambda function: function['complexity'], reverse=True)
+    return functions[:TOP_FUNCTIONS]
+
+
+class _PythonComplexity(ast.NodeVisitor):
+    """Cyclomatic complexity and control-flow nesting of a Python module, per function."""
+
+    def __init__(self):
+        self.decisions = 0
+        self.max_depth = 0
+        self.functions = []
+        self._depth = 0
+        self._open = []  # (function, depth at which it starts)
+
+    def _decide(self, count=1):
+        self.decisions += count
+        if self._open:
+            self._open[-1][0]['complexity'] += count
+
+    def _enter(self):
+        self._depth += 1
+        self.max_depth = max(self.max_depth, self._depth)
+        if self._open:
+            function, base = self._open[-1]
+            function['max_depth'] = max(function['max_depth'], self._depth - base)
+
+    def _nest(self, node):
+        self._enter()
+        self.generic_visit(node)
+        self._depth -= 1
+
+    def visit_FunctionDef(self, node):
+        function = _function(node.name, node.lineno)
+        self._open.append((function, self._depth))
+        self.generic_visit(node)
+        self._open.pop()
+        self.functions.append(function)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_If(self, node):
+        self._decide()
+        self._enter()
+        self._visit_branches(node)
+        self._depth -= 1
+
+    def _visit_branches(self, node):
+        self.visit(node.test)
+        for child in node.body:
+            self.visit(child)
+        orelse = node.orelse
+        if len(orelse) == 1 and isinstance(orelse[0], ast.If) and orelse[0].col_offset == node.col_offset:
+            # An elif continues the chain at the same depth instead of nesting
+            self._decide()
+            self._visit_branches(orelse[0])
+        else:
+            for child in orelse:
+                self.visit(child)
+
+    def visit_For(self, node):
+        self._decide()
+        self._nest(node)
+
+    visit_AsyncFor = visit_For
+    visit_While = visit_For
+
+    def visit_With(self, node):
+        self._nest(node)
+
+    visit_AsyncWith = visit_With
+    visit_Try = visit_With
+    visit_TryStar = visit_With
+    visit_Match = visit_With
+
+    def visit_IfExp(self, node):
+        self._decide()
+        self.generic_visit(node)
+
+    visit_ExceptHandler = visit_IfExp
+
+    def visit_BoolOp(self, node):
+        self._decide(len(node.values) - 1)
+        self.generic_visit(node)
+
+    def visit_comprehension(self, node):
+        self._decide(1 + len(node.ifs))
+        self.generic_visit(node)
+
+    def visit_match_case(self, node):
+        # A bare `case _:` is the fallback path, not a new one
+        if not (isinstance(node.pattern, ast.MatchAs) and node.pattern.pattern is None):
+            self._decide()
+        self.generic_visit(node)
+
+
+def python_loc(content):
+    """Lines holding Python code: neither blank nor only a comment."""
+    loc = 0
+    for line in content.split('\n'):
+        stripped = line.strip()
+        if stripped and not stripped.startswith('#'):
+            loc += 1
+    return loc
+
+
+def python_complexity(content, tree):
+    """Metrics of a Python file from its AST, or from its tokens if it doesn't parse."""
+    if tree is None:
+        return _python_token_complexity(content)
+
+    visitor = _PythonComplexity()
+    try:
+        visitor.visit(tree)
+    except RecursionError:
+        # Nested deeper than the visitor can recurse, e.g. long generated expressions
+        return _python_token_complexity(content)
+    return {
+        'loc': python_loc(content),
+        'decisions': visitor.decisions,
+        'max_depth': visitor.max_depth,
+        'functions': _top_functions(visitor.functions)
+    }
+
+
+def _python_token_complexity(content):
+    """Keyword tokens and indentation nesting, for Python the AST can't parse (e.g. Python 2)."""
+    decisions = depth = max_depth = 0
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(content).readline):
+            if token.type == tokenize.INDENT:
+                depth += 1
+                max_depth = max(max_depth, depth)
+            elif token.type == tokenize.DEDENT:
+                depth -= 1
+            elif token.type == tokenize.NAME and token.string in PYTHON_DECISION_WORDS:
+                decisions += 1
+    except (tokenize.TokenError, SyntaxError):
+        pass
+    return {'loc': python_loc(content), 'decisions': decisions, 'max_depth': max_depth, 'functions': []}
+
+
+def c_family_complexity(content):
+    """
+    Metrics of a JS/TS/Java/C-family file from a lightweight lexer.
+
+    Decisions are branch keywords and short-circuit/ternary operators outside
+    comments and strings. Nesting counts the braces opened by control
+    statements; a brace after a closed parameter list starts a function.
+    """
+    line = 1
+    code_lines = set()
+    decisions = 0
+    max_depth = 0
+    functions = []
+
+    braces = []  # One (is_control, function) per open brace
+    depth = 0  # Control blocks currently open
+    open_functions = []  # (function, depth at which it starts)
+    pending_control = False  # A control keyword is waiting for its block
+    words = []  # Recent words, to name the call or function before a '('
+    parens = []  # Name before each open '('
+    signature = None  # (name, line) of a just-closed parameter list
+
+    for match in C_TOKEN.finditer(content):
+        kind = match.lastgroup
+        text = match.group()
+
+        if kind == 'newline':
+            line += 1
+            continue
+        if kind == 'comment':
+            line += text.count('\n')
+            continue
+
+        code_lines.add(line)
+        if kind == 'string':
+            line += text.count('\n')
+            continue
+
+        if kind == 'word':
+            if text in C_DECISION_WORDS:
+                decisions += 1
+                if open_functions:
+                    open_functions[-1][0]['complexity'] += 1
+            if text in C_CONTROL_WORDS:
+                pending_control = True
+                signature = None
+            words.append(text)
+            continue
+
+        if kind == 'op' and text in C_DECISION_OPS:
+            decisions += 1
+            if open_functions:
+                open_functions[-1][0]['complexity'] += 1
+            signature = None
+        elif text == '(':
+            name = words[-1] if words and words[-1] not in C_CONTROL_WORDS else None
+            parens.append(name if name != 'function' else '<anonymous>')
+            signature = None
+        elif text == ')':
+            name = parens.pop() if parens else None
+            signature = (name or '<anonymous>', line)
+        elif text == '{':
+            if pending_control:
+                braces.append((True, None))
+                depth += 1
+                max_depth = max(max_depth, depth)
+                if open_functions:
+                    function, base = open_functions[-1]
+                    function['max_depth'] = max(function['max_depth'], depth - base)
+            elif signature:
+                function = _function(*signature)
+                braces.append((False, function))
+                open_functions.append((function, depth))
+            else:
+                braces.append((False, None))
+            pending_control = False
+            signature = None
+        elif text == '}':
+            if braces:
+                is_control, function = braces.pop()
+                if is_control:
+                    depth -= 1
+                if function:
+                    open_functions.pop()
+                    functions.append(function)
+            pending_control = False
+            signature = None
+        elif text in (';', ',', '='):
+            if not parens:
+                pending_control = False
+            signature = None
+
+        # Keep the name on the left of `name = (...) => {`
+        if text != '=':
+            words.clear()
+
+    # Functions left open by unbalanced braces still count
+    functions.extend(function for function, _ in open_functions)
+
+    return {
+        'loc': len(code_lines),
+        'decisions': decisions,
+        'max_depth': max_depth,
+        'functions': _top_functions(functions)
+    }
+
+
+def score_files(loc, decisions, max_depth):
+    """
+    Score, level and percentile of many files at once from arrays of their
+    metrics. The percentile is the share of files scoring the same or lower.
+    """
+    scores = loc * 0.5 + decisions * 3.0 + max_depth * 5.0
+    levels = LEVELS[np.searchsorted(LEVEL_THRESHOLDS, scores, side='right')]
+    ranked = np.sort(scores)
+    percentiles = np.searchsorted(ranked, scores, side='right') * 100.0 / max(len(scores), 1)
+    return scores, levels, percentiles
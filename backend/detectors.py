@@ -0,0 +1,257 @@
+import ast
+import re
+import numpy as np
+from clones import FingerprintIndex, c_family_tokens, fingerprints, python_tokens
+from complexity import c_family_complexity, python_complexity, score_files
+from symbol_index import SymbolIndex, python_symbols, text_references
+
+# Bump whenever a detector's per-file output changes so cached findings are not reused
+ANALYZER_VERSION = '13'
+
+
+class Detector:
+    """Base class for detectors fed by the shared file scanner."""
+
+    name = None
+    extensions = ()
+    skip_dirs = {'.git'}
+    path_prefix = '/'
+    limit = None
+
+    def accepts(self, source):
+        """Whether this detector wants to look at the given file."""
+        return source.filename.endswith(self.extensions) and not (self.skip_dirs & source.directories)
+
+    def analyze(self, source):
+        """Return the findings for a single file, without file paths."""
+        return []
+
+    def locate(self, source, finding):
+        """Attach the file path to a finding."""
+        return dict(file=self.path_prefix + source.relative_path, **finding)
+
+    def rank(self, findings):
+        """Every finding of the repository, most interesting first, from the findings of every file (in scan order)."""
+        return findings
+
+    def finalize(self, findings):
+        """Reduce the findings of every file (in scan order) to the final result: the top `limit` ranked ones."""
+        return self.rank(findings)[:self.limit]
+
+
+class DeadCodeDetector(Detector):
+    """Functions, methods and classes that are never referenced anywhere in the repository."""
+
+    name = 'dead_code'
+    # Python files define symbols; the others can only reference them
+    extensions = ('.py', '.pyi', '.pyx', '.js', '.jsx', '.ts', '.tsx', '.html', '.jinja', '.j2',
+                  '.cfg', '.toml', '.ini', '.yml', '.yaml', '.sh')
+    limit = 10
+
+    def analyze(self, source):
+        if not source.filename.endswith('.py'):
+            return [{'definitions': [], 'references': sorted(text_references(source.content)), 'exports': []}]
+        if source.tree is None:
+            return []
+
+        definitions, references, exports = python_symbols(source.tree, source.content)
+        candidates = [
+            {'type': definition['type'], 'name': definition['name'], 'line': definition['line']}
+            for definition in definitions
+            # Private names, decorator-registered callbacks, test cases and visitor
+            # methods (dispatched by name, e.g. ast.NodeVisitor) are used implicitly
+            if not definition['name'].startswith(('_', 'test', 'Test', 'visit_')) and not definition['decorated']
+        ]
+        return [{'definitions': candidates, 'references': sorted(references), 'exports': sorted(exports)}]
+
+    def rank(self, findings):
+        index = SymbolIndex()
+        for finding in findings:
+            index.add_file(finding['file'], finding['definitions'], finding['references'], finding['exports'])
+
+        dead_code = [
+            {'type': definition['type'], 'name': definition['name'], 'file': definition['file'], 'line': definition['line']}
+            for definition in index.unused_definitions()
+        ]
+        return dead_code
+
+
+class CommentedCodeDetector(Detector):
+    """Commented-out code that's been left behind."""
+
+    name = 'commented_code'
+    extensions = ('.py', '.js', '.ts', '.java', '.cpp', '.c')
+    limit = 15
+
+    code_markers = ('=', '(', '{', 'def ', 'function ', 'class ')
+
+    def analyze(self, source):
+        found = []
+        # Look for lines with commented code (heuristic: contains =, (, {, etc.)
+        for i, line in source.candidate_lines:
+            stripped = line.strip()
+            if stripped.startswith(('#', '//')):
+                if any(marker in stripped for marker in self.code_markers):
+                    found.append({'line': i, 'code': stripped[:100]})
+        return found
+
+
+class TodoDetector(Detector):
+    """TODO/FIXME/HACK/XXX comments."""
+
+    name = 'todos'
+    extensions = ('.py', '.js', '.ts', '.java', '.cpp', '.c', '.go', '.rs')
+    limit = 20
+
+    pattern = re.compile(r'TODO|FIXME|HACK|XXX', re.IGNORECASE)
+
+    def analyze(self, source):
+        found = []
+        for i, line in source.candidate_lines:
+            if self.pattern.search(line):
+                found.append({'line': i, 'text': line.strip()[:150]})
+        return found
+
+
+class HallOfShameDetector(Detector):
+    """The longest functions in the codebase."""
+
+    name = 'hall_of_shame'
+    extensions = ('.py',)
+    limit = 10
+
+    def analyze(self, source):
+        if source.tree is None:
+            return []
+
+        found = []
+        for node in ast.walk(source.tree):
+            if isinstance(node, ast.FunctionDef):
+                func_start = node.lineno
+                func_end = node.end_lineno if hasattr(node, 'end_lineno') else func_start
+                length = func_end - func_start
+
+                if length > 30:  # Functions longer than 30 lines
+                    found.append({'type': 'long_function', 'name': node.name, 'line': node.lineno, 'length': length})
+        return found
+
+    def rank(self, findings):
+        findings.sort(key=lambda x: x['length'], reverse=True)
+        return findings
+
+
+class ComplexityHeatmapDetector(Detector):
+    """Per-file complexity scores for the heatmap."""
+
+    name = 'complexity_heatmap'
+    extensions = ('.py', '.js', '.jsx', '.ts', '.tsx', '.java', '.cpp', '.c', '.h')
+    skip_dirs = {'.git', 'node_modules', '__pycache__'}
+    path_prefix = ''
+    limit = 30
+
+    def analyze(self, source):
+        if source.filename.endswith('.py'):
+            metrics = python_complexity(source.content, source.tree)
+        else:
+            metrics = c_family_complexity(source.content)
+        return [metrics]
+
+    def rank(self, findings):
+        if not findings:
+            return []
+
+        # Score every file at once; percentiles need the whole distribution anyway
+        count = len(findings)
+        loc = np.fromiter((finding['loc'] for finding in findings), dtype=np.int64, count=count)
+        decisions = np.fromiter((finding['decisions'] for finding in findings), dtype=np.int64, count=count)
+        max_depth = np.fromiter((finding['max_depth'] for finding in findings), dtype=np.int64, count=count)
+        scores, levels, percentiles = score_files(loc, decisions, max_depth)
+
+        return [
+            dict(
+                findings[i],
+                score=round(float(scores[i]), 2),
+                level=str(levels[i]),
+                percentile=round(float(percentiles[i]), 1)
+            )
+            for i in np.argsort(-scores, kind='stable')
+        ]
+
+    def history(self, snapshots):
+        """
+        Per-file score series across snapshots (oldest first), each a dict of
+        relative path to per-file results. Only the files that peaked highest
+        are kept; a None score means the file did not exist at that point.
+        """
+        # Files the detector failed on have no results and are left out, as in a scan
+        snapshots = [
+            {path: results[self.name][0] for path, results in snapshot.items() if results[self.name]}
+            for snapshot in snapshots
+        ]
+        paths = {}
+        for snapshot in snapshots:
+            for path in snapshot:
+                paths.setdefault(path, len(paths))
+        if not paths:
+            return []
+
+        series = np.full((len(paths), len(snapshots)), np.nan)
+        for column, snapshot in enumerate(snapshots):
+            if not snapshot:
+                continue
+            metrics = list(snapshot.values())
+            count = len(metrics)
+            rows = np.fromiter((paths[path] for path in snapshot), dtype=np.int64, count=count)
+            scores, _, _ = score_files(
+                np.fromiter((metric['loc'] for metric in metrics), dtype=np.int64, count=count),
+                np.fromiter((metric['decisions'] for metric in metrics), dtype=np.int64, count=count),
+                np.fromiter((metric['max_depth'] for metric in metrics), dtype=np.int64, count=count),
+            )
+            series[rows, column] = scores
+
+        peaks = np.nanmax(series, axis=1)
+        top = np.argsort(-peaks, kind='stable')[:self.limit]
+        names = list(paths)
+        return [
+            {
+                'file': self.path_prefix + names[i],
+                'scores': [None if np.isnan(score) else round(float(score), 1) for score in series[i]]
+            }
+            for i in top
+        ]
+
+
+class DuplicateCodeDetector(Detector):
+    """Copy-pasted blocks of code, found from winnowed token fingerprints."""
+
+    name = 'duplicate_code'
+    extensions = ('.py', '.js', '.jsx', '.ts', '.tsx', '.java', '.cpp', '.c', '.h')
+    skip_dirs = {'.git', 'node_modules', '__pycache__'}
+    limit = 10
+
+    def analyze(self, source):
+        if source.filename.endswith('.py'):
+            values, lines = python_tokens(source.content)
+        else:
+            values, lines = c_family_tokens(source.content)
+        hashes, starts, ends = fingerprints(values, lines)
+        if not len(hashes):
+            return []
+        return [{'hashes': hashes.tolist(), 'starts': starts.tolist(), 'ends': ends.tolist()}]
+
+    def rank(self, findings):
+        index = FingerprintIndex()
+        for finding in findings:
+            index.add_file(finding['file'], finding['hashes'], finding['starts'], finding['ends'])
+        return index.clone_groups()
+
+
+# Detectors run by a full excavation, in artifact order
+CONTENT_DETECTORS = (
+    DeadCodeDetector,
+    CommentedCodeDetector,
+    TodoDetector,
+    HallOfShameDetector,
+    ComplexityHeatmapDetector,
+    DuplicateCodeDetector,
+)
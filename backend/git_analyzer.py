@@ -1,289 +1,261 @@
-import os
-import re
 from datetime import datetime
 from git import Repo
-from collections import defaultdict
-import ast
+from blame import AGE_BUCKETS, BlameEngine
+from budget import within
+from churn import HOTSPOT_LIMIT, ChurnIndex
+from history import sample_commits
+from metrics import timed
+from path_index import PathIndex
+from scanner import list_tree, pathspecs, scan, scan_history
+from detectors import (
+    CONTENT_DETECTORS,
+    CommentedCodeDetector,
+    ComplexityHeatmapDetector,
+    DeadCodeDetector,
+    DuplicateCodeDetector,
+    HallOfShameDetector,
+    TodoDetector,
+)
 
 
 class GitArchaeologist:
     """Analyzes git repositories to find code artifacts and fossils."""
 
-    def __init__(self, repo_path):
+    def __init__(self, repo_path, workers=None, cache=None, blame_workers=4, include=None, exclude=None, rev=None,
+                 stage_seconds=None):
         self.repo = Repo(repo_path)
         self.repo_path = repo_path
+        # Commit to excavate straight from the object database; None reads the working tree
+        self.rev = self.repo.commit(rev).hexsha if rev else None
+        # Number of processes used to analyze files; None or 1 runs serially
+        self.workers = workers
+        # Optional DiskCache of per-blob findings shared across excavations
+        self.cache = cache
+        # Maximum number of concurrent `git blame` processes
+        self.blame_workers = blame_workers
+        # Optional pathspecs narrowing which files are scanned
+        self.include = include
+        self.exclude = exclude
+        # Time each part of an excavation may take before returning what it has (None: no limit)
+        self.stage_seconds = stage_seconds
+        # Commits sampled for the timeline, shared with the complexity history
+        self._samples = None
+        # Every finding of the last excavation by category, beyond the top ones it yields
+        self.complete = {}
 
     def find_dead_code(self):
         """Find functions/classes that are defined but never called."""
-        dead_code = []
-
-        # For simplicity, we'll look at Python files
-        for root, dirs, files in os.walk(self.repo_path):
-            # Skip .git directory
-            if '.git' in root:
-                continue
-
-            for file in files:
-                if file.endswith('.py'):
-                    file_path = os.path.join(root, file)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            content = f.read()
-
-                        # Find function and class definitions
-                        tree = ast.parse(content)
-                        for node in ast.walk(tree):
-                            if isinstance(node, ast.FunctionDef):
-                                func_name = node.name
-                                # Simple heuristic: if function name appears only once, might be dead
-                                if content.count(func_name) == 1 and not func_name.startswith('_'):
-                                    dead_code.append({
-                                        'type': 'function',
-                                        'name': func_name,
-                                        'file': file_path.replace(self.repo_path, '').replace('\\', '/'),
-                                        'line': node.lineno
-                                    })
-                    except:
-                        pass
-
-        return dead_code[:10]  # Return top 10
+        return self._scan(DeadCodeDetector())['dead_code']
 
     def find_commented_code(self):
         """Find commented-out code that's been there for a while."""
-        commented_fossils = []
-
-        for root, dirs, files in os.walk(self.repo_path):
-            if '.git' in root:
-                continue
-
-            for file in files:
-                if file.endswith(('.py', '.js', '.ts', '.java', '.cpp', '.c')):
-                    file_path = os.path.join(root, file)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            lines = f.readlines()
-
-                        # Look for lines with commented code (heuristic: contains =, (, {, etc.)
-                        for i, line in enumerate(lines, 1):
-                            stripped = line.strip()
-                            if stripped.startswith('#') or stripped.startswith('//'):
-                                # Check if it looks like code (has =, (, etc.)
-                                if any(char in stripped for char in ['=', '(', '{', 'def ', 'function ', 'class ']):
-                                    commented_fossils.append({
-                                        'file': file_path.replace(self.repo_path, '').replace('\\', '/'),
-                                        'line': i,
-                                        'code': stripped[:100]  # Truncate long lines
-                                    })
-                    except:
-                        pass
-
-        return commented_fossils[:15]  # Return top 15
+        return self._scan(CommentedCodeDetector())['commented_code']
 
     def find_todos(self):
         """Find TODO comments throughout the codebase."""
-        todos = []
-
-        for root, dirs, files in os.walk(self.repo_path):
-            if '.git' in root:
-                continue
-
-            for file in files:
-                if file.endswith(('.py', '.js', '.ts', '.java', '.cpp', '.c', '.go', '.rs')):
-                    file_path = os.path.join(root, file)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            lines = f.readlines()
-
-                        for i, line in enumerate(lines, 1):
-                            if re.search(r'TODO|FIXME|HACK|XXX', line, re.IGNORECASE):
-                                todos.append({
-                                    'file': file_path.replace(self.repo_path, '').replace('\\', '/'),
-                                    'line': i,
-                                    'text': line.strip()[:150]
-                                })
-                    except:
-                        pass
-
-        return todos[:20]  # Return top 20
+        return self._scan(TodoDetector())['todos']
 
     def find_oldest_code(self):
         """Find the oldest lines of code still in the repository."""
-        oldest_files = []
-
+        return self.analyze_code_age()['oldest_code']
+
+    @timed('blame')
+    def analyze_code_age(self):
+        """
+        Blame every file at HEAD (or the excavated commit) to find the files
+        holding the oldest surviving lines, plus a histogram of line ages
+        across the whole repository (or the files include/exclude select).
+        """
         try:
-            # Get all commits
-            commits = list(self.repo.iter_commits())
-            if not commits:
-                return []
-
-            # Get files from the first commit
-            first_commit = commits[-1]
-
-            for item in first_commit.tree.traverse():
-                if item.type == 'blob':
-                    # Check if this file still exists
-                    file_path = item.path
-                    full_path = os.path.join(self.repo_path, file_path)
-
-                    if os.path.exists(full_path):
-                        oldest_files.append({
-                            'file': file_path,
-                            'first_commit_date': datetime.fromtimestamp(first_commit.committed_date).strftime('%Y-%m-%d'),
-                            'first_commit_message': first_commit.message.strip()[:100],
-                            'age_days': (datetime.now() - datetime.fromtimestamp(first_commit.committed_date)).days
-                        })
-
-            # Sort by age
-            oldest_files.sort(key=lambda x: x['age_days'], reverse=True)
-            return oldest_files[:10]
-        except:
+            engine = BlameEngine(self.repo_path, max_workers=self.blame_workers, cache=self.cache)
+            oldest, histogram = engine.summarize(
+                rev=self.rev or 'HEAD', top=10, include=self.include, exclude=self.exclude
+            )
+        except Exception:
+            return {'oldest_code': [], 'code_age': {'total_lines': 0, 'buckets': []}}
+
+        now = datetime.now()
+        oldest_code = []
+        for author_time, path, line, sha, summary in oldest:
+            introduced = datetime.fromtimestamp(author_time)
+            oldest_code.append({
+                'file': path,
+                'line': line,
+                'commit': sha[:8],
+                'first_commit_date': introduced.strftime('%Y-%m-%d'),
+                'first_commit_message': summary.strip()[:100],
+                'age_days': (now - introduced).days
+            })
+
+        code_age = {
+            'total_lines': sum(histogram),
+            'buckets': [{'label': label, 'lines': lines} for (label, _), lines in zip(AGE_BUCKETS, histogram)]
+        }
+        return {'oldest_code': oldest_code, 'code_age': code_age}
+
+    def find_oldest_files(self):
+        """Find the surviving files that were added to the repository earliest."""
+        return self._file_ages()[:10]
+
+    @timed('file_ages')
+    def _file_ages(self):
+        """
+        Every current file, oldest first, dated by the commit that introduced
+        it (following renames) from a stored path index brought up to date
+        with a single pass over the new commits.
+        """
+        rev = self.rev or 'HEAD'
+        try:
+            index = PathIndex.load(self.repo_path, rev, self.cache)
+            paths = [path for path, _ in list_tree(self.repo_path, rev, self.include, self.exclude)]
+        except Exception:
             return []
 
+        now = datetime.now()
+        ages = []
+        for path in paths:
+            stamp = index.introduced(path)
+            if stamp is None:
+                continue  # Only in a partial index (index.complete is False): the budget ran out
+            introduced = datetime.fromtimestamp(stamp[1])
+            ages.append((stamp[1], path, {
+                'file': path,
+                'commit': stamp[0][:8],
+                'introduced': introduced.strftime('%Y-%m-%d'),
+                'age_days': (now - introduced).days
+            }))
+        ages.sort(key=lambda age: age[:2])
+        return [item for _, _, item in ages]
+
+    @timed('timeline')
     def get_repository_timeline(self):
         """Get a timeline of major events in the repository."""
         timeline = []
 
         try:
-            commits = list(self.repo.iter_commits())
-
-            # Sample commits throughout history
-            step = max(len(commits) // 20, 1)  # Get ~20 samples
-
-            for commit in commits[::step]:
+            for commit in self._sampled_commits():
                 timeline.append({
-                    'date': datetime.fromtimestamp(commit.committed_date).strftime('%Y-%m-%d'),
-                    'message': commit.message.strip()[:100],
-                    'author': commit.author.name,
-                    'files_changed': len(commit.stats.files)
+                    'date': datetime.fromtimestamp(commit['timestamp']).strftime('%Y-%m-%d'),
+                    'message': commit['message'].strip()[:100],
+                    'author': commit['author'],
+                    'files_changed': len(commit['files'])
                 })
 
             return timeline
         except:
             return []
 
+    def _sampled_commits(self):
+        """~20 commits evenly spaced through history (newest first), streamed rather than loaded."""
+        if self._samples is None:
+            self._samples = sample_commits(self.repo_path, samples=20, rev=self.rev or 'HEAD')
+        return self._samples
+
+    @timed('complexity_history')
+    def analyze_complexity_history(self):
+        """
+        Complexity scores of the hottest files at each commit sampled for the
+        timeline, oldest first. Only blobs that changed between samples are
+        analyzed again.
+        """
+        detector = ComplexityHeatmapDetector()
+        try:
+            commits = self._sampled_commits()[::-1]
+            # Shorter than commits if the budget ran out
+            snapshots = [
+                results for _, results in scan_history(
+                    self.repo_path, [detector], [commit['sha'] for commit in commits],
+                    workers=self.workers, cache=self.cache, include=self.include, exclude=self.exclude
+                )
+            ]
+            files = detector.history(snapshots)
+        except Exception:
+            return {'commits': [], 'files': []}
+
+        return {
+            'commits': [
+                {'commit': commit['sha'][:8], 'date': datetime.fromtimestamp(commit['timestamp']).strftime('%Y-%m-%d')}
+                for commit in commits[:len(snapshots)]
+            ],
+            'files': files
+        }
+
     def get_hall_of_shame(self):
         """Find the most complex/longest functions."""
-        hall_of_shame = []
-
-        for root, dirs, files in os.walk(self.repo_path):
-            if '.git' in root:
-                continue
-
-            for file in files:
-                if file.endswith('.py'):
-                    file_path = os.path.join(root, file)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            content = f.read()
-                            lines = content.split('\n')
-
-                        tree = ast.parse(content)
-                        for node in ast.walk(tree):
-                            if isinstance(node, ast.FunctionDef):
-                                # Calculate function length
-                                func_start = node.lineno
-                                func_end = node.end_lineno if hasattr(node, 'end_lineno') else func_start
-                                length = func_end - func_start
-
-                                if length > 30:  # Functions longer than 30 lines
-                                    hall_of_shame.append({
-                                        'type': 'long_function',
-                                        'name': node.name,
-                                        'file': file_path.replace(self.repo_path, '').replace('\\', '/'),
-                                        'line': node.lineno,
-                                        'length': length
-                                    })
-                    except:
-                        pass
-
-        # Sort by length
-        hall_of_shame.sort(key=lambda x: x['length'], reverse=True)
-        return hall_of_shame[:10]
+        return self._scan(HallOfShameDetector())['hall_of_shame']
 
     def analyze_complexity_heatmap(self):
         """Analyze file complexity for heatmap visualization."""
-        file_complexity = []
-
-        for root, dirs, files in os.walk(self.repo_path):
-            if '.git' in root or 'node_modules' in root or '__pycache__' in root:
-                continue
-
-            for file in files:
-                # Support multiple file types
-                if file.endswith(('.py', '.js', '.jsx', '.ts', '.tsx', '.java', '.cpp', '.c', '.h')):
-                    file_path = os.path.join(root, file)
-                    relative_path = file_path.replace(self.repo_path, '').replace('\\', '/').lstrip('/')
-
-                    try:
-                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            content = f.read()
-                            lines = content.split('\n')
-
-                        # Calculate complexity metrics
-                        loc = len([line for line in lines if line.strip() and not line.strip().startswith('#')])
-
-                        # Count decision points (if, for, while, case, etc.)
-                        decisions = (
-                            content.count(' if ') + content.count(' if(') +
-                            content.count(' for ') + content.count(' for(') +
-                            content.count(' while ') + content.count(' while(') +
-                            content.count(' case ') + content.count(' switch') +
-                            content.count(' catch') + content.count(' &&') + content.count(' ||')
-                        )
-
-                        # Count nesting depth (approximation using indentation)
-                        max_indent = 0
-                        for line in lines:
-                            if line.strip():
-                                indent = len(line) - len(line.lstrip())
-                                max_indent = max(max_indent, indent // 4)  # Assuming 4-space indents
-
-                        # Calculate complexity score
-                        # Formula: weighted sum of metrics
-                        complexity_score = (
-                            (loc * 0.5) +           # Lines of code
-                            (decisions * 3) +        # Decision points (higher weight)
-                            (max_indent * 5)         # Nesting depth (highest weight)
-                        )
-
-                        # Categorize complexity
-                        if complexity_score < 50:
-                            complexity_level = 'low'
-                        elif complexity_score < 150:
-                            complexity_level = 'medium'
-                        elif complexity_score < 300:
-                            complexity_level = 'high'
-                        else:
-                            complexity_level = 'critical'
-
-                        file_complexity.append({
-                            'file': relative_path,
-                            'loc': loc,
-                            'decisions': decisions,
-                            'max_depth': max_indent,
-                            'score': round(complexity_score, 2),
-                            'level': complexity_level
-                        })
-                    except:
-                        pass
-
-        # Sort by complexity score
-        file_complexity.sort(key=lambda x: x['score'], reverse=True)
-        return file_complexity[:30]  # Return top 30 files
+        return self._scan(ComplexityHeatmapDetector())['complexity_heatmap']
+
+    def find_duplicate_code(self):
+        """Find blocks of code copied between (or within) files."""
+        return self._scan(DuplicateCodeDetector())['duplicate_code']
+
+    def find_hotspots(self):
+        """Find complex files that also change often."""
+        return self._hotspots(self._scan(ComplexityHeatmapDetector(), complete=True)['complexity_heatmap'])[:HOTSPOT_LIMIT]
+
+    @timed('hotspots')
+    def _hotspots(self, scored):
+        """Rank the scored heatmap files by churn from one pass over the history."""
+        try:
+            churn = ChurnIndex.from_history(self.repo_path, self.rev or 'HEAD', pathspecs(self.include, self.exclude))
+        except Exception:
+            return []
+        return churn.hotspots(scored, limit=None)
+
+    @timed('scan')
+    def _scan(self, *detectors, complete=False):
+        """Run the given detectors over the working tree (or the excavated commit) in a single pass."""
+        return scan(
+            self.repo_path, detectors, workers=self.workers, cache=self.cache,
+            include=self.include, exclude=self.exclude, rev=self.rev, complete=complete
+        )
+
+    def iter_excavate(self):
+        """
+        Yield (category, artifacts) pairs as each part of the dig completes.
+        Ranked categories yield their top findings; all of them are kept in
+        self.complete.
+
+        Each part runs within stage_seconds (and whatever is left of the
+        current budget) and yields what it finished in time; the parts cut
+        short are listed in the current budget's timed_out.
+        """
+        # Every content detector shares one pass over the files
+        detectors = [detector() for detector in CONTENT_DETECTORS]
+        with within('scan', self.stage_seconds):
+            scanned = self._scan(*detectors, complete=True)
+        for detector in detectors:
+            self.complete[detector.name] = scanned[detector.name]
+            yield detector.name, scanned[detector.name][:detector.limit]
+
+        with within('hotspots', self.stage_seconds):
+            self.complete['hotspots'] = self._hotspots(scanned['complexity_heatmap'])
+        yield 'hotspots', self.complete['hotspots'][:HOTSPOT_LIMIT]
+
+        with within('timeline', self.stage_seconds):
+            timeline = self.get_repository_timeline()
+        yield 'timeline', timeline
+        with within('complexity_history', self.stage_seconds):
+            complexity_history = self.analyze_complexity_history()
+        yield 'complexity_history', complexity_history
+
+        with within('blame', self.stage_seconds):
+            code_age = self.analyze_code_age()
+        yield 'oldest_code', code_age['oldest_code']
+        yield 'code_age', code_age['code_age']
+
+        with within('file_ages', self.stage_seconds):
+            self.complete['oldest_files'] = self._file_ages()
+        yield 'oldest_files', self.complete['oldest_files'][:10]
 
     def excavate(self):
         """Run full archaeological dig and return all artifacts."""
         print("Starting archaeological excavation...")
 
-        artifacts = {
-            'dead_code': self.find_dead_code(),
-            'commented_code': self.find_commented_code(),
-            'todos': self.find_todos(),
-            'oldest_code': self.find_oldest_code(),
-            'timeline': self.get_repository_timeline(),
-            'hall_of_shame': self.get_hall_of_shame(),
-            'complexity_heatmap': self.analyze_complexity_heatmap()
-        }
+        artifacts = dict(self.iter_excavate())
 
         print(f"Excavation complete! Found {sum(len(v) if isinstance(v, list) else 0 for v in artifacts.values())} artifacts")
 
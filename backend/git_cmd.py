@@ -0,0 +1,72 @@
+import subprocess
+from metrics import record_git
+
+
+class GitCommandError(Exception):
+    """Raised when a git subprocess exits with a non-zero status."""
+
+
+def git_output(repo_path, *args, input=None, env=None):
+    """Run a git command in repo_path and return its stdout as bytes."""
+    record_git(args[0])
+    result = subprocess.run(
+        ['git', '-C', repo_path, *args],
+        input=input,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=env,
+    )
+    if result.returncode != 0:
+        raise GitCommandError(result.stderr.decode('utf-8', errors='ignore').strip())
+    return result.stdout
+
+
+def object_sizes(repo_path, shas):
+    """{sha: size in bytes} of the given objects, from one `git cat-file --batch-check`."""
+    if not shas:
+        return {}
+    output = git_output(repo_path, 'cat-file', '--batch-check', input='\n'.join(shas).encode() + b'\n')
+    sizes = {}
+    for line in output.decode().split('\n'):
+        fields = line.split(' ')
+        if len(fields) == 3:
+            sizes[fields[0]] = int(fields[2])
+    return sizes
+
+
+class CatFile:
+    """
+    A long-lived `git cat-file --batch` process, so reading any number of
+    blobs from the object database costs a single git process.
+    """
+
+    def __init__(self, repo_path):
+        record_git('cat-file')
+        self.process = subprocess.Popen(
+            ['git', '-C', repo_path, 'cat-file', '--batch'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def read(self, sha):
+        """Return the content of an object."""
+        self.process.stdin.write(sha.encode() + b'\n')
+        self.process.stdin.flush()
+        header = self.process.stdout.readline()
+        if not header or header.endswith(b' missing\n'):
+            raise GitCommandError(f'Object {sha} is missing')
+        size = int(header.split()[2])
+        data = self.process.stdout.read(size)
+        self.process.stdout.read(1)  # Newline after the content
+        return data
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,191 @@
+import subprocess
+from git_cmd import GitCommandError, git_output
+from metrics import record_git
+
+# Field and record separators used in our `git log` format
+FIELD_SEP = b'\x1f'
+RECORD_SEP = b'\x1e'
+LOG_FORMAT = '--format=%x1e%H%x1f%P%x1f%ct%x1f%an%x1f%B%x1f'
+
+# Diff options matching GitPython's Commit.stats (first parent, no rename detection)
+NUMSTAT_ARGS = ('--numstat', '--no-renames', '--diff-merges=first-parent')
+
+# Added, deleted, renamed (-M) and copied paths of each commit
+NAME_STATUS_ARGS = ('--name-status', '-M', '--diff-merges=first-parent')
+
+
+# Backslash escapes git uses when quoting paths
+_ESCAPES = {'a': '\a', 'b': '\b', 't': '\t', 'n': '\n', 'v': '\v', 'f': '\f', 'r': '\r', '"': '"', '\\': '\\'}
+
+
+def unquote_path(path):
+    """Undo git's C-style quoting of unusual paths in diff output."""
+    if not (len(path) >= 2 and path[0] == '"' and path[-1] == '"'):
+        return path
+
+    body = path[1:-1]
+    raw = bytearray()
+    i = 0
+    while i < len(body):
+        if body[i] == '\\' and i + 1 < len(body):
+            escape = body[i + 1]
+            if escape in '01234567':
+                raw.append(int(body[i + 1:i + 4], 8))
+                i += 4
+            else:
+                raw += _ESCAPES.get(escape, escape).encode()
+                i += 2
+        else:
+            raw += body[i].encode()
+            i += 1
+    return raw.decode('utf-8', errors='replace')
+
+
+def parse_numstat(text):
+    """Parse `git log --numstat` lines into (added, removed, path) tuples."""
+    files = []
+    for line in text.split('\n'):
+        if not line:
+            continue
+        added, removed, path = line.split('\t', 2)
+        # Binary files report '-' for both counts
+        files.append((
+            int(added) if added != '-' else 0,
+            int(removed) if removed != '-' else 0,
+            unquote_path(path)
+        ))
+    return files
+
+
+def parse_name_status(text):
+    """
+    Parse `git log --name-status` lines into (status letter, path, source
+    path) tuples; the source is the old path of renames and copies, else None.
+    """
+    files = []
+    for line in text.split('\n'):
+        if not line:
+            continue
+        fields = line.split('\t')
+        status = fields[0][:1]
+        if status in ('R', 'C') and len(fields) == 3:
+            files.append((status, unquote_path(fields[2]), unquote_path(fields[1])))
+        else:
+            files.append((status, unquote_path(fields[-1]), None))
+    return files
+
+
+def _parse_record(record, parse_files=parse_numstat):
+    """Turn one raw log record into a commit dict."""
+    sha, parents, timestamp, author, message, rest = record.split(FIELD_SEP, 5)
+    return {
+        'sha': sha.decode(),
+        'parents': parents.decode().split(),
+        'timestamp': int(timestamp),
+        'author': author.decode('utf-8', errors='replace'),
+        'message': message.decode('utf-8', errors='replace'),
+        'files': parse_files(rest.decode('utf-8', errors='replace').strip('\n')),
+    }
+
+
+def iter_log(repo_path, *args, numstat=False, name_status=False, stdin=None, chunk_size=64 * 1024):
+    """
+    Stream commits from a single `git log` process.
+
+    Output is parsed incrementally as it arrives, so memory use stays flat no
+    matter how long the history is. Yields dicts with sha, parents, timestamp,
+    author, message and files (a list of (added, removed, path) tuples, only
+    filled when numstat is True, or of parse_name_status tuples with
+    name_status). Extra args are passed straight to git log.
+    """
+    command = ['git', '-C', repo_path, '-c', 'core.quotePath=false', 'log', LOG_FORMAT]
+    if numstat:
+        command.extend(NUMSTAT_ARGS)
+    elif name_status:
+        command.extend(NAME_STATUS_ARGS)
+    parse_files = parse_name_status if name_status else parse_numstat
+    command.extend(args)
+
+    record_git('log')
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE if stdin is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    try:
+        if stdin is not None:
+            process.stdin.write(stdin)
+            process.stdin.close()
+
+        buffer = b''
+        while True:
+            chunk = process.stdout.read(chunk_size)
+            if not chunk:
+                break
+            buffer += chunk
+            records = buffer.split(RECORD_SEP)
+            # The last piece may be an incomplete record; keep it for the next chunk
+            buffer = records.pop()
+            for record in records:
+                if record:
+                    yield _parse_record(record, parse_files)
+        if buffer:
+            yield _parse_record(buffer, parse_files)
+
+        if process.wait() != 0:
+            raise GitCommandError(process.stderr.read().decode('utf-8', errors='ignore').strip())
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def iter_revisions(repo_path, rev='HEAD'):
+    """Stream commit SHAs reachable from rev (newest first) from one `git rev-list`."""
+    record_git('rev-list')
+    process = subprocess.Popen(
+        ['git', '-C', repo_path, 'rev-list', rev],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        for line in process.stdout:
+            yield line.strip().decode()
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        process.stdout.close()
+
+
+def count_commits(repo_path, rev='HEAD'):
+    """Number of commits reachable from rev, without listing them."""
+    return int(git_output(repo_path, 'rev-list', '--count', rev))
+
+
+def commits_with_stats(repo_path, shas):
+    """Fetch numstat details for specific commits in one `git log --no-walk` call."""
+    if not shas:
+        return []
+    stdin = '\n'.join(shas).encode() + b'\n'
+    return list(iter_log(repo_path, '--no-walk=unsorted', '--stdin', numstat=True, stdin=stdin))
+
+
+def sample_commits(repo_path, samples=20, rev='HEAD'):
+    """
+    Pick about `samples` evenly spaced commits from the history (newest first)
+    and return them with their file stats.
+
+    The commit SHAs are streamed once to choose the samples, then diffs are
+    computed only for the chosen commits.
+    """
+    total = count_commits(repo_path, rev)
+    if not total:
+        return []
+
+    step = max(total // samples, 1)
+    chosen = [sha for i, sha in enumerate(iter_revisions(repo_path, rev)) if i % step == 0]
+    return commits_with_stats(repo_path, chosen)
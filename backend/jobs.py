@@ -0,0 +1,189 @@
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from analysis import AnalysisError, iter_analysis
+from budget import Budget, limiting
+
+
+class Job:
+    """A single queued analysis and everything we know about its progress."""
+
+    def __init__(self, key, params):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.params = params
+        self.status = 'queued'
+        self.progress = {'stage': 'queued', 'artifacts': [], 'stories': []}
+        self.result = None
+        self.error = None
+        self.error_type = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Cancelling it asks the running analysis to stop and return what it has
+        self.budget = Budget()
+        # Every event of the analysis so far, for the requests following it
+        self.events = []
+        self._changed = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in ('succeeded', 'failed', 'cancelled')
+
+    def publish(self, event):
+        with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    def finish(self, status):
+        with self._changed:
+            self.status = status
+            self.finished_at = time.time()
+            self._changed.notify_all()
+
+    def iter_events(self):
+        """Yield every event of the job, past ones first, then as they happen until it finishes."""
+        seen = 0
+        while True:
+            with self._changed:
+                while seen == len(self.events) and not self.finished:
+                    self._changed.wait()
+                events = self.events[seen:]
+                finished = self.finished
+            seen += len(events)
+            yield from events
+            if finished and seen == len(self.events):
+                return
+
+    def wait(self):
+        """Block until the job has finished."""
+        with self._changed:
+            while not self.finished:
+                self._changed.wait()
+
+    def to_dict(self):
+        """Status summary (without the result payload)."""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'progress': self.progress,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class JobManager:
+    """
+    Runs analyses on a fixed-size worker pool.
+
+    Submitting a repository that already has a queued or running job returns
+    that job instead of starting another, so concurrent requests for the same
+    repository share one clone and one excavation (a refresh only joins
+    another refresh). Finished jobs are kept for at most `retention_seconds`
+    and at most `max_finished` of them.
+    """
+
+    def __init__(self, max_workers=2, max_finished=100, retention_seconds=60 * 60, runner=iter_analysis):
+        self.max_finished = max_finished
+        self.retention_seconds = retention_seconds
+        self.runner = runner
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis')
+        self._jobs = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, **params):
+        """Queue an analysis; returns (job, created) where created is False for a shared job."""
+        with self._lock:
+            self._prune()
+            job_id = self._in_flight.get(key)
+            # A refresh must not be answered by a job that may serve a cached result
+            if job_id is not None and (self._jobs[job_id].params.get('refresh') or not params.get('refresh')):
+                return self._jobs[job_id], False
+
+            job = Job(key, params)
+            self._jobs[job.id] = job
+            self._in_flight[key] = job.id
+
+        self._pool.submit(self._run, job)
+        return job, True
+
+    def get(self, job_id):
+        """Look a job up by id, or None if it is unknown or has expired."""
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Ask a queued or running job to stop; a running analysis returns what
+        it finished so far. Returns the job, or None if it is unknown.
+        """
+        job = self.get(job_id)
+        if job is not None and not job.finished:
+            job.budget.cancel()
+            with self._lock:
+                # New submissions for the repository start afresh rather than join this job
+                if self._in_flight.get(job.key) == job.id:
+                    del self._in_flight[job.key]
+        return job
+
+    def _run(self, job):
+        if job.budget.cancelled:
+            job.finish('cancelled')
+            return
+        job.status = 'running'
+        job.started_at = time.time()
+        status = 'failed'
+        try:
+            with limiting(job.budget):
+                for event in self.runner(**job.params):
+                    if event['event'] == 'status':
+                        job.progress['stage'] = event['stage']
+                    elif event['event'] == 'artifact':
+                        job.progress['artifacts'].append(event['category'])
+                    elif event['event'] == 'story':
+                        job.progress['stories'].append(event['key'])
+                    elif event['event'] == 'result':
+                        job.result = event['data']
+                    job.publish(event)
+            job.progress['stage'] = 'done'
+            status = 'cancelled' if job.budget.cancelled else 'succeeded'
+        except AnalysisError as e:
+            job.error = str(e)
+            job.error_type = 'request'
+        except Exception as e:
+            print(f"Error during analysis job {job.id}: {str(e)}")
+            traceback.print_exc()
+            job.error = f'Analysis failed: {str(e)}'
+            job.error_type = 'internal'
+        finally:
+            with self._lock:
+                if self._in_flight.get(job.key) == job.id:
+                    del self._in_flight[job.key]
+            job.finish(status)
+            with self._lock:
+                self._prune()
+
+    def _prune(self):
+        """Forget finished jobs past their retention time or beyond the retention count."""
+        now = time.time()
+        finished = [job for job in self._jobs.values() if job.finished]
+        excess = len(finished) - self.max_finished
+        for job in finished:
+            if excess > 0 or now - job.finished_at > self.retention_seconds:
+                del self._jobs[job.id]
+                excess -= 1
+
+    def stats(self):
+        """Number of jobs in each state."""
+        with self._lock:
+            counts = {'queued': 0, 'running': 0, 'succeeded': 0, 'failed': 0, 'cancelled': 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return counts
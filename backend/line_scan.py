@@ -0,0 +1,47 @@
+import os
+import re
+
+# Files larger than this are not scanned line by line (bundles, generated sources, data dumps)
+MAX_SCAN_BYTES = int(os.getenv('SCAN_MAX_FILE_KB', 1024)) * 1024
+
+# A NUL byte in this many leading bytes marks a file as binary (the same heuristic git uses)
+BINARY_SNIFF_BYTES = 8000
+
+# Everything that could make a line a TODO or a commented-out code finding,
+# matched against lowercased bytes: plain literals let the regex engine skip
+# ahead quickly, where re.IGNORECASE would test every byte. Matching lines are
+# classified by the detectors afterwards.
+CANDIDATE = re.compile(rb'#|//|todo|fixme|hack|xxx')
+
+
+def find_candidate_lines(buffer, max_bytes=MAX_SCAN_BYTES):
+    """
+    Return (line number, line) for every line of a bytes buffer that matches
+    CANDIDATE.
+
+    A single regex is run over the whole (lowercased) buffer; only lines with
+    a hit are decoded, and line numbers are counted only up to each hit.
+    Empty, binary and oversized buffers have no lines.
+    """
+    size = len(buffer)
+    if size == 0 or size > max_bytes or buffer.find(b'\0', 0, BINARY_SNIFF_BYTES) != -1:
+        return []
+
+    lowered = buffer.lower()
+    hits = []
+    line_number = 1
+    counted = 0  # Newlines before this offset are already in line_number
+    match = CANDIDATE.search(lowered)
+    while match:
+        start = lowered.rfind(b'\n', 0, match.start()) + 1
+        end = lowered.find(b'\n', match.end())
+        if end == -1:
+            end = size
+
+        line_number += lowered.count(b'\n', counted, start)
+        counted = start
+        hits.append((line_number, buffer[start:end].decode('utf-8', errors='ignore')))
+
+        # Continue on the next line; a line is reported once however many hits it has
+        match = CANDIDATE.search(lowered, end + 1)
+    return hits
@@ -0,0 +1,276 @@
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (in seconds) of the duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing count per combination of label values."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Observed values counted into cumulative buckets, per combination of label values."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    samples.append((f'{self.name}_bucket', key + (bound,), count))
+                samples.append((f'{self.name}_bucket', key + ('+Inf',), series[-1]))
+                samples.append((f'{self.name}_sum', key, series[-2]))
+                samples.append((f'{self.name}_count', key, series[-1]))
+        return samples
+
+
+class Registry:
+    """The process-wide metrics, rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=DURATION_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            names = metric.labels + (('le',) if metric.kind == 'histogram' else ())
+            for name, values, value in metric.samples():
+                lines.append(f'{name}{_labels(names[:len(values)], values)} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+HTTP_SECONDS = REGISTRY.histogram(
+    'archaeology_http_request_seconds', 'Time to serve an API request, until the response is closed',
+    ('method', 'endpoint', 'status')
+)
+STAGE_SECONDS = REGISTRY.histogram('archaeology_stage_seconds', 'Duration of each analysis stage', ('stage',))
+GIT_COMMANDS = REGISTRY.counter('archaeology_git_commands_total', 'git subprocesses started', ('command',))
+FILES_SCANNED = REGISTRY.counter('archaeology_files_scanned_total', 'Files read and analyzed by the detectors')
+BYTES_SCANNED = REGISTRY.counter('archaeology_bytes_scanned_total', 'Bytes of the files analyzed by the detectors')
+FILES_SKIPPED = REGISTRY.counter(
+    'archaeology_files_skipped_total', 'Files not analyzed for being too large or too slow', ('reason',)
+)
+LLM_SECONDS = REGISTRY.histogram('archaeology_llm_request_seconds', 'Latency of Claude API calls', ('outcome',))
+LLM_REQUESTS = REGISTRY.counter(
+    'archaeology_llm_requests_total', 'Story completions by outcome (ok, error or cached)', ('outcome',)
+)
+LLM_TOKENS = REGISTRY.counter('archaeology_llm_tokens_total', 'Tokens used by Claude API calls', ('direction',))
+
+
+class RequestMetrics:
+    """Stage durations and counters of a single analysis, for its response metadata."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.git_commands = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_git(self, command, amount=1):
+        with self._lock:
+            self.git_commands[command] = self.git_commands.get(command, 0) + amount
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'total_seconds': round(time.perf_counter() - self.started, 3),
+                'stages': {name: round(seconds, 3) for name, seconds in self.stages.items()},
+                'git_commands': sum(self.git_commands.values()),
+                **{name: round(value, 3) if isinstance(value, float) else value for name, value in self.counters.items()}
+            }
+
+
+# The analysis being measured on this thread (or None)
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def current():
+    """Metrics of the analysis running on this thread, or None."""
+    return _current.get()
+
+
+@contextmanager
+def recording(recorder):
+    """Attribute everything recorded in the block to recorder (a RequestMetrics)."""
+    previous = _current.get()
+    # Restore explicitly rather than with a token: the block may span generator yields
+    _current.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current.set(previous)
+
+
+def track_request():
+    """Start measuring a new analysis; use as `with track_request() as recorder:`."""
+    return recording(RequestMetrics())
+
+
+def bind(function):
+    """
+    Wrap function so it runs in the caller's analysis when run on a worker
+    thread: it records into its metrics and honours its time budget.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(function)
+    def run(*args, **kwargs):
+        # A context can only be entered by one thread at a time
+        return context.copy().run(function, *args, **kwargs)
+    return run
+
+
+@contextmanager
+def stage(name):
+    """Time the block as an analysis stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        recorder = _current.get()
+        if recorder is not None:
+            recorder.add_stage(name, elapsed)
+
+
+def timed(name):
+    """Decorator timing every call of a function as the given stage."""
+    def decorate(function):
+        @functools.wraps(function)
+        def run(*args, **kwargs):
+            with stage(name):
+                return function(*args, **kwargs)
+        return run
+    return decorate
+
+
+def record_git(command, count=1):
+    """Count git subprocesses started for a command (log, blame, cat-file, ...)."""
+    GIT_COMMANDS.inc(count, command=command)
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.add_git(command, count)
+
+
+def record_scan(files, size):
+    """Count files (and their bytes) read and analyzed by the detectors."""
+    FILES_SCANNED.inc(files)
+    BYTES_SCANNED.inc(size)
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.add('files_scanned', files)
+        recorder.add('bytes_scanned', size)
+
+
+def record_llm(outcome, seconds=None, input_tokens=0, output_tokens=0):
+    """Record one story completion: its outcome, latency and token usage."""
+    LLM_REQUESTS.inc(outcome=outcome)
+    if seconds is not None:
+        LLM_SECONDS.observe(seconds, outcome=outcome)
+    LLM_TOKENS.inc(input_tokens, direction='input')
+    LLM_TOKENS.inc(output_tokens, direction='output')
+
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.add(f'llm_{outcome}')
+        if seconds is not None:
+            recorder.add('llm_seconds', seconds)
+        recorder.add('llm_input_tokens', input_tokens)
+        recorder.add('llm_output_tokens', output_tokens)
+
+
+def record_skip(reason, files=1):
+    """Count files left unanalyzed because they were too large or too slow to analyze."""
+    FILES_SKIPPED.inc(files, reason=reason)
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.add(f'files_skipped_{reason}', files)
+
+
+def merge(git_commands, counters):
+    """Add what a pool worker process recorded (a RequestMetrics' git_commands and counters) to this process."""
+    for command, count in git_commands.items():
+        record_git(command, count)
+    if 'files_scanned' in counters:
+        record_scan(counters['files_scanned'], counters.get('bytes_scanned', 0))
+    for name, count in counters.items():
+        if name.startswith('files_skipped_'):
+            record_skip(name[len('files_skipped_'):], count)
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from git_cmd import git_output
+
+
+def normalize_url(url):
+    """Normalized remote URL, so equivalent spellings share one mirror."""
+    url = url.strip().rstrip('/')
+    if url.endswith('.git'):
+        url = url[:-4]
+    return url
+
+
+def _dir_size(path):
+    """Total size in bytes of the files below path."""
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for file in files:
+            try:
+                total += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                pass
+    return total
+
+
+class MirrorStore:
+    """
+    Persistent bare mirrors of remote repositories.
+
+    The first request for a remote makes a `git clone --mirror`; later ones
+    only `git fetch` what changed. Analyses read straight from the mirror's
+    object database, without a checkout. Each mirror has its own lock so
+    concurrent requests for the same remote don't fetch over each other, and
+    the store is kept under a disk quota by evicting the least recently used
+    idle mirrors.
+    """
+
+    def __init__(self, root, max_bytes=10 * 1024 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.mirrors_dir = os.path.join(root, 'mirrors')
+        os.makedirs(self.mirrors_dir, exist_ok=True)
+
+        self._index_path = os.path.join(root, 'mirrors.json')
+        self._lock = threading.Lock()  # Guards the index, repo locks and user counts
+        self._repo_locks = {}
+        self._users = {}
+        self._index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self._index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        # Forget mirrors that have disappeared from disk
+        return {key: entry for key, entry in index.items() if os.path.isdir(self._mirror_path(key))}
+
+    def _save_index(self):
+        temp_path = self._index_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(temp_path, self._index_path)
+
+    def _key(self, url):
+        return hashlib.sha1(normalize_url(url).encode()).hexdigest()[:20]
+
+    def _mirror_path(self, key):
+        return os.path.join(self.mirrors_dir, f'{key}.git')
+
+    def _repo_lock(self, key):
+        with self._lock:
+            return self._repo_locks.setdefault(key, threading.Lock())
+
+    def sync(self, url):
+        """Create or refresh the mirror of url and return its path."""
+        key = self._key(url)
+        path = self._mirror_path(key)
+
+        with self._repo_lock(key):
+            if os.path.isdir(path):
+                git_output(path, 'fetch', '--prune', '--quiet', 'origin')
+            else:
+                # Clone next to the final location and move it into place once complete
+                temp_path = tempfile.mkdtemp(dir=self.mirrors_dir, prefix=f'{key}.tmp-')
+                try:
+                    git_output(self.mirrors_dir, 'clone', '--mirror', '--quiet', '--', url, temp_path)
+                    os.rename(temp_path, path)
+                except Exception:
+                    shutil.rmtree(temp_path, ignore_errors=True)
+                    raise
+
+            size = _dir_size(path)
+            with self._lock:
+                self._index[key] = {'url': url, 'last_used': time.time(), 'bytes': size}
+                self._save_index()
+
+        self.evict()
+        return path
+
+    @contextmanager
+    def use(self, url):
+        """Sync the mirror of url and yield its path, keeping it from being evicted meanwhile."""
+        key = self._key(url)
+        with self._lock:
+            # Mirrors with active users are never evicted
+            self._users[key] = self._users.get(key, 0) + 1
+        try:
+            yield self.sync(url)
+        finally:
+            with self._lock:
+                self._users[key] -= 1
+
+    def evict(self, max_bytes=None):
+        """
+        Remove least recently used idle mirrors until the store fits in
+        max_bytes (the configured quota by default). Returns the evicted URLs.
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        victims = []
+
+        with self._lock:
+            total = sum(entry['bytes'] for entry in self._index.values())
+            for key, entry in sorted(self._index.items(), key=lambda item: item[1]['last_used']):
+                if total <= limit:
+                    break
+                if self._users.get(key):
+                    continue
+                # Skip mirrors that are being fetched right now
+                lock = self._repo_locks.setdefault(key, threading.Lock())
+                if not lock.acquire(blocking=False):
+                    continue
+                victims.append((key, entry['url'], lock))
+                total -= entry['bytes']
+                del self._index[key]
+            if victims:
+                self._save_index()
+
+        for key, _, lock in victims:
+            try:
+                shutil.rmtree(self._mirror_path(key), ignore_errors=True)
+            finally:
+                lock.release()
+
+        return [url for _, url, _ in victims]
+
+    def stats(self):
+        """Mirrors currently held and the space they use."""
+        with self._lock:
+            return {
+                'mirrors': len(self._index),
+                'bytes': sum(entry['bytes'] for entry in self._index.values()),
+                'max_bytes': self.max_bytes,
+                'repositories': sorted(entry['url'] for entry in self._index.values())
+            }
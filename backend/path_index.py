@@ -0,0 +1,98 @@
+import os
+from budget import expired
+from git_cmd import GitCommandError, git_output
+from history import iter_log
+
+# Bump when the stored index format changes
+INDEX_VERSION = '2'
+
+
+class PathIndex:
+    """
+    The commit and date each path was first introduced, following renames.
+
+    Built from one streaming `git log --reverse --first-parent --name-status
+    -M` pass, oldest commit first: added and copied paths are stamped with
+    their commit, renamed ones carry the stamp of their old path, and deleted
+    ones are dropped. A merged branch counts as its merge commit, whose diff
+    against the first parent is exactly what the merge changed. The index
+    remembers the last commit it has seen, so it can be stored and later
+    brought up to date from there instead of rebuilt.
+    """
+
+    def __init__(self, commit=None, paths=None):
+        # Last commit indexed
+        self.commit = commit
+        # path -> [commit sha, commit timestamp]
+        self.paths = paths if paths is not None else {}
+        # False while the last update was cut short by the budget
+        self.complete = True
+
+    def add(self, commit):
+        """Apply one commit, as yielded by history.iter_log with name_status."""
+        stamp = [commit['sha'], commit['timestamp']]
+        for status, path, source in commit['files']:
+            if status == 'D':
+                self.paths.pop(path, None)
+            elif status == 'R':
+                # A path already indexed (e.g. applied from a merged branch) keeps its stamp
+                self.paths[path] = self.paths.pop(source, None) or self.paths.get(path) or stamp
+            elif status != 'M':
+                # Added, copied (a new file, even though its lines are older) or changed type
+                self.paths.setdefault(path, stamp)
+        self.commit = commit['sha']
+
+    def update(self, repo_path, rev='HEAD'):
+        """
+        Index every commit of rev's first-parent chain that isn't indexed yet.
+        Returns False (leaving the index partial) if the current budget ran out.
+        """
+        head = git_output(repo_path, 'rev-parse', '--verify', f'{rev}^{{commit}}').decode().strip()
+        if head == self.commit:
+            return True
+        if self.commit and not is_ancestor(repo_path, self.commit, head):
+            # History was rewritten, or rev is behind the index: start over
+            self.commit, self.paths = None, {}
+
+        commits = f'{self.commit}..{head}' if self.commit else head
+        # Along the first-parent chain, oldest first, with each merge diffed against
+        # its first parent: a side branch counts as the merge that brought its changes
+        # in, so paths the merge kept are never dropped by a side-branch deletion
+        for commit in iter_log(repo_path, '--reverse', '--first-parent', commits, name_status=True):
+            if expired():
+                self.complete = False
+                return False
+            self.add(commit)
+        self.commit = head
+        self.complete = True
+        return True
+
+    @classmethod
+    def load(cls, repo_path, rev='HEAD', cache=None):
+        """
+        The index of repo_path as of rev: the stored one brought up to date,
+        or a new one. Complete indexes are stored back in the cache (a
+        DiskCache), one per repository.
+        """
+        key = f'path-index:{INDEX_VERSION}:{os.path.realpath(repo_path)}'
+        stored = cache.get(key) if cache is not None else None
+        index = cls(stored['commit'], stored['paths']) if stored else cls()
+
+        previous = index.commit
+        if index.update(repo_path, rev) and cache is not None and index.commit != previous:
+            cache.set(key, {'commit': index.commit, 'paths': index.paths})
+        return index
+
+    def introduced(self, path):
+        """(commit sha, timestamp) of the commit that introduced path, or None."""
+        stamp = self.paths.get(path)
+        return tuple(stamp) if stamp else None
+
+
+def is_ancestor(repo_path, ancestor, descendant):
+    """Whether ancestor is reachable from descendant (or missing, e.g. after a force push: False)."""
+    try:
+        git_output(repo_path, 'merge-base', '--is-ancestor', ancestor, descendant)
+        return True
+    except GitCommandError:
+        return False
@@ -0,0 +1,496 @@
+import ast
+import hashlib
+import multiprocessing
+import os
+import signal
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from budget import Budget, current, expired, limiting
+from detectors import ANALYZER_VERSION
+from git_cmd import CatFile, GitCommandError, git_output, object_sizes
+from line_scan import find_candidate_lines
+from metrics import merge, record_scan, record_skip, track_request
+
+# Tree object with no entries; diffing against it lists every file of a commit
+EMPTY_TREE = '4b825dc642cb6eb9a060e54bf8d69288fbee4904'
+
+# Files larger than this are not analyzed at all (minified bundles, generated code, data dumps)
+MAX_FILE_BYTES = int(os.getenv('ANALYZE_MAX_FILE_KB', 2048)) * 1024
+
+# Seconds the detectors may spend on one file before it is given up on (0 for no limit)
+FILE_TIME_LIMIT = float(os.getenv('FILE_TIME_LIMIT', 5))
+
+# Pool workers start from a clean server process rather than forking this one,
+# whose job, story and blame threads may be holding locks; it has the detectors loaded already
+POOL_CONTEXT = multiprocessing.get_context('forkserver')
+POOL_CONTEXT.set_forkserver_preload(['scanner'])
+
+
+class FileTimeout(BaseException):
+    """
+    Raised when a file takes longer than FILE_TIME_LIMIT to analyze. Not an
+    Exception, so the detectors' own error handling can't swallow it.
+    """
+
+
+class SourceFile:
+    """
+    A single file in the repository, read and parsed at most once. Its
+    content is read from disk, unless it is given as data (e.g. a blob read
+    from the object database); the same bytes are decoded for the detectors
+    and scanned for candidate lines.
+    """
+
+    def __init__(self, repo_path, path, data=None):
+        self.path = path
+        self.data = data
+        # Files read from disk get universal newlines, like open() in text mode
+        self._from_disk = data is None
+        self.relative_path = os.path.relpath(path, repo_path).replace('\\', '/')
+        self.filename = os.path.basename(path)
+        self.directories = set(self.relative_path.split('/')[:-1])
+        self._content = None
+        self._lines = None
+        self._tree = None
+        self._parsed = False
+        self._candidate_lines = None
+
+    @property
+    def raw(self):
+        """File content as bytes."""
+        if self.data is None:
+            with open(self.path, 'rb') as f:
+                self.data = f.read()
+        return self.data
+
+    @property
+    def content(self):
+        """Decoded file content."""
+        if self._content is None:
+            self._content = self.raw.decode('utf-8', errors='ignore')
+            if self._from_disk:
+                self._content = self._content.replace('\r\n', '\n').replace('\r', '\n')
+        return self._content
+
+    @property
+    def lines(self):
+        """Content split into lines (without line endings)."""
+        if self._lines is None:
+            self._lines = self.content.split('\n')
+        return self._lines
+
+    @property
+    def candidate_lines(self):
+        """(line number, line) for lines that may hold a TODO or commented-out code."""
+        if self._candidate_lines is None:
+            self._candidate_lines = find_candidate_lines(self.raw)
+        return self._candidate_lines
+
+    @property
+    def tree(self):
+        """Python AST of the content, or None if it does not parse."""
+        if not self._parsed:
+            self._parsed = True
+            try:
+                self._tree = ast.parse(self.content)
+            except Exception:
+                self._tree = None
+        return self._tree
+
+
+# Attributes marking files that weren't written in this repository (as in GitHub linguist)
+EXCLUDED_ATTRIBUTES = ('linguist-vendored', 'linguist-generated')
+
+
+def pathspecs(include=None, exclude=None):
+    """git pathspecs selecting the include patterns (default: everything) minus the exclude ones."""
+    return list(include or []) + [f':(exclude){pattern}' for pattern in exclude or []]
+
+
+def excluded_by_attributes(repo_path, paths, rev=None):
+    """
+    The paths marked linguist-vendored or linguist-generated, by the
+    .gitattributes of the working tree or, with rev, of the tree at rev.
+    """
+    if not paths:
+        return set()
+    stdin = b'\0'.join(path.encode('utf-8', errors='surrogateescape') for path in paths)
+    if rev:
+        # check-attr can only read attributes from an index, so load rev into a throwaway one
+        with tempfile.TemporaryDirectory() as temp_dir:
+            env = dict(os.environ, GIT_INDEX_FILE=os.path.join(temp_dir, 'index'))
+            git_output(repo_path, 'read-tree', rev, env=env)
+            output = git_output(
+                repo_path, 'check-attr', '--cached', '-z', '--stdin', *EXCLUDED_ATTRIBUTES, input=stdin, env=env
+            )
+    else:
+        output = git_output(repo_path, 'check-attr', '-z', '--stdin', *EXCLUDED_ATTRIBUTES, input=stdin)
+    # -z output is a flat sequence of path, attribute, value
+    fields = output.split(b'\0')
+    excluded = set()
+    for i in range(0, len(fields) - 2, 3):
+        if fields[i + 2] in (b'set', b'true'):
+            excluded.add(fields[i].decode('utf-8', errors='surrogateescape'))
+    return excluded
+
+
+def list_files(repo_path, include=None, exclude=None):
+    """
+    Relative paths of the files git knows about: tracked files plus untracked
+    ones that aren't ignored, like `git ls-files --cached --others
+    --exclude-standard`. Ignored and excluded directories are pruned by git
+    without being descended into; vendored and generated files are dropped.
+    """
+    output = git_output(
+        repo_path, 'ls-files', '-z', '--cached', '--others', '--exclude-standard', '--deduplicate',
+        '--', *pathspecs(include, exclude)
+    )
+    paths = [path.decode('utf-8', errors='surrogateescape') for path in output.split(b'\0') if path]
+    excluded = excluded_by_attributes(repo_path, paths)
+    return [path for path in paths if path not in excluded]
+
+
+def list_tree(repo_path, rev, include=None, exclude=None):
+    """
+    [(relative path, blob sha)] for the regular files in the tree at rev,
+    selected like list_files. Works without a working tree, so bare
+    repositories and any historical commit can be listed.
+    """
+    # Unlike ls-tree, diff-tree understands full pathspecs (globs, exclusions)
+    output = git_output(
+        repo_path, 'diff-tree', '-r', '-z', '--no-renames', EMPTY_TREE, rev, '--', *pathspecs(include, exclude)
+    )
+    fields = output.split(b'\0')
+    blobs = []
+    for i in range(0, len(fields) - 1, 2):
+        mode, sha = fields[i].split(b' ')[1:4:2]
+        if mode in (b'100644', b'100755'):
+            blobs.append((fields[i + 1].decode('utf-8', errors='surrogateescape'), sha.decode()))
+    excluded = excluded_by_attributes(repo_path, [path for path, _ in blobs], rev)
+    return [(path, sha) for path, sha in blobs if path not in excluded]
+
+
+def iter_files(repo_path, include=None, exclude=None):
+    """
+    Yield the path of every file in the working tree that git would consider
+    part of the project. Outside of a git repository every file is yielded
+    (skipping git internals) and include/exclude are ignored.
+    """
+    try:
+        paths = list_files(repo_path, include, exclude)
+    except GitCommandError:
+        for root, dirs, files in os.walk(repo_path):
+            dirs[:] = [d for d in dirs if d != '.git']
+            for file in files:
+                yield os.path.join(root, file)
+        return
+
+    for path in paths:
+        full_path = os.path.join(repo_path, path)
+        # Tracked files deleted from the working tree and submodules have nothing to read
+        if os.path.isfile(full_path):
+            yield full_path
+
+
+def hash_blob(path):
+    """Compute the git blob SHA of a file on disk (like `git hash-object`)."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+
+def working_tree_shas(repo_path):
+    """
+    Map relative paths to blob SHAs for tracked files whose working copy
+    matches the index. Modified, untracked and symlinked files are left out
+    and have to be hashed from disk.
+    """
+    shas = {}
+    for entry in git_output(repo_path, 'ls-files', '-s', '-z').split(b'\0'):
+        if not entry:
+            continue
+        info, path = entry.split(b'\t', 1)
+        mode, sha, stage = info.split(b' ')
+        if mode in (b'100644', b'100755') and stage == b'0':
+            shas[path.decode('utf-8', errors='surrogateescape')] = sha.decode()
+
+    status = git_output(repo_path, 'status', '--porcelain', '-z', '--untracked-files=no').split(b'\0')
+    i = 0
+    while i < len(status):
+        entry = status[i]
+        i += 1
+        if not entry:
+            continue
+        if entry[:1] in (b'R', b'C'):
+            i += 1  # Renames and copies are followed by their source path
+        if entry[1:2] != b' ':
+            shas.pop(entry[3:].decode('utf-8', errors='surrogateescape'), None)
+    return shas
+
+
+@contextmanager
+def _time_limit(seconds):
+    """
+    Raise FileTimeout in the block once seconds have passed, where signals
+    can do it (the main thread, on Unix). Signals are only handled between
+    Python bytecodes, so a long C call such as ast.parse finishes first.
+    """
+    if not seconds or not hasattr(signal, 'setitimer') or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def expire(signum, frame):
+        raise FileTimeout()
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def analyze_file(source, detectors, time_limit=None):
+    """
+    Run each detector over one file, returning {detector name: findings}, or
+    None if the file took longer than time_limit seconds (FILE_TIME_LIMIT by
+    default). The limit interrupts the detectors where signals allow it, and
+    is otherwise checked after each detector.
+    """
+    time_limit = FILE_TIME_LIMIT if time_limit is None else time_limit
+    results = {}
+    start = time.perf_counter()
+    try:
+        with _time_limit(time_limit):
+            for detector in detectors:
+                try:
+                    results[detector.name] = detector.analyze(source)
+                except Exception:
+                    results[detector.name] = []
+                if time_limit and time.perf_counter() - start > time_limit:
+                    raise FileTimeout()
+    except FileTimeout:
+        print(f"Gave up on {source.relative_path} after {time_limit}s")
+        record_skip('slow')
+        return None
+    return results
+
+
+def blob_key(source, sha):
+    """
+    Cache key of a file's findings: its content and its extension, since
+    detectors read .py files differently from text and C-family ones.
+    """
+    return f'blob:{ANALYZER_VERSION}:{os.path.splitext(source.filename)[1]}:{sha}'
+
+
+def scan_files(repo_path, jobs):
+    """
+    Analyze a list of (path, detectors, blob sha) jobs, returning per-file
+    results in order. Jobs with a blob sha are read from the object database
+    instead of the disk.
+
+    Files larger than MAX_FILE_BYTES or slower than FILE_TIME_LIMIT get None
+    instead of results. If the current budget runs out, the files analyzed
+    so far are returned (fewer results than jobs).
+    """
+    results = []
+    files = 0
+    size = 0
+    # Blob sizes up front, so oversized blobs are skipped without being read
+    blob_sizes = object_sizes(repo_path, [sha for _, _, sha in jobs if sha])
+    with CatFile(repo_path) if any(sha for _, _, sha in jobs) else nullcontext() as objects:
+        for path, detectors, sha in jobs:
+            if expired():
+                break
+            file_size = blob_sizes.get(sha, 0) if sha else _file_size(path)
+            if file_size > MAX_FILE_BYTES:
+                record_skip('oversized')
+                results.append(None)
+                continue
+
+            data = objects.read(sha) if sha else None
+            results.append(analyze_file(SourceFile(repo_path, path, data), detectors))
+            files += 1
+            size += file_size
+    record_scan(files, size)
+    return results
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _scan_chunk(repo_path, jobs, deadline=None):
+    """scan_files in a pool worker, returning what it recorded for the parent's metrics too."""
+    with track_request() as recorder, limiting(Budget(deadline=deadline)):
+        results = scan_files(repo_path, jobs)
+    return results, recorder.git_commands, recorder.counters
+
+
+def _chunk(items, workers):
+    """Split items into contiguous chunks so merged results keep scan order."""
+    chunk_count = max(workers * 4, 1)
+    size = max(-(-len(items) // chunk_count), 1)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _run_jobs(repo_path, jobs, workers):
+    """
+    Analyze the jobs serially or across a process pool. Pool workers stop at
+    the current budget's deadline; on cancellation, chunks that haven't
+    started are dropped and running ones are left to finish.
+    """
+    if not (workers and workers > 1 and len(jobs) > 1):
+        return scan_files(repo_path, jobs)
+
+    budget = current()
+    results = []
+    chunks = _chunk(jobs, workers)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=POOL_CONTEXT) as pool:
+        futures = [pool.submit(_scan_chunk, repo_path, chunk, budget and budget.deadline) for chunk in chunks]
+        for future, chunk in zip(futures, chunks):
+            if expired():
+                pool.shutdown(cancel_futures=True)
+                break
+            partial, git_commands, counters = future.result()
+            results.extend(partial)
+            merge(git_commands, counters)
+            if len(partial) < len(chunk):
+                break  # Ran out of time; later results would not line up with their files
+    return results
+
+
+def _analyze(repo_path, files, detectors, workers, cache, rev=None):
+    """
+    Run the detectors that accept each of the given (path, blob sha) files.
+    Returns the accepted (source, detectors) pairs and their per-file
+    results, answering from the blob cache where possible. Files that were
+    skipped, or not reached before the budget ran out, have None results.
+    """
+    sources = []
+    blob_shas = []
+    for path, sha in files:
+        source = SourceFile(repo_path, path)
+        accepted = [detector for detector in detectors if detector.accepts(source)]
+        if accepted:
+            sources.append((source, accepted))
+            blob_shas.append(sha)
+
+    per_file = [None] * len(sources)
+    keys = [None] * len(sources)
+    cached = {}
+
+    if cache is not None:
+        shas = {} if rev else working_tree_shas(repo_path)
+        for i, (source, _) in enumerate(sources):
+            sha = blob_shas[i] or shas.get(source.relative_path)
+            if sha is None:
+                try:
+                    sha = hash_blob(source.path)
+                except OSError:
+                    continue
+            keys[i] = blob_key(source, sha)
+
+        cached = cache.get_many(key for key in set(keys) if key)
+        for i, (_, accepted) in enumerate(sources):
+            entry = cached.get(keys[i])
+            if entry is not None and all(detector.name in entry for detector in accepted):
+                per_file[i] = entry
+
+    # Analyze whatever the cache could not answer
+    pending = [i for i, entry in enumerate(per_file) if entry is None]
+    jobs = [(sources[i][0].path, sources[i][1], blob_shas[i]) for i in pending]
+    fresh = {}
+    for i, result in zip(pending, _run_jobs(repo_path, jobs, workers)):
+        per_file[i] = result
+        if keys[i] and result is not None:
+            # Keep findings of detectors that did not run this time
+            fresh.setdefault(keys[i], dict(cached.get(keys[i], {}))).update(result)
+
+    if cache is not None:
+        cache.set_many(fresh)
+
+    return sources, per_file
+
+
+def scan(repo_path, detectors, workers=None, cache=None, include=None, exclude=None, rev=None, complete=False):
+    """
+    Run every detector over the repository in a single pass.
+
+    Files are enumerated once from the git index (see iter_files), optionally
+    narrowed by include/exclude pathspecs. Each file is read at most once and
+    parsed at most once; the shared SourceFile is handed to every detector
+    that accepts it.
+    With a rev, the tree at that commit is scanned instead of the working
+    tree: files are listed with list_tree and their blobs streamed from the
+    object database, so no checkout is needed (bare repositories work too).
+    With workers > 1 the files are split into chunks analyzed by a process
+    pool, and the partial findings are merged back in scan order so the
+    result is identical to the serial path.
+
+    If a cache is given, per-file findings are stored under the file's git
+    blob SHA and the analyzer version, so only blobs that have not been seen
+    before are read and analyzed; the top-N lists are then rebuilt from the
+    cached partial results.
+    Returns a dict mapping detector name to its finalized result, or with
+    complete=True to every finding it ranked rather than only the top ones.
+    """
+    if rev:
+        files = [(os.path.join(repo_path, path), sha) for path, sha in list_tree(repo_path, rev, include, exclude)]
+    else:
+        files = [(path, None) for path in iter_files(repo_path, include, exclude)]
+
+    sources, per_file = _analyze(repo_path, files, detectors, workers, cache, rev)
+
+    findings = {detector.name: [] for detector in detectors}
+    for (source, accepted), result in zip(sources, per_file):
+        if result is None:
+            continue
+        for detector in accepted:
+            findings[detector.name].extend(detector.locate(source, item) for item in result[detector.name])
+
+    if complete:
+        return {detector.name: detector.rank(findings[detector.name]) for detector in detectors}
+    return {detector.name: detector.finalize(findings[detector.name]) for detector in detectors}
+
+
+def scan_history(repo_path, detectors, revs, workers=None, cache=None, include=None, exclude=None):
+    """
+    Run the detectors over the tree at each of several commits, in order.
+
+    Consecutive commits share most of their blobs, so results are kept per
+    blob SHA for the whole walk: at each commit only blobs that changed
+    since the commits before it are read and analyzed (or looked up in the
+    blob cache). Yields (rev, {relative path: per-file results}), leaving
+    out skipped files; stops early once the current budget runs out.
+    """
+    seen = {}
+    for rev in revs:
+        if expired():
+            return
+        files = {}
+        for relative_path, sha in list_tree(repo_path, rev, include, exclude):
+            path = os.path.join(repo_path, relative_path)
+            if any(detector.accepts(SourceFile(repo_path, path)) for detector in detectors):
+                files[path] = sha
+
+        changed = [(path, sha) for path, sha in files.items() if sha not in seen]
+        sources, per_file = _analyze(repo_path, changed, detectors, workers, cache, rev)
+        if expired():
+            return  # This commit's tree was only partly analyzed
+        for (source, _), result in zip(sources, per_file):
+            # Skipped blobs are remembered too, so they aren't retried at every commit
+            seen[files[source.path]] = result
+
+        yield rev, {
+            os.path.relpath(path, repo_path).replace('\\', '/'): seen[sha]
+            for path, sha in files.items() if seen.get(sha) is not None
+        }
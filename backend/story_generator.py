@@ -1,15 +1,81 @@
 import anthropic
+import hashlib
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
+from metrics import bind, record_llm
 
 load_dotenv()
 
+MODEL = "claude-sonnet-4-5-20250929"
+
+
+def story_cache_key(model, max_tokens, prompt):
+    """Cache key for a reply: anything that changes the request changes the key."""
+    digest = hashlib.sha256(json.dumps([model, max_tokens, prompt]).encode()).hexdigest()
+    return f'story:{digest}'
+
 
 class StoryGenerator:
     """Uses Claude to generate entertaining narratives about code artifacts."""
 
-    def __init__(self):
-        self.client = anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
+    def __init__(self, max_concurrency=4, timeout=60, max_retries=2, batched=False, api_key=None, base_url=None,
+                 cache=None):
+        # The client retries rate limits, overloaded and connection errors with exponential backoff
+        self.client = anthropic.Anthropic(
+            api_key=api_key or os.getenv('ANTHROPIC_API_KEY'),
+            base_url=base_url,
+            timeout=timeout,
+            max_retries=max_retries
+        )
+        self.max_concurrency = max_concurrency
+        self.batched = batched
+        # Replies to identical prompts, reused instead of asking again
+        self.cache = cache
+        # Number of calls that fell back to placeholder text
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def _complete(self, prompt, max_tokens, parse=None):
+        """
+        Send a single-message prompt and return the text of the reply, or
+        parse(text) if given. Replies are cached only once they parse, and
+        failed calls are never cached.
+        """
+        key = None
+        if self.cache is not None:
+            key = story_cache_key(MODEL, max_tokens, prompt)
+            text = self.cache.get(key)
+            if text is not None:
+                record_llm('cached')
+                return parse(text) if parse else text
+
+        start = time.perf_counter()
+        try:
+            message = self.client.messages.create(
+                model=MODEL,
+                max_tokens=max_tokens,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ]
+            )
+        except Exception:
+            record_llm('error', time.perf_counter() - start)
+            raise
+        record_llm('ok', time.perf_counter() - start, message.usage.input_tokens, message.usage.output_tokens)
+        text = message.content[0].text
+        result = parse(text) if parse else text
+
+        if key:
+            self.cache.set(key, text)
+        return result
+
+    def _failed(self):
+        with self._lock:
+            self.failures += 1
 
     def generate_artifact_story(self, artifact_type, artifacts):
         """Generate a story for a specific type of artifact."""
@@ -17,6 +83,16 @@ class StoryGenerator:
         if not artifacts:
             return "No artifacts found in this category."
 
+        try:
+            return self._complete(self._artifact_prompt(artifact_type, artifacts), 500)
+        except Exception as e:
+            self._failed()
+            print(f"Error generating story: {e}")
+            return f"The ancient texts are too weathered to read... ({str(e)})"
+
+    def _artifact_prompt(self, artifact_type, artifacts):
+        """The prompt asking for a story about one type of artifact."""
+
         # Create the prompt for the specific artifact type
         if artifact_type == 'dead_code':
             prompt = f"""You are a humorous code archaeologist. Analyze these potentially unused functions and write a short, entertaining narrative about them (2-3 sentences per item). Make it funny but informative.
@@ -43,7 +119,7 @@ TODO Comments Found:
 Be witty about procrastination and abandoned intentions."""
 
         elif artifact_type == 'oldest_code':
-            prompt = f"""You are a code archaeologist examining the oldest surviving code. Write an epic, reverent narrative (3-4 sentences) about these ancient relics that have survived since the beginning.
+            prompt = f"""You are a code archaeologist examining the oldest surviving code. Write an epic, reverent narrative (3-4 sentences) about these ancient relics: the oldest lines still standing, each traced back to the commit that first laid them down.
 
 Oldest Code Still Alive:
 {self._format_oldest_code(artifacts)}
@@ -66,22 +142,18 @@ Complexity Analysis Results:
 
 Use scientific/analytical language. Mention how complexity is measured by decisions, nesting depth, and lines of code. Make it sound like a lab report but keep it accessible."""
 
+        elif artifact_type == 'duplicate_code':
+            prompt = f"""You are a code archaeologist who has found the same carvings in several places. Write a witty narrative (2-3 sentences) about these copy-pasted blocks of code and the developers who duplicated them.
+
+Copy-Paste Fossils:
+{self._format_duplicate_code(artifacts)}
+
+Speculate playfully about why the code was copied instead of shared."""
+
         else:
             prompt = "Describe these code artifacts."
 
-        try:
-            message = self.client.messages.create(
-                model="claude-sonnet-4-5-20250929",
-                max_tokens=500,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
-
-            return message.content[0].text
-        except Exception as e:
-            print(f"Error generating story: {e}")
-            return f"The ancient texts are too weathered to read... ({str(e)})"
+        return prompt
 
     def generate_excavation_summary(self, artifacts):
         """Generate an overall summary of the excavation."""
@@ -94,24 +166,89 @@ Excavation Summary:
 - Unfulfilled TODOs: {len(artifacts.get('todos', []))} found
 - Ancient Code (oldest files): {len(artifacts.get('oldest_code', []))} found
 - Hall of Shame (complex functions): {len(artifacts.get('hall_of_shame', []))} found
+- Copy-Paste Fossils (duplicated blocks): {len(artifacts.get('duplicate_code', []))} found
 - Timeline Events: {len(artifacts.get('timeline', []))} sampled
 
 Write an exciting opening to the museum exhibit. Make it sound like an archaeological discovery."""
 
         try:
-            message = self.client.messages.create(
-                model="claude-sonnet-4-5-20250929",
-                max_tokens=300,
-                messages=[
-                    {"role": "user", "content": summary_prompt}
-                ]
-            )
-
-            return message.content[0].text
+            return self._complete(summary_prompt, 300)
         except Exception as e:
+            self._failed()
             print(f"Error generating summary: {e}")
             return "Welcome to the Code Archaeology Museum. Explore the artifacts of code past..."
 
+    def generate_batched_stories(self, artifact_types, artifacts):
+        """
+        Generate the stories for several artifact types with one request that
+        answers with a JSON object. Types missing from the answer are generated
+        one by one instead. Returns {story key: story}.
+        """
+        stories = {}
+        pending = []
+        for artifact_type in artifact_types:
+            if artifacts[artifact_type]:
+                pending.append(artifact_type)
+            else:
+                stories[artifact_type] = self.generate_artifact_story(artifact_type, artifacts[artifact_type])
+
+        if pending:
+            sections = '\n\n'.join(
+                f"## {artifact_type}\n{self._artifact_prompt(artifact_type, artifacts[artifact_type])}"
+                for artifact_type in pending
+            )
+            prompt = f"""You are a code archaeologist writing the captions for a museum exhibit. Each section below asks for one story.
+
+{sections}
+
+Answer with only a JSON object mapping each section name ({', '.join(pending)}) to its story text."""
+
+            try:
+                answer = self._complete(prompt, 500 * len(pending), parse=self._parse_json)
+            except Exception as e:
+                print(f"Error generating batched stories: {e}")
+                answer = {}
+
+            for artifact_type in pending:
+                story = answer.get(artifact_type)
+                if not isinstance(story, str) or not story.strip():
+                    story = self.generate_artifact_story(artifact_type, artifacts[artifact_type])
+                stories[artifact_type] = story
+
+        return {f'{artifact_type}_story': stories[artifact_type] for artifact_type in artifact_types}
+
+    def _parse_json(self, text):
+        """The JSON object in a reply, ignoring any prose or code fences around it."""
+        start, end = text.find('{'), text.rfind('}')
+        if start == -1 or end < start:
+            raise ValueError('No JSON object in the reply')
+        answer = json.loads(text[start:end + 1])
+        if not isinstance(answer, dict):
+            raise ValueError('Reply is not a JSON object')
+        return answer
+
+    def iter_stories(self, artifacts, artifact_types):
+        """
+        Yield (story key, story) for the excavation summary and each artifact
+        type as they finish, with up to max_concurrency requests in flight. In
+        batched mode all artifact stories come from a single request.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            futures = {pool.submit(bind(self.generate_excavation_summary), artifacts): 'excavation_summary'}
+            if self.batched:
+                futures[pool.submit(bind(self.generate_batched_stories), artifact_types, artifacts)] = None
+            else:
+                for artifact_type in artifact_types:
+                    future = pool.submit(bind(self.generate_artifact_story), artifact_type, artifacts[artifact_type])
+                    futures[future] = f'{artifact_type}_story'
+
+            for future in as_completed(futures):
+                key = futures[future]
+                if key is None:
+                    yield from future.result().items()
+                else:
+                    yield key, future.result()
+
     def _format_dead_code(self, artifacts):
         """Format dead code for the prompt."""
         lines = []
@@ -137,7 +274,7 @@ Write an exciting opening to the museum exhibit. Make it sound like an archaeolo
         """Format oldest code for the prompt."""
         lines = []
         for item in artifacts[:5]:
-            lines.append(f"- {item['file']} (from {item['first_commit_date']}, {item['age_days']} days old)")
+            lines.append(f"- {item['file']} line {item['line']} (from {item['first_commit_date']}, {item['age_days']} days old)")
         return '\n'.join(lines)
 
     def _format_hall_of_shame(self, artifacts):
@@ -151,5 +288,17 @@ Write an exciting opening to the museum exhibit. Make it sound like an archaeolo
         """Format complexity heatmap for the prompt."""
         lines = []
         for item in artifacts[:5]:  # Limit to top 5 most complex
-            lines.append(f"- {item['file']}: Complexity {item['score']} ({item['level'].upper()}) - {item['loc']} LOC, {item['decisions']} decisions, {item['max_depth']} max depth")
+            line = f"- {item['file']}: Complexity {item['score']} ({item['level'].upper()}) - {item['loc']} LOC, {item['decisions']} decisions, {item['max_depth']} max depth"
+            if item.get('functions'):
+                worst = item['functions'][0]
+                line += f"; most complex function '{worst['name']}' (cyclomatic complexity {worst['complexity']})"
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def _format_duplicate_code(self, artifacts):
+        """Format duplicated code for the prompt."""
+        lines = []
+        for item in artifacts[:5]:
+            places = ', '.join(f"{location['file']} line {location['start_line']}" for location in item['locations'][:3])
+            lines.append(f"- {item['lines']} lines copied {item['copies']} times: {places}")
         return '\n'.join(lines)
@@ -0,0 +1,110 @@
+import ast
+import re
+
+# Identifiers in non-Python sources (templates, configs, other languages)
+IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+
+class _SymbolCollector(ast.NodeVisitor):
+    """Collects definitions and referenced names from a Python module."""
+
+    def __init__(self):
+        self.definitions = []
+        self.references = set()
+        self.exports = set()
+        self._scopes = []
+
+    def _define(self, node, kind):
+        self.definitions.append({
+            'type': kind,
+            'name': node.name,
+            'line': node.lineno,
+            'decorated': bool(node.decorator_list)
+        })
+        for decorator in node.decorator_list:
+            self.visit(decorator)
+        self._scopes.append(kind)
+        for child in ast.iter_child_nodes(node):
+            if child not in node.decorator_list:
+                self.visit(child)
+        self._scopes.pop()
+
+    def visit_FunctionDef(self, node):
+        self._define(node, 'method' if self._scopes and self._scopes[-1] == 'class' else 'function')
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        self._define(node, 'class')
+
+    def visit_Name(self, node):
+        self.references.add(node.id)
+
+    def visit_Attribute(self, node):
+        self.references.add(node.attr)
+        self.generic_visit(node)
+
+    def visit_ImportFrom(self, node):
+        # Importing a name from another module uses it
+        for alias in node.names:
+            self.references.add(alias.name)
+
+    def visit_Assign(self, node):
+        # __all__ = ['name', ...] exports names from the module
+        for target in node.targets:
+            if isinstance(target, ast.Name) and target.id == '__all__' and isinstance(node.value, (ast.List, ast.Tuple)):
+                for element in node.value.elts:
+                    if isinstance(element, ast.Constant) and isinstance(element.value, str):
+                        self.exports.add(element.value)
+        self.generic_visit(node)
+
+
+def python_symbols(tree, content):
+    """
+    Return (definitions, references, exports) for a parsed Python module. A
+    module nested deeper than the collector can recurse only contributes its
+    references, found in its text as for non-Python files.
+    """
+    collector = _SymbolCollector()
+    try:
+        collector.visit(tree)
+    except RecursionError:
+        return [], text_references(content), set()
+    return collector.definitions, collector.references, collector.exports
+
+
+def text_references(content):
+    """Every identifier-like token in a non-Python source file."""
+    return set(IDENTIFIER.findall(content))
+
+
+class SymbolIndex:
+    """
+    Repository-wide index of symbol definitions and an inverted index of the
+    files referencing each name, so "is this used anywhere?" is a dict lookup.
+    """
+
+    def __init__(self):
+        self.files = []
+        self.definitions = []
+        # name -> indices into self.files of every file referencing it
+        self.references = {}
+        self.exports = set()
+
+    def add_file(self, file, definitions=(), references=(), exports=()):
+        """Record a file's definitions, referenced names and __all__ exports."""
+        file_id = len(self.files)
+        self.files.append(file)
+        for definition in definitions:
+            self.definitions.append(dict(definition, file=file))
+        for name in references:
+            self.references.setdefault(name, []).append(file_id)
+        self.exports.update(exports)
+
+    def is_used(self, name):
+        """Whether a name is referenced or exported anywhere in the repository."""
+        return name in self.references or name in self.exports
+
+    def unused_definitions(self):
+        """Definitions whose name is never referenced anywhere, in index order."""
+        return [definition for definition in self.definitions if not self.is_used(definition['name'])]
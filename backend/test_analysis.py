@@ -0,0 +1,106 @@
+"""
+Tests for the result cache in front of full analyses.
+"""
+
+import os
+import pytest
+import analysis
+from git import Actor, Repo
+from app import app
+from artifact_store import ArtifactStore
+from cache import MemoryCache
+from git_cmd import GitCommandError
+from jobs import JobManager
+from story_generator import StoryGenerator
+from test_story_generator import StubApi
+
+
+def make_repo(path):
+    repo = Repo.init(path)
+    author = Actor('Archaeologist', 'dig@example.com')
+    (path / 'app.py').write_text('def unused():\n    pass  # TODO: remove\n')
+    repo.index.add(['app.py'])
+    repo.index.commit('Add app', author=author, committer=author)
+    return repo
+
+
+def isolate(monkeypatch, tmp_path):
+    """Fresh caches and stubbed stories for one test; returns the stub Messages API."""
+    api = StubApi(lambda prompt: 'A story.')
+    monkeypatch.setattr(analysis, 'RESULT_CACHE', MemoryCache())
+    monkeypatch.setattr(analysis, 'ANALYSIS_CACHE', None)
+    monkeypatch.setattr(analysis, 'ARTIFACT_STORE', ArtifactStore(str(tmp_path / 'artifacts.db')))
+    monkeypatch.setattr(analysis, 'StoryGenerator', lambda **options: StoryGenerator(
+        **dict(options, cache=None), api_key='test', base_url=api.url
+    ))
+    return api
+
+
+def test_result_cache_key(tmp_path):
+    """Keys follow the commit and the pathspec scope; dirty working trees can't be cached."""
+    repo = make_repo(tmp_path / 'repo')
+    path = str(tmp_path / 'repo')
+    head = repo.head.commit.hexsha
+
+    key = analysis.result_cache_key(path)
+    assert key.endswith(f'{os.path.realpath(path)}:{head}')
+    assert analysis.result_cache_key(path, include=['src/']) != key
+    assert analysis.result_cache_key(path, ref='HEAD') == key
+    assert analysis.result_cache_key(repo_url=path).endswith(f':{head}')
+
+    (tmp_path / 'repo' / 'app.py').write_text('changed = True\n')
+    assert analysis.result_cache_key(path) is None
+
+
+def test_remote_urls_are_not_options(tmp_path):
+    """A repo_url that looks like an option is never run by git, and the API rejects it."""
+    marker = tmp_path / 'pwned'
+    with pytest.raises(GitCommandError):
+        analysis.result_cache_key(repo_url=f'--upload-pack=touch {marker};')
+    assert not marker.exists()
+
+    client = app.test_client()
+    for url in (f'--upload-pack=touch {marker};', f'ext::sh -c touch% {marker}'):
+        response = client.post('/api/analyze', json={'repo_url': url})
+        assert response.status_code == 400
+    assert not marker.exists()
+
+
+def test_cached_results_are_served_until_refreshed(tmp_path, monkeypatch):
+    """A second analysis of the same commit is a hit, refresh bypasses it, and dirty trees are never cached."""
+    make_repo(tmp_path / 'repo')
+    path = str(tmp_path / 'repo')
+    api = isolate(monkeypatch, tmp_path)
+
+    first = analysis.run_analysis(path)
+    prompts = len(api.prompts)
+    second = analysis.run_analysis(path)
+    assert first['metadata']['cache'] == 'miss'
+    assert second['metadata']['cache'] == 'hit'
+    assert second['artifacts'] == first['artifacts']
+    assert len(api.prompts) == prompts
+
+    assert analysis.run_analysis(path, refresh=True)['metadata']['cache'] == 'miss'
+    assert len(api.prompts) > prompts
+
+    (tmp_path / 'repo' / 'app.py').write_text('# TODO: uncommitted\n')
+    assert analysis.run_analysis(path)['metadata']['cache'] == 'bypass'
+    assert analysis.run_analysis(path)['metadata']['cache'] == 'bypass'
+
+
+def test_stage_timeouts_of_jobs_are_reported(tmp_path, monkeypatch):
+    """Stages that run out of time under a job are in the response, which is then not cached."""
+    make_repo(tmp_path / 'repo')
+    path = str(tmp_path / 'repo')
+    isolate(monkeypatch, tmp_path)
+    monkeypatch.setattr(analysis, 'STAGE_TIME_BUDGET', 1e-9)
+
+    manager = JobManager(max_workers=1)
+    job, _ = manager.submit(path, repo_path=path)
+    job.wait()
+
+    metadata = job.result['metadata']
+    assert 'scan' in metadata['timed_out']
+    assert metadata['truncated']
+    assert metadata['cache'] == 'miss'
+    assert analysis.RESULT_CACHE.get(analysis.result_cache_key(path)) is None
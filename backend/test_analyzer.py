@@ -43,7 +43,7 @@ def test_analyzer():
 
         # Test hall of shame
         print("5️⃣ Testing complex function detection...")
-        hall = archaeologist.find_hall_of_shame()
+        hall = archaeologist.get_hall_of_shame()
         print(f"   ✅ Found {len(hall)} complex functions\n")
 
         # Test timeline
@@ -60,15 +60,13 @@ def test_analyzer():
         print("   2. Start the frontend: cd ../frontend && npm run dev")
         print("   3. Open http://localhost:3000\n")
 
-        return True
-
     except Exception as e:
         print(f"\n❌ Test failed: {e}")
         print("\n💡 Troubleshooting:")
         print("   - Make sure you're in a git repository")
         print("   - Check that Python dependencies are installed")
         print("   - Run: pip install -r requirements.txt\n")
-        return False
+        raise
 
 
 if __name__ == "__main__":
@@ -0,0 +1,86 @@
+"""
+Tests for the analysis endpoints and how they share the job pool.
+"""
+
+import json
+import threading
+import app as app_module
+from app import app
+from jobs import JobManager
+from test_analysis import isolate, make_repo
+
+
+def test_stream_events(tmp_path, monkeypatch):
+    """Artifacts and stories stream as NDJSON lines, then the metadata and done."""
+    make_repo(tmp_path / 'repo')
+    isolate(monkeypatch, tmp_path)
+
+    response = app.test_client().post('/api/analyze/stream', json={'repo_path': str(tmp_path / 'repo')})
+    assert response.mimetype == 'application/x-ndjson'
+    events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    kinds = [event['event'] for event in events]
+
+    assert events[0] == {'event': 'status', 'stage': 'excavating'}
+    assert kinds[-2:] == ['metadata', 'done']
+    # Every artifact comes before the stories, which come before the metadata
+    assert kinds.index('story') > max(i for i, kind in enumerate(kinds) if kind == 'artifact')
+    assert {'todos', 'dead_code', 'oldest_code'} <= {event['category'] for event in events if event['event'] == 'artifact'}
+    assert 'excavation_summary' in {event['key'] for event in events if event['event'] == 'story'}
+    assert events[-2]['data']['cache'] == 'miss'
+
+
+def test_stream_server_sent_events_and_errors(tmp_path, monkeypatch):
+    """Clients accepting text/event-stream get SSE frames; failures end the stream with an error event."""
+    make_repo(tmp_path / 'repo')
+    isolate(monkeypatch, tmp_path)
+    client = app.test_client()
+
+    response = client.post(
+        '/api/analyze/stream', json={'repo_path': str(tmp_path / 'repo')}, headers={'Accept': 'text/event-stream'}
+    )
+    assert response.mimetype == 'text/event-stream'
+    frames = response.get_data(as_text=True).split('\n\n')
+    assert frames[0].startswith('event: status\ndata: ')
+    assert json.loads(frames[0].split('data: ', 1)[1]) == {'event': 'status', 'stage': 'excavating'}
+    assert frames[-2] == 'event: done\ndata: {"event": "done"}'
+
+    response = client.post('/api/analyze/stream', json={'repo_path': str(tmp_path / 'missing')})
+    events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert events == [{'event': 'error', 'error': f"Repository path does not exist: {tmp_path / 'missing'}"}]
+
+    assert client.post('/api/analyze/stream', json={}).status_code == 400
+
+
+def test_analyses_share_the_job_pool(monkeypatch):
+    """Synchronous and streamed analyses run as jobs, never more at once than the pool allows."""
+    lock = threading.Lock()
+    running = [0, 0]  # Now, most at once
+
+    def runner(repo_path, **params):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        yield {'event': 'status', 'stage': 'excavating'}
+        threading.Event().wait(0.05)
+        with lock:
+            running[0] -= 1
+        yield {'event': 'result', 'data': {'artifacts': {}, 'stories': {}, 'metadata': {'repo_path': repo_path}}}
+
+    monkeypatch.setattr(app_module, 'JOB_MANAGER', JobManager(max_workers=1, runner=runner))
+    client = app.test_client()
+    responses = {}
+
+    def analyze(path):
+        responses[path] = client.post('/api/analyze', json={'repo_path': path}).get_json()
+
+    threads = [threading.Thread(target=analyze, args=(f'/repo{i}',)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    stream = client.post('/api/analyze/stream', json={'repo_path': '/repo3'}).get_data(as_text=True)
+    for thread in threads:
+        thread.join()
+
+    assert running[1] == 1
+    assert responses['/repo2']['metadata']['repo_path'] == '/repo2'
+    assert [json.loads(line)['event'] for line in stream.splitlines()] == ['status', 'metadata', 'done']
+    assert client.get('/api/jobs').get_json()['succeeded'] == 4
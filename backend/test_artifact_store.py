@@ -0,0 +1,68 @@
+"""
+Tests for the artifact store and the paged, compressed artifact endpoints.
+"""
+
+import gzip
+import json
+import analysis
+from app import app
+from artifact_store import ArtifactStore
+
+
+def _heatmap(count):
+    return [{'file': f"{'src' if i % 2 else 'lib'}/f{i}.py", 'score': 100 - i} for i in range(count)]
+
+
+def test_pages_follow_rank_order_and_filters(tmp_path):
+    """Cursors walk every finding once, in order; prefix and min_score narrow the pages and the total."""
+    store = ArtifactStore(str(tmp_path / 'artifacts.db'))
+    assert store.save('a1', {'complexity_heatmap': _heatmap(25), 'todos': []}) == {'complexity_heatmap': 25, 'todos': 0}
+
+    seen, cursor = [], None
+    while True:
+        page = store.page('a1', 'complexity_heatmap', cursor, limit=10)
+        assert page['total'] == 25
+        seen += [item['file'] for item in page['items']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+        cursor = int(cursor)
+    assert seen == [item['file'] for item in _heatmap(25)]
+
+    page = store.page('a1', 'complexity_heatmap', prefix='/src/', min_score=90, limit=3)
+    assert [item['file'] for item in page['items']] == ['src/f1.py', 'src/f3.py', 'src/f5.py']
+    assert page['total'] == 5
+    assert store.page('a1', 'todos') == {'items': [], 'next_cursor': None, 'total': 0}
+
+
+def test_oldest_analyses_are_evicted(tmp_path):
+    """Only the most recently saved analyses are kept."""
+    store = ArtifactStore(str(tmp_path / 'artifacts.db'), max_analyses=2)
+    for analysis_id in ('a1', 'a2', 'a3'):
+        store.save(analysis_id, {'complexity_heatmap': _heatmap(3)})
+
+    assert store.totals('a1') is None
+    assert store.page('a1', 'complexity_heatmap')['total'] == 0
+    assert store.totals('a3') == {'complexity_heatmap': 3}
+
+
+def test_artifact_endpoints(tmp_path, monkeypatch):
+    """Pages are gzip-compressed when accepted; bad parameters and unknown analyses are rejected."""
+    monkeypatch.setattr(analysis, 'ARTIFACT_STORE', ArtifactStore(str(tmp_path / 'artifacts.db')))
+    monkeypatch.setattr('app.ARTIFACT_STORE', analysis.ARTIFACT_STORE)
+    analysis.ARTIFACT_STORE.save('a1', {'complexity_heatmap': _heatmap(200)})
+    client = app.test_client()
+
+    assert client.get('/api/analyses/a1/artifacts').get_json()['totals'] == {'complexity_heatmap': 200}
+    assert client.get('/api/analyses/missing/artifacts').status_code == 404
+    assert client.get('/api/analyses/a1/artifacts/todos').status_code == 404
+    assert client.get('/api/analyses/a1/artifacts/complexity_heatmap?cursor=x').status_code == 400
+
+    response = client.get('/api/analyses/a1/artifacts/complexity_heatmap?limit=150', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    page = json.loads(gzip.decompress(response.get_data()))
+    assert len(page['items']) == 150 and page['next_cursor'] == '149'
+
+    response = client.get('/api/analyses/a1/artifacts/complexity_heatmap?cursor=149')
+    assert 'Content-Encoding' not in response.headers
+    assert len(response.get_json()['items']) == 50 and response.get_json()['next_cursor'] is None
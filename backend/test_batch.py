@@ -0,0 +1,71 @@
+"""
+Tests for the parallel batch excavation CLI.
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+import batch
+from git import Actor, Repo
+from batch import read_manifest, run_batch
+
+
+def _repo(path, message):
+    repo = Repo.init(path)
+    author = Actor('Archaeologist', 'dig@example.com')
+    (path / 'app.py').write_text(f'# TODO: {message}\n')
+    repo.index.add(['app.py'])
+    repo.index.commit(message, author=author, committer=author)
+    return repo
+
+
+def test_batch_skips_unchanged_repositories(tmp_path):
+    """Every repository gets a JSONL record; a rerun only excavates the one whose HEAD moved."""
+    first = _repo(tmp_path / 'first', 'first')
+    _repo(tmp_path / 'second', 'second')
+    manifest = tmp_path / 'manifest.txt'
+    manifest.write_text(
+        f"# nightly audit\n{tmp_path / 'first'}\n\n"
+        + json.dumps({'repo_path': str(tmp_path / 'second'), 'exclude': ['*.md']}) + '\n'
+        + f"{tmp_path / 'missing'}\n"
+    )
+    output = tmp_path / 'results.jsonl'
+
+    entries = read_manifest(manifest)
+    assert [entry['exclude'] for entry in entries] == [None, ['*.md'], None]
+    assert run_batch(entries, str(output), concurrency=2) == 3
+
+    records = {record['repo']: record for record in map(json.loads, output.read_text().splitlines())}
+    assert records[str(tmp_path / 'first')]['status'] == 'ok'
+    assert records[str(tmp_path / 'first')]['result']['artifacts']['todos'][0]['text'] == '# TODO: first'
+    assert records[str(tmp_path / 'first')]['result']['stories'] == {}
+    assert records[str(tmp_path / 'missing')]['status'] == 'failed'
+
+    # The failed repository is retried; the unchanged ones are not
+    assert run_batch(entries, str(output), concurrency=2) == 1
+
+    (tmp_path / 'first' / 'app.py').write_text('# TODO: moved on\n')
+    first.index.add(['app.py'])
+    first.index.commit('Move on', author=Actor('Archaeologist', 'dig@example.com'))
+    assert run_batch(entries, str(output), concurrency=2) == 2
+    assert len(output.read_text().splitlines()) == 6
+
+
+def test_refresh_bypasses_cached_responses(tmp_path, monkeypatch):
+    """With refresh, each repository is analyzed again rather than served from the result cache."""
+    _repo(tmp_path / 'repo', 'cached')
+    calls = []
+
+    def run_analysis(**params):
+        calls.append(params['refresh'])
+        return {'artifacts': {}, 'stories': {}, 'metadata': {}}
+
+    monkeypatch.setattr(batch, 'run_analysis', run_analysis)
+    manifest = tmp_path / 'manifest.txt'
+    manifest.write_text(f"{tmp_path / 'repo'}\n")
+    [entry] = read_manifest(manifest)
+    with ThreadPoolExecutor(1) as processes:
+        for refresh in (False, True):
+            record = batch._excavate_entry(entry, processes, False, set(), refresh)
+            assert record['status'] == 'ok'
+
+    assert calls == [False, True]
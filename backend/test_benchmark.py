@@ -0,0 +1,45 @@
+"""
+Tests for the synthetic repository generator and regression check of the benchmark suite.
+"""
+
+import os
+from benchmark import compare_workers, generate_repo, regressions
+from scanner import iter_files
+
+
+def test_synthetic_repository_is_deterministic(tmp_path):
+    """The same arguments produce the same commits; the file count and language mix are honored."""
+    first = generate_repo(str(tmp_path / 'a'), files=12, commits=5, languages='py=1,ts=1', lines=(10, 30), seed=7)
+    second = generate_repo(str(tmp_path / 'b'), files=12, commits=5, languages='py=1,ts=1', lines=(10, 30), seed=7)
+    other = generate_repo(str(tmp_path / 'c'), files=12, commits=5, languages='py=1,ts=1', lines=(10, 30), seed=8)
+
+    assert first == second
+    assert first != other
+    files = list(iter_files(str(tmp_path / 'a')))
+    assert len(files) == 12
+    assert {os.path.splitext(path)[1] for path in files} == {'.py', '.ts'}
+
+
+def test_parallel_scan_is_compared_with_serial(tmp_path):
+    """The worker comparison times both runs and finds their results identical."""
+    generate_repo(str(tmp_path / 'repo'), files=24, commits=2, lines=(10, 60), seed=3)
+    serial, parallel, identical = compare_workers(str(tmp_path / 'repo'), workers=2)
+
+    assert serial > 0 and parallel > 0
+    assert identical
+
+
+def test_regressions_beyond_tolerance_are_reported():
+    """Only metrics worse than the baseline by more than the tolerance count."""
+    baseline = {'find_todos': {'seconds': 1.0, 'peak_mb': 10.0}, 'excavate': {'seconds': 2.0, 'peak_mb': 5.0}}
+    results = {
+        'find_todos': {'seconds': 1.4, 'peak_mb': 16.0},
+        'excavate': {'seconds': 3.5, 'peak_mb': 5.0},
+        'find_hotspots': {'seconds': 9.0, 'peak_mb': 1.0},
+    }
+
+    problems = regressions(results, baseline, tolerance=0.5)
+
+    assert len(problems) == 2
+    assert problems[0].startswith('find_todos: peak_mb 16.0')
+    assert problems[1].startswith('excavate: seconds 3.5')
@@ -0,0 +1,84 @@
+"""
+Tests for the blame engine behind the oldest code and the code age histogram.
+"""
+
+import calendar
+from git import Actor, Repo
+from blame import AGE_BUCKETS, BlameEngine, parse_incremental_blame
+from cache import DiskCache
+from git_analyzer import GitArchaeologist
+
+AUTHOR = Actor('Archaeologist', 'dig@example.com')
+
+OLD_SHA = 'a' * 40
+NEW_SHA = 'b' * 40
+
+
+def test_parse_incremental_blame():
+    """Hunks keep their final line and length; commit details are given once per commit."""
+    output = [
+        f'{NEW_SHA} 3 3 2\n'.encode(),
+        b'author Archaeologist\n',
+        b'author-time 1600000000\n',
+        b'summary Add the new lines\n',
+        b'filename app.py\n',
+        f'{OLD_SHA} 1 1 2\n'.encode(),
+        b'author-time 1500000000\n',
+        b'summary Caf\xc3\xa9 opens\n',
+        b'filename app.py\n',
+        f'{OLD_SHA} 3 5 1\n'.encode(),
+        b'filename app.py\n',
+    ]
+    hunks, commits = parse_incremental_blame(output)
+
+    assert hunks == [[3, 2, NEW_SHA], [1, 2, OLD_SHA], [5, 1, OLD_SHA]]
+    assert commits == {NEW_SHA: [1600000000, 'Add the new lines'], OLD_SHA: [1500000000, 'Café opens']}
+
+
+def test_histogram_and_oldest_files(tmp_path):
+    """Lines are counted by age; binary and oversized files are left out; blames are cached."""
+    repo = Repo.init(tmp_path)
+    (tmp_path / 'app.py').write_text('a = 1\nb = 2\n')
+    (tmp_path / 'logo.png').write_bytes(b'\x89PNG\0' + b'\n' * 10)
+    repo.index.add(['app.py', 'logo.png'])
+    repo.index.commit('Found', author=AUTHOR, committer=AUTHOR, author_date='2015-01-01T00:00:00')
+    (tmp_path / 'app.py').write_text('a = 1\nb = 2\nc = 3\n')
+    (tmp_path / 'new.py').write_text('n = 1\n')
+    (tmp_path / 'bundle.js').write_text('x\n' * 3000)
+    repo.index.add(['app.py', 'new.py', 'bundle.js'])
+    repo.index.commit('Grow', author=AUTHOR, committer=AUTHOR, author_date='2020-01-01T00:00:00')
+
+    now = calendar.timegm((2020, 1, 15, 0, 0, 0))
+    cache = DiskCache(str(tmp_path / 'blame.db'))
+    engine = BlameEngine(str(tmp_path), cache=cache, max_bytes=1000)
+    oldest, histogram = engine.summarize(now=now)
+    again = engine.summarize(now=now)
+
+    buckets = dict(zip([label for label, _ in AGE_BUCKETS], histogram))
+    assert buckets == {'< 1 month': 2, '1-6 months': 0, '6-12 months': 0, '1-2 years': 0, '2-5 years': 0, '5+ years': 2}
+    assert [(path, line) for _, path, line, _, summary in oldest] == [('app.py', 1), ('new.py', 1)]
+    assert oldest[0][4] == 'Found'
+    assert again == (oldest, histogram)
+    assert cache.hits == 2
+
+
+def test_blame_follows_the_scan_scope(tmp_path):
+    """Only the files the scan would look at are blamed: pathspecs apply, vendored files don't count."""
+    repo = Repo.init(tmp_path)
+    files = {
+        '.gitattributes': 'vendor/** linguist-vendored\n',
+        'src/app.py': 'a = 1\n',
+        'vendor/lib.js': 'var x = 1;\n',
+        'tools/build.py': 'b = 2\n',
+    }
+    for name, content in files.items():
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).write_text(content)
+    repo.index.add(list(files))
+    repo.index.commit('Found', author=AUTHOR, committer=AUTHOR)
+
+    everything = GitArchaeologist(str(tmp_path)).find_oldest_code()
+    assert sorted(item['file'] for item in everything) == ['.gitattributes', 'src/app.py', 'tools/build.py']
+    narrowed = GitArchaeologist(str(tmp_path), include=['src/']).analyze_code_age()
+    assert [item['file'] for item in narrowed['oldest_code']] == ['src/app.py']
+    assert narrowed['code_age']['total_lines'] == 1
@@ -0,0 +1,73 @@
+"""
+Tests for the churn index and the churn × complexity hotspot ranking.
+"""
+
+from git import Actor, Repo
+from churn import ChurnIndex
+from git_analyzer import GitArchaeologist
+
+BRANCHY = 'def route(x):\n    if x:\n        for y in x:\n            if y and x:\n                pass\n'
+
+
+def test_churn_columns_from_one_history_pass(tmp_path):
+    """Commits, line counts, distinct authors and last change are counted per path."""
+    repo = Repo.init(tmp_path)
+    alice = Actor('Alice', 'alice@example.com')
+    bob = Actor('Bob', 'bob@example.com')
+    source = tmp_path / 'app.py'
+
+    source.write_text('x = 1\n')
+    repo.index.add(['app.py'])
+    repo.index.commit('Add app', author=alice, committer=alice, author_date='2020-01-01T00:00:00')
+    source.write_text('x = 2\ny = 3\n')
+    (tmp_path / 'other.py').write_text('z = 1\n')
+    repo.index.add(['app.py', 'other.py'])
+    repo.index.commit('Change app', author=bob, committer=bob, author_date='2021-06-01T00:00:00')
+
+    churn = ChurnIndex.from_history(str(tmp_path))
+    slot = churn.paths.index('app.py')
+
+    assert churn.commits[slot] == 2
+    assert (churn.added[slot], churn.removed[slot]) == (3, 1)
+    assert churn.authors()[slot] == 2
+    assert churn.authors()[churn.paths.index('other.py')] == 1
+
+
+def test_merges_are_not_counted_twice(tmp_path):
+    """A change made on a merged branch counts once, for the commit that made it."""
+    repo = Repo.init(tmp_path)
+    author = Actor('Archaeologist', 'dig@example.com')
+    source = tmp_path / 'app.py'
+    source.write_text('x = 1\n')
+    repo.index.add(['app.py'])
+    base = repo.index.commit('Add app', author=author, committer=author)
+    source.write_text('x = 1\ny = 2\nz = 3\n')
+    repo.index.add(['app.py'])
+    side = repo.index.commit('Grow app', parent_commits=[base], head=False, author=author, committer=author)
+    repo.index.commit('Merge', parent_commits=[base, side], author=author, committer=author)
+
+    churn = ChurnIndex.from_history(str(tmp_path))
+    slot = churn.paths.index('app.py')
+    assert (churn.commits[slot], churn.added[slot]) == (2, 3)
+
+
+def test_hotspots_rank_complex_files_that_change_often(tmp_path):
+    """A complex file edited often outranks a complex file edited once and a simple one edited often."""
+    repo = Repo.init(tmp_path)
+    author = Actor('Archaeologist', 'dig@example.com')
+    for i in range(4):
+        (tmp_path / 'hot.py').write_text(BRANCHY + f'# revision {i}\n')
+        (tmp_path / 'busy.py').write_text(f'x = {i}\n')
+        files = ['hot.py', 'busy.py']
+        if i == 0:
+            (tmp_path / 'stable.py').write_text(BRANCHY)
+            files.append('stable.py')
+        repo.index.add(files)
+        repo.index.commit(f'Revision {i}', author=author, committer=author)
+
+    hotspots = GitArchaeologist(str(tmp_path)).find_hotspots()
+
+    assert [spot['file'] for spot in hotspots] == ['hot.py', 'stable.py', 'busy.py']
+    assert hotspots[0]['score'] == 100.0
+    assert hotspots[0]['commits'] == 4
+    assert hotspots[0]['level'] == 'low'
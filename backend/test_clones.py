@@ -0,0 +1,83 @@
+"""
+Tests for the winnowed fingerprints behind the duplicate-code detector.
+"""
+
+from git import Actor, Repo
+from clones import FingerprintIndex, c_family_tokens, fingerprints, python_tokens
+from git_analyzer import GitArchaeologist
+
+PYTHON_BLOCK = '''
+def {name}(records, limit):
+    """Sum the positive values of the first records."""
+    total = 0
+    for record in records[:limit]:
+        value = record.get('value', 0)
+        if value > 0 and record['active']:
+            total += value * 2
+        else:
+            total -= 1
+    return {{'total': total, 'count': len(records)}}
+'''
+
+JS_BLOCK = '''
+function {name}(items, limit) {{
+  // a comment that differs: {name}
+  let total = 0;
+  for (const item of items.slice(0, limit)) {{
+    if (item.value > 0 && item.active) {{
+      total += item.value * 2;
+    }} else {{
+      total -= 1;
+    }}
+  }}
+  return {{ total: total, count: items.length }};
+}}
+'''
+
+
+def test_renamed_copies_share_fingerprints():
+    """Identifiers, literals and comments are normalized away; the shape of the code is not."""
+    original = fingerprints(*python_tokens(PYTHON_BLOCK.format(name='summarize')))[0]
+    renamed = fingerprints(*python_tokens(PYTHON_BLOCK.format(name='tally').replace('total', 'acc')))[0]
+    different = fingerprints(*python_tokens(PYTHON_BLOCK.format(name='x').replace('> 0 and', '< 0 or not')))[0]
+
+    assert len(original) > 0
+    assert list(original) == list(renamed)
+    assert set(original) != set(different)
+
+    js = fingerprints(*c_family_tokens(JS_BLOCK.format(name='summarize')))[0]
+    assert list(js) == list(fingerprints(*c_family_tokens(JS_BLOCK.format(name='other')))[0])
+
+
+def test_clone_groups_span_files():
+    """Copies in several files form one group; a file repeating a pattern within itself does not."""
+    index = FingerprintIndex()
+    for name, content in (
+        ('a.py', 'import os\n' + PYTHON_BLOCK.format(name='first')),
+        ('b.py', PYTHON_BLOCK.format(name='second') + '\n\nprint(1)\n'),
+        ('c.py', '\n' * 20 + PYTHON_BLOCK.format(name='third')),
+        ('table.py', 'TABLE = [\n' + '    (1, 2, 3),\n' * 200 + ']\n'),
+    ):
+        index.add_file(name, *fingerprints(*python_tokens(content)))
+
+    groups = index.clone_groups()
+    assert len(groups) == 1
+    assert groups[0]['copies'] == 3
+    # Each copy is located at the same lines of its block (where winnowing picked the first fingerprint)
+    starts = {location['file']: location['start_line'] for location in groups[0]['locations']}
+    assert starts['a.py'] - 3 == starts['b.py'] - 2 == starts['c.py'] - 22
+
+
+def test_excavation_reports_duplicates(tmp_path):
+    """The detector runs in the shared scan and ranks groups by duplicated lines."""
+    repo = Repo.init(tmp_path)
+    author = Actor('Archaeologist', 'dig@example.com')
+    (tmp_path / 'one.js').write_text(JS_BLOCK.format(name='one'))
+    (tmp_path / 'two.js').write_text(JS_BLOCK.format(name='two'))
+    (tmp_path / 'unique.py').write_text(PYTHON_BLOCK.format(name='alone'))
+    repo.index.add(['one.js', 'two.js', 'unique.py'])
+    repo.index.commit('Copy', author=author, committer=author)
+
+    artifacts = dict(GitArchaeologist(str(tmp_path)).iter_excavate())
+    assert [location['file'] for location in artifacts['duplicate_code'][0]['locations']] == ['/one.js', '/two.js']
+    assert len(artifacts['duplicate_code']) == 1
@@ -0,0 +1,82 @@
+"""
+Tests for the token-based complexity engine behind the heatmap.
+"""
+
+import ast
+import numpy as np
+from complexity import c_family_complexity, python_complexity, score_files
+
+PYTHON_SOURCE = '''
+def route(request, user):
+    """if this docstring were code it would count"""
+    # if this comment were code it would count too
+    if request.method == 'GET' and user:
+        for item in request.items:
+            if item:
+                pass
+    elif request.method == 'POST':
+        label = 'admin' if user.admin else 'user'
+    return [item for item in request.items if item]
+
+
+def simple():
+    return 'if or and while'
+'''
+
+JS_SOURCE = '''
+// if (a && b) { while (c) {} }
+const template = "if (x) { for (;;) {} }";
+function handle(event) {
+  if (event.ok && event.data) {
+    for (const item of event.data) {
+      item.ready ? send(item) : queue(item);
+    }
+  } else if (event.retry || event.force) {
+    retry();
+  }
+}
+const render = (props) => {
+  return props?.title ?? 'Untitled';
+};
+'''
+
+
+def test_python_metrics_ignore_strings_and_comments():
+    """Branches, boolean operators, conditional expressions and comprehension filters count; elif doesn't nest."""
+    metrics = python_complexity(PYTHON_SOURCE, ast.parse(PYTHON_SOURCE))
+
+    assert metrics['decisions'] == 8
+    assert metrics['max_depth'] == 3
+    assert metrics['functions'] == [
+        {'name': 'route', 'line': 2, 'complexity': 9, 'max_depth': 3},
+        {'name': 'simple', 'line': 14, 'complexity': 1, 'max_depth': 0},
+    ]
+
+
+def test_deeply_nested_python_falls_back_to_tokens():
+    """Files that parse but nest deeper than the AST visitor can recurse are measured from their tokens."""
+    content = 'if ready:\n    total = ' + ' + '.join(['a'] * 600) + '\n'
+    metrics = python_complexity(content, ast.parse(content))
+
+    assert (metrics['loc'], metrics['decisions'], metrics['max_depth']) == (2, 1, 1)
+
+
+def test_c_family_metrics_from_lexer():
+    """Keywords and operators in comments or strings don't count; functions and arrow functions are found."""
+    metrics = c_family_complexity(JS_SOURCE)
+
+    assert metrics['decisions'] == 7
+    assert metrics['max_depth'] == 2
+    assert metrics['loc'] == 13
+    assert [(f['name'], f['line'], f['complexity']) for f in metrics['functions']] == [
+        ('handle', 4, 7), ('render', 13, 2)
+    ]
+
+
+def test_bulk_scoring():
+    """Scores, levels and percentiles are computed for every file at once."""
+    scores, levels, percentiles = score_files(np.array([10, 100, 400, 10]), np.array([0, 20, 50, 0]), np.array([1, 4, 6, 1]))
+
+    assert scores.tolist() == [10.0, 130.0, 380.0, 10.0]
+    assert levels.tolist() == ['low', 'medium', 'critical', 'low']
+    assert percentiles.tolist() == [50.0, 75.0, 100.0, 50.0]
@@ -0,0 +1,85 @@
+"""
+Tests for the streaming git log parser.
+"""
+
+from git import Actor, Repo
+from history import iter_log, sample_commits, unquote_path
+
+AUTHOR = Actor('Archaeologist', 'dig@example.com')
+
+
+def commit(repo, message):
+    return repo.index.commit(message, author=AUTHOR, committer=AUTHOR)
+
+
+def test_log_records(tmp_path):
+    """Commits stream newest first with their numstat, or name-status with renames."""
+    repo = Repo.init(tmp_path)
+    (tmp_path / 'app.py').write_text('a = 1\nb = 2\nc = 3\n' * 5)
+    (tmp_path / 'logo.png').write_bytes(b'\x89PNG\0\0binary')
+    repo.index.add(['app.py', 'logo.png'])
+    first = commit(repo, 'Add app\n\nWith a body.')
+    (tmp_path / 'app.py').write_text('a = 1\nb = 2\nc = 3\n' * 5 + 'd = 4\n')
+    repo.index.add(['app.py'])
+    repo.index.move(['app.py', 'main.py'])
+    second = commit(repo, 'Rename app')
+
+    latest, oldest = iter_log(str(tmp_path), numstat=True)
+    assert (oldest['sha'], oldest['parents'], oldest['author']) == (first.hexsha, [], 'Archaeologist')
+    assert oldest['message'].strip() == 'Add app\n\nWith a body.'
+    assert oldest['timestamp'] == first.committed_date
+    # Binary files have no line counts
+    assert sorted(oldest['files']) == [(0, 0, 'logo.png'), (15, 0, 'app.py')]
+    # Without rename detection, like commit.stats
+    assert sorted(latest['files']) == [(0, 15, 'app.py'), (16, 0, 'main.py')]
+    assert latest['parents'] == [first.hexsha]
+
+    latest, oldest = iter_log(str(tmp_path), name_status=True)
+    assert latest['sha'] == second.hexsha
+    assert latest['files'] == [('R', 'main.py', 'app.py')]
+    assert sorted(oldest['files']) == [('A', 'app.py', None), ('A', 'logo.png', None)]
+
+
+def test_unusual_paths(tmp_path):
+    """Octal and backslash escapes of quoted paths are undone."""
+    assert unquote_path('"caf\\303\\251 \\"menu\\".py"') == 'café "menu".py'
+    assert unquote_path('"tab\\there.py"') == 'tab\there.py'
+    assert unquote_path('plain name.py') == 'plain name.py'
+
+    repo = Repo.init(tmp_path)
+    for name in ('café.py', 'tab\there.py'):
+        (tmp_path / name).write_text('x = 1\n')
+    repo.index.add(['café.py', 'tab\there.py'])
+    commit(repo, 'Unusual names')
+    [record] = iter_log(str(tmp_path), numstat=True)
+    assert sorted(path for _, _, path in record['files']) == ['café.py', 'tab\there.py']
+
+
+def test_samples_match_gitpython(tmp_path):
+    """The same commits are sampled as from GitPython's full commit list, with the same stats."""
+    repo = Repo.init(tmp_path)
+    for i in range(30):
+        (tmp_path / f'f{i % 4}.py').write_text(f'x = {i}\n' * (i + 1))
+        repo.index.add([f'f{i % 4}.py'])
+        commit(repo, f'Change {i}')
+        if i == 20:
+            # Merge a side branch adding one file
+            main = repo.head.commit
+            (tmp_path / 'side.py').write_text('side = 1\n')
+            repo.index.add(['side.py'])
+            side = repo.index.commit('Side', parent_commits=[main], head=False, author=AUTHOR, committer=AUTHOR)
+            repo.index.commit('Merge side', parent_commits=[main, side], author=AUTHOR, committer=AUTHOR)
+
+    commits = list(repo.iter_commits())
+    step = max(len(commits) // 10, 1)
+    expected = [
+        (c.hexsha, c.committed_date, c.author.name, c.message,
+         {path: (stat['insertions'], stat['deletions']) for path, stat in c.stats.files.items()})
+        for c in commits[::step]
+    ]
+    sampled = [
+        (c['sha'], c['timestamp'], c['author'], c['message'], {path: (added, removed) for added, removed, path in c['files']})
+        for c in sample_commits(str(tmp_path), samples=10)
+    ]
+    assert sampled == expected
+    assert 'Merge side' in [message for _, _, _, message, _ in sampled]
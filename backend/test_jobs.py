@@ -0,0 +1,99 @@
+"""
+Tests for the background analysis job queue.
+"""
+
+import threading
+from analysis import AnalysisError
+from jobs import JobManager
+
+
+def test_in_flight_jobs_are_shared():
+    """A second submission for the same repository joins the running job."""
+    release = threading.Event()
+    runs = []
+
+    def runner(repo_path):
+        runs.append(repo_path)
+        yield {'event': 'status', 'stage': 'excavating'}
+        release.wait(5)
+        yield {'event': 'artifact', 'category': 'todos', 'data': []}
+        yield {'event': 'result', 'data': {'artifacts': {'todos': []}}}
+
+    manager = JobManager(max_workers=2, runner=runner)
+    first, created_first = manager.submit('/repo', repo_path='/repo')
+    second, created_second = manager.submit('/repo', repo_path='/repo')
+    release.set()
+    manager._pool.shutdown(wait=True)
+
+    assert created_first and not created_second
+    assert first is second
+    assert runs == ['/repo']
+    assert first.status == 'succeeded'
+    assert first.progress['artifacts'] == ['todos']
+    assert first.result == {'artifacts': {'todos': []}}
+
+
+def test_refresh_does_not_join_a_cached_job():
+    """A refresh starts its own job rather than sharing one that may serve a cached result."""
+    release = threading.Event()
+
+    def runner(repo_path, refresh=False):
+        release.wait(5)
+        yield {'event': 'result', 'data': {'refresh': refresh}}
+
+    manager = JobManager(max_workers=3, runner=runner)
+    plain, _ = manager.submit('/repo', repo_path='/repo')
+    fresh, created = manager.submit('/repo', repo_path='/repo', refresh=True)
+    joined, created_again = manager.submit('/repo', repo_path='/repo')
+    release.set()
+    manager._pool.shutdown(wait=True)
+
+    assert created and fresh is not plain
+    # Later submissions join the fresher job
+    assert not created_again and joined is fresh
+    assert fresh.result == {'refresh': True}
+    assert [event['event'] for event in fresh.iter_events()] == ['result']
+
+
+def test_failed_jobs_and_retention():
+    """Request errors are recorded on the job, and only max_finished jobs are kept."""
+    def runner(repo_path):
+        raise AnalysisError(f'Repository path does not exist: {repo_path}')
+        yield
+
+    manager = JobManager(max_workers=1, max_finished=2, runner=runner)
+    jobs = []
+    for i in range(3):
+        job, _ = manager.submit(f'/missing{i}', repo_path=f'/missing{i}')
+        jobs.append(job)
+        manager._pool.submit(lambda: None).result()  # Wait for the job to finish
+
+    assert jobs[-1].status == 'failed'
+    assert jobs[-1].error_type == 'request'
+    assert manager.get(jobs[0].id) is None
+    assert manager.get(jobs[-1].id) is jobs[-1]
+
+
+def test_cancelled_job_keeps_partial_result():
+    """Cancelling a running job stops its analysis through the job's budget."""
+    started = threading.Event()
+
+    def runner(repo_path):
+        from budget import current
+        started.set()
+        while not current().expired():
+            yield {'event': 'status', 'stage': 'excavating'}
+        yield {'event': 'result', 'data': {'metadata': {'cancelled': current().cancelled}}}
+
+    manager = JobManager(max_workers=1, runner=runner)
+    job, _ = manager.submit('/repo', repo_path='/repo')
+    started.wait(5)
+    assert manager.cancel(job.id) is job
+    # Not joined by new submissions once cancelled
+    replacement, created = manager.submit('/repo', repo_path='/repo')
+    manager.cancel(replacement.id)
+    manager._pool.shutdown(wait=True)
+
+    assert job.status == 'cancelled'
+    assert job.result == {'metadata': {'cancelled': True}}
+    assert created and replacement is not job
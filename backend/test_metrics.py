@@ -0,0 +1,70 @@
+"""
+Tests for per-request timings and the Prometheus metrics endpoint.
+"""
+
+import analysis
+from git import Actor, Repo
+from app import app
+from cache import MemoryCache
+from metrics import Registry
+from story_generator import StoryGenerator
+from test_story_generator import StubApi
+
+
+def test_prometheus_text_format():
+    """Counters and histograms render with their labels, cumulative buckets, sum and count."""
+    registry = Registry()
+    calls = registry.counter('calls_total', 'Calls made', ('kind',))
+    latency = registry.histogram('latency_seconds', 'Latency', ('kind',), buckets=(0.1, 1))
+    calls.inc(kind='a "quoted" kind')
+    latency.observe(0.5, kind='x')
+    latency.observe(2, kind='x')
+
+    assert registry.render().split('\n') == [
+        '# HELP calls_total Calls made',
+        '# TYPE calls_total counter',
+        'calls_total{kind="a \\"quoted\\" kind"} 1',
+        '# HELP latency_seconds Latency',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{kind="x",le="0.1"} 0',
+        'latency_seconds_bucket{kind="x",le="1"} 1',
+        'latency_seconds_bucket{kind="x",le="+Inf"} 2',
+        'latency_seconds_sum{kind="x"} 2.5',
+        'latency_seconds_count{kind="x"} 2',
+        '',
+    ]
+
+
+def test_analysis_reports_timings_and_metrics(tmp_path, monkeypatch):
+    """The response carries this request's breakdown; /api/metrics aggregates across requests."""
+    repo = Repo.init(tmp_path)
+    author = Actor('Archaeologist', 'dig@example.com')
+    (tmp_path / 'app.py').write_text('def unused():\n    pass  # TODO: remove\n')
+    repo.index.add(['app.py'])
+    repo.index.commit('Add app', author=author, committer=author)
+
+    api = StubApi(lambda prompt: 'A story.')
+    monkeypatch.setattr(analysis, 'RESULT_CACHE', MemoryCache())
+    monkeypatch.setattr(analysis, 'ANALYSIS_CACHE', None)
+    monkeypatch.setattr(analysis, 'StoryGenerator', lambda **options: StoryGenerator(
+        **dict(options, cache=None), api_key='test', base_url=api.url
+    ))
+
+    client = app.test_client()
+    response = client.post('/api/analyze', json={'repo_path': str(tmp_path)})
+    timings = response.get_json()['metadata']['timings']
+    response.close()
+
+    assert {'scan', 'hotspots', 'timeline', 'complexity_history', 'blame', 'stories'} <= set(timings['stages'])
+    # Read once by the scan and once by the complexity history of the single commit
+    assert timings['files_scanned'] == 2
+    assert timings['bytes_scanned'] == 2 * (tmp_path / 'app.py').stat().st_size
+    assert timings['git_commands'] > 0
+    assert timings['llm_ok'] == len(api.prompts)
+    assert timings['llm_output_tokens'] == len(api.prompts)
+
+    exposition = client.get('/api/metrics').get_data(as_text=True)
+    assert 'archaeology_stage_seconds_count{stage="scan"}' in exposition
+    assert 'archaeology_git_commands_total{command="log"}' in exposition
+    assert 'archaeology_llm_requests_total{outcome="ok"}' in exposition
+    assert 'archaeology_http_request_seconds_count{method="POST",endpoint="/api/analyze",status="200"} 1' in exposition
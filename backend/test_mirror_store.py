@@ -0,0 +1,71 @@
+"""
+Tests for the persistent mirror store, using local file:// remotes.
+"""
+
+import os
+import pytest
+from git import Actor, Repo
+from git_cmd import GitCommandError, git_output
+from mirror_store import MirrorStore
+
+AUTHOR = Actor('Archaeologist', 'dig@example.com')
+
+
+def make_remote(path, files):
+    """Create a repository at path with one commit containing the given files."""
+    repo = Repo.init(path)
+    commit_files(repo, files, 'Initial commit')
+    return repo
+
+
+def commit_files(repo, files, message):
+    for name, content in files.items():
+        with open(os.path.join(repo.working_tree_dir, name), 'w') as f:
+            f.write(content)
+    repo.index.add(list(files))
+    repo.index.commit(message, author=AUTHOR, committer=AUTHOR)
+
+
+def test_mirror_is_fetched_not_recloned(tmp_path):
+    """The second sync reuses the mirror and picks up new commits through a fetch."""
+    remote = make_remote(tmp_path / 'remote', {'app.py': 'print("v1")\n'})
+    url = (tmp_path / 'remote').as_uri()
+    store = MirrorStore(str(tmp_path / 'store'))
+
+    mirror = store.sync(url)
+    marker = os.path.join(mirror, 'marker')
+    open(marker, 'w').close()
+
+    commit_files(remote, {'app.py': 'print("v2")\n'}, 'Second commit')
+    with store.use(url + '/') as path:
+        assert git_output(path, 'show', 'HEAD:app.py') == b'print("v2")\n'
+        assert len(list(Repo(path).iter_commits())) == 2
+
+    # Same mirror (not recloned), index persisted for the next process
+    assert path == mirror and os.path.exists(marker)
+    assert MirrorStore(str(tmp_path / 'store')).stats()['repositories'] == [url + '/']
+
+
+def test_least_recently_used_idle_mirror_is_evicted(tmp_path):
+    """Going over the quota evicts the oldest mirror, but never one that is in use."""
+    urls = []
+    for name in ('first', 'second'):
+        make_remote(tmp_path / name, {'README.md': f'# {name}\n'})
+        urls.append((tmp_path / name).as_uri())
+    store = MirrorStore(str(tmp_path / 'store'))
+
+    with store.use(urls[0]):
+        store.sync(urls[1])
+        assert store.evict(max_bytes=0) == [urls[1]]
+
+    assert store.evict(max_bytes=0) == [urls[0]]
+    assert store.stats()['mirrors'] == 0
+
+
+def test_urls_are_never_options(tmp_path):
+    """A URL that looks like an option is cloned from (and fails) rather than read as an option."""
+    marker = tmp_path / 'pwned'
+    store = MirrorStore(str(tmp_path / 'mirrors'))
+    with pytest.raises(GitCommandError, match="repository '--upload-pack="):
+        store.sync(f'--upload-pack=touch {marker};')
+    assert not marker.exists()
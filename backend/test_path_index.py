@@ -0,0 +1,84 @@
+"""
+Tests for the path-introduction index behind the file ages.
+"""
+
+import os
+from git import Actor, Repo
+from cache import DiskCache
+from git_analyzer import GitArchaeologist
+from path_index import INDEX_VERSION, PathIndex
+
+AUTHOR = Actor('Archaeologist', 'dig@example.com')
+
+
+def commit(repo, message, date):
+    return repo.index.commit(message, author=AUTHOR, committer=AUTHOR, author_date=date, commit_date=date)
+
+
+def test_renames_keep_their_introduction(tmp_path):
+    """Files are dated by the commit that added them, through renames; deleted files are dropped."""
+    repo = Repo.init(tmp_path)
+    (tmp_path / 'core.py').write_text('def core():\n    return 1\n' * 20)
+    (tmp_path / 'gone.py').write_text('x = 1\n')
+    repo.index.add(['core.py', 'gone.py'])
+    first = commit(repo, 'Found', '2019-01-01T00:00:00')
+    (tmp_path / 'later.py').write_text('y = 2\n')
+    repo.index.add(['later.py'])
+    second = commit(repo, 'Add later', '2020-01-01T00:00:00')
+    repo.index.move(['core.py', 'renamed.py'])
+    repo.index.remove(['gone.py'], working_tree=True)
+    commit(repo, 'Rename', '2021-01-01T00:00:00')
+
+    index = PathIndex.load(str(tmp_path))
+    assert set(index.paths) == {'renamed.py', 'later.py'}
+    assert index.introduced('renamed.py')[0] == first.hexsha
+    assert index.introduced('later.py')[0] == second.hexsha
+
+    oldest = GitArchaeologist(str(tmp_path)).find_oldest_files()
+    assert [(item['file'], item['introduced']) for item in oldest] == [
+        ('renamed.py', '2019-01-01'), ('later.py', '2020-01-01')
+    ]
+
+
+def test_merges_keep_what_they_kept(tmp_path):
+    """A path deleted on a side branch but kept by the merge stays indexed with its original date."""
+    repo = Repo.init(tmp_path)
+    (tmp_path / 'keep.py').write_text('k = 1\n')
+    repo.index.add(['keep.py'])
+    base = commit(repo, 'Found', '2019-01-01T00:00:00')
+    repo.index.remove(['keep.py'])
+    (tmp_path / 'side.py').write_text('s = 1\n')
+    repo.index.add(['side.py'])
+    side = repo.index.commit('Drop keep', parent_commits=[base], head=False, author=AUTHOR, committer=AUTHOR)
+    repo.index.add(['keep.py'])
+    merge = repo.index.commit('Merge, keeping keep.py', parent_commits=[base, side], author=AUTHOR, committer=AUTHOR)
+
+    index = PathIndex.load(str(tmp_path))
+    assert index.introduced('keep.py')[0] == base.hexsha
+    # Side branch additions date from the merge that brought them in
+    assert index.introduced('side.py')[0] == merge.hexsha
+    assert index.complete
+    assert [item['file'] for item in GitArchaeologist(str(tmp_path)).find_oldest_files()] == ['keep.py', 'side.py']
+
+
+def test_stored_index_is_updated_incrementally(tmp_path):
+    """A stored index only reads the commits made since it was built, and is stored again."""
+    work = tmp_path / 'repo'
+    repo = Repo.init(work)
+    (work / 'a.py').write_text('a = 1\n')
+    repo.index.add(['a.py'])
+    commit(repo, 'First', '2020-01-01T00:00:00')
+    cache = DiskCache(str(tmp_path / 'cache.db'))
+    first = PathIndex.load(str(work), cache=cache)
+
+    # Tamper with the stored entry: an incremental update keeps it, a rebuild would not
+    key = f'path-index:{INDEX_VERSION}:{os.path.realpath(work)}'
+    cache.set(key, {'commit': first.commit, 'paths': {'a.py': ['stored', 0]}})
+    (work / 'b.py').write_text('b = 1\n')
+    repo.index.add(['b.py'])
+    head = commit(repo, 'Second', '2021-01-01T00:00:00')
+
+    index = PathIndex.load(str(work), cache=cache)
+    assert index.introduced('a.py') == ('stored', 0)
+    assert index.introduced('b.py')[0] == head.hexsha
+    assert cache.get(key)['commit'] == head.hexsha
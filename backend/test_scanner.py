@@ -0,0 +1,242 @@
+"""
+Tests for the shared file scanner that feeds every content detector.
+"""
+
+import os
+import time
+import detectors
+import scanner
+from git import Actor, Repo
+from budget import Budget, limiting, within
+from cache import DiskCache
+from detectors import CONTENT_DETECTORS, ComplexityHeatmapDetector, DeadCodeDetector, TodoDetector
+from git_analyzer import GitArchaeologist
+from line_scan import find_candidate_lines
+from scanner import SourceFile, iter_files, scan, scan_history
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_single_pass_matches_individual_methods():
+    """One shared scan returns the same artifacts as each method on its own."""
+    archaeologist = GitArchaeologist(REPO_PATH)
+    scanned = archaeologist._scan(*(detector() for detector in CONTENT_DETECTORS))
+
+    assert scanned['dead_code'] == archaeologist.find_dead_code()
+    assert scanned['commented_code'] == archaeologist.find_commented_code()
+    assert scanned['todos'] == archaeologist.find_todos()
+    assert scanned['hall_of_shame'] == archaeologist.get_hall_of_shame()
+    assert scanned['complexity_heatmap'] == archaeologist.analyze_complexity_heatmap()
+
+
+def test_parallel_matches_serial():
+    """The process-pool path merges worker results back in scan order."""
+    serial = GitArchaeologist(REPO_PATH)._scan(*(detector() for detector in CONTENT_DETECTORS))
+    parallel = GitArchaeologist(REPO_PATH, workers=3)._scan(*(detector() for detector in CONTENT_DETECTORS))
+
+    assert parallel == serial
+
+
+def test_blob_cache_reuses_findings(tmp_path):
+    """A second cached scan answers every file from the cache with identical results."""
+    cache = DiskCache(str(tmp_path / 'analysis.db'))
+    expected = GitArchaeologist(REPO_PATH)._scan(*(detector() for detector in CONTENT_DETECTORS))
+
+    first = GitArchaeologist(REPO_PATH, cache=cache)._scan(*(detector() for detector in CONTENT_DETECTORS))
+    misses = cache.misses
+    second = GitArchaeologist(REPO_PATH, cache=cache)._scan(*(detector() for detector in CONTENT_DETECTORS))
+
+    assert first == expected
+    assert second == expected
+    assert cache.misses == misses
+    assert cache.hits > 0
+
+
+def test_blob_cache_keeps_extensions_apart(tmp_path):
+    """The same content under two extensions is cached separately, as detectors read them differently."""
+    Repo.init(tmp_path)
+    (tmp_path / 'tool.py').write_text('def unused():\n    pass\n')
+    (tmp_path / 'run.sh').write_text('def unused():\n    pass\n')
+    cache = DiskCache(str(tmp_path / 'analysis.db'))
+    expected = scan(str(tmp_path), [DeadCodeDetector()])['dead_code']
+
+    assert scan(str(tmp_path), [DeadCodeDetector()], cache=cache)['dead_code'] == expected
+    assert scan(str(tmp_path), [DeadCodeDetector()], cache=cache)['dead_code'] == expected
+
+
+def test_candidate_lines(tmp_path):
+    """Hit lines keep their line numbers and original case; binary and oversized files are skipped."""
+    content = b'int x;\r\n// Todo: tidy\r\nint y; /* fixme */ // HACK\n\nreturn 0;'
+    assert find_candidate_lines(content) == [(2, '// Todo: tidy\r'), (3, 'int y; /* fixme */ // HACK')]
+    assert find_candidate_lines(content, max_bytes=10) == []
+    assert find_candidate_lines(b'// TODO\0\1\2') == []
+    assert find_candidate_lines(b'') == []
+
+    # Files are scanned in the bytes they are read into, whether from disk or the object database
+    (tmp_path / 'app.c').write_bytes(content)
+    assert SourceFile(str(tmp_path), str(tmp_path / 'app.c')).candidate_lines == find_candidate_lines(content)
+    blob = SourceFile(str(tmp_path), str(tmp_path / 'blob.c'), data=b'x = 1  # todo\n')
+    assert blob.candidate_lines == [(1, 'x = 1  # todo')]
+
+
+def test_enumeration_follows_git(tmp_path):
+    """Ignored, vendored and generated files are skipped; pathspecs narrow the rest."""
+    files = {
+        '.gitignore': 'build/\n',
+        '.gitattributes': 'third_party/** linguist-vendored\n*.pb.py linguist-generated=true\n',
+        'src/app.py': '',
+        'src/app_test.py': '',
+        'src/messages.pb.py': '',
+        'build/out.py': '',
+        'third_party/lib.py': '',
+    }
+    for path, content in files.items():
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text(content)
+    Repo.init(tmp_path).index.add(['.gitignore', 'src/app.py'])
+
+    def listed(**pathspecs):
+        return sorted(os.path.relpath(path, tmp_path) for path in iter_files(str(tmp_path), **pathspecs))
+
+    assert listed() == ['.gitattributes', '.gitignore', 'src/app.py', 'src/app_test.py']
+    assert listed(include=['src/'], exclude=['*_test.py']) == ['src/app.py']
+
+
+def test_historical_commit_of_bare_repository(tmp_path):
+    """A bare clone is excavated at any commit straight from the object database."""
+    repo = Repo.init(tmp_path / 'work')
+    author = Actor('Archaeologist', 'dig@example.com')
+    source = tmp_path / 'work' / 'app.py'
+    source.write_text('x = 1  # TODO: remove\n')
+    repo.index.add(['app.py'])
+    first = repo.index.commit('Add app', author=author, committer=author)
+    source.write_text('x = 1\n')
+    repo.index.add(['app.py'])
+    repo.index.commit('Finish app', author=author, committer=author)
+
+    bare_path = str(tmp_path / 'bare.git')
+    repo.clone(bare_path, bare=True)
+
+    assert GitArchaeologist(bare_path, rev=first.hexsha).find_todos() == [
+        {'file': '/app.py', 'line': 1, 'text': 'x = 1  # TODO: remove'}
+    ]
+    assert GitArchaeologist(bare_path, rev='HEAD').find_todos() == []
+
+
+def test_history_only_analyzes_changed_blobs(tmp_path):
+    """Walking sampled commits analyzes each blob once and scores match a scan of each commit."""
+    repo = Repo.init(tmp_path)
+    author = Actor('Archaeologist', 'dig@example.com')
+    (tmp_path / 'stable.py').write_text('def stable():\n    return 1\n')
+    (tmp_path / 'growing.py').write_text('def grow(x):\n    return x\n')
+    repo.index.add(['stable.py', 'growing.py'])
+    first = repo.index.commit('Start', author=author, committer=author)
+    (tmp_path / 'growing.py').write_text('def grow(x):\n    if x:\n        for y in x:\n            if y or x:\n                pass\n')
+    repo.index.add(['growing.py'])
+    second = repo.index.commit('Grow', author=author, committer=author)
+
+    analyzed = []
+
+    class CountingDetector(ComplexityHeatmapDetector):
+        def analyze(self, source):
+            analyzed.append(source.relative_path)
+            return super().analyze(source)
+
+    detector = CountingDetector()
+    snapshots = [results for _, results in scan_history(str(tmp_path), [detector], [first.hexsha, second.hexsha])]
+
+    assert sorted(analyzed) == ['growing.py', 'growing.py', 'stable.py']
+    history = {series['file']: series['scores'] for series in detector.history(snapshots)}
+    for column, commit in enumerate((first, second)):
+        heatmap = GitArchaeologist(str(tmp_path), rev=commit.hexsha).analyze_complexity_heatmap()
+        assert {item['file']: history[item['file']][column] for item in heatmap} == {
+            item['file']: round(item['score'], 1) for item in heatmap
+        }
+    assert history['growing.py'][0] < history['growing.py'][1]
+
+
+def test_history_leaves_out_failed_files(tmp_path, monkeypatch):
+    """A file the detector fails on is missing from the history, which still covers the other files."""
+    repo = Repo.init(tmp_path)
+    author = Actor('Archaeologist', 'dig@example.com')
+    (tmp_path / 'ok.py').write_text('def ok():\n    return 1\n')
+    (tmp_path / 'broken.py').write_text('BROKEN = 1\n')
+    repo.index.add(['ok.py', 'broken.py'])
+    repo.index.commit('Start', author=author, committer=author)
+
+    python_complexity = detectors.python_complexity
+
+    def failing(content, tree=None):
+        if 'BROKEN' in content:
+            raise RecursionError('maximum recursion depth exceeded')
+        return python_complexity(content, tree)
+
+    monkeypatch.setattr(detectors, 'python_complexity', failing)
+    history = GitArchaeologist(str(tmp_path)).analyze_complexity_history()
+
+    assert len(history['commits']) == 1
+    assert [series['file'] for series in history['files']] == ['ok.py']
+
+
+def test_oversized_and_slow_files_are_skipped(tmp_path, monkeypatch):
+    """Files over the size cap aren't read and files over the time limit give no findings; neither is cached."""
+    Repo.init(tmp_path)
+    (tmp_path / 'small.py').write_text('# TODO: keep\n')
+    (tmp_path / 'bundle.py').write_text('# TODO: huge\n' + 'x = 1\n' * 200)
+    (tmp_path / 'slow.py').write_text('# TODO: slow\n')
+    monkeypatch.setattr(scanner, 'MAX_FILE_BYTES', 100)
+
+    class SlowDetector(ComplexityHeatmapDetector):
+        def analyze(self, source):
+            if source.filename == 'slow.py':
+                time.sleep(1)
+            return super().analyze(source)
+
+    cache = DiskCache(str(tmp_path / 'analysis.db'))
+    monkeypatch.setattr(scanner, 'FILE_TIME_LIMIT', 0.2)
+    start = time.perf_counter()
+    heatmap = scan(str(tmp_path), [SlowDetector()], cache=cache)['complexity_heatmap']
+    assert time.perf_counter() - start < 1  # Interrupted rather than waited for
+    assert [item['file'] for item in heatmap] == ['small.py']
+    skipped = [
+        scanner.blob_key(scanner.SourceFile(str(tmp_path), str(tmp_path / name)), scanner.hash_blob(str(tmp_path / name)))
+        for name in ('bundle.py', 'slow.py')
+    ]
+    assert cache.get_many(skipped) == {}
+
+
+def test_oversized_blobs_are_not_read(tmp_path, monkeypatch):
+    """At a commit, blobs over the size cap are skipped by their size alone, before their content is read."""
+    repo = Repo.init(tmp_path)
+    (tmp_path / 'small.py').write_text('# TODO: keep\n')
+    (tmp_path / 'bundle.py').write_text('# TODO: huge\n' + 'x = 1\n' * 200)
+    repo.index.add(['small.py', 'bundle.py'])
+    head = repo.index.commit('Add', author=Actor('Archaeologist', 'dig@example.com'))
+    monkeypatch.setattr(scanner, 'MAX_FILE_BYTES', 100)
+
+    read = []
+    original = scanner.CatFile.read
+    monkeypatch.setattr(scanner.CatFile, 'read', lambda self, sha: read.append(sha) or original(self, sha))
+    todos = scan(str(tmp_path), [TodoDetector()], rev=head.hexsha)['todos']
+
+    assert [item['file'] for item in todos] == ['/small.py']
+    assert read == [head.tree['small.py'].hexsha]
+
+
+def test_expired_budget_returns_partial_results(tmp_path):
+    """A stage that runs out of time returns what it finished and is reported as timed out."""
+    Repo.init(tmp_path)
+    for i in range(3):
+        (tmp_path / f'f{i}.py').write_text('# TODO: later\n')
+
+    budget = Budget(60)
+    with limiting(budget):
+        with within('scan', 60) as stage:
+            stage.deadline = time.time()  # Out of time before the first file
+            todos = scan(str(tmp_path), [TodoDetector()])['todos']
+        with within('blame', 60):
+            complete = scan(str(tmp_path), [TodoDetector()])['todos']
+
+    assert todos == []
+    assert len(complete) == 3
+    assert budget.timed_out == ['scan']
@@ -0,0 +1,134 @@
+"""
+Tests for concurrent and batched story generation, against a local stub of the Messages API.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from cache import MemoryCache
+from story_generator import StoryGenerator
+
+CATEGORIES = ('dead_code', 'todos', 'hall_of_shame')
+ARTIFACTS = {
+    'dead_code': [{'name': 'forgotten', 'file': '/app.py', 'line': 3}],
+    'todos': [{'file': '/app.py', 'line': 7, 'text': '# TODO: finish this'}],
+    'hall_of_shame': [],
+}
+
+
+class StubApi:
+    """A Messages API stand-in that answers with a canned reply after a delay."""
+
+    def __init__(self, reply, delay=0.0, fail_first=0):
+        self.reply = reply
+        self.delay = delay
+        self.fail_first = fail_first
+        self.prompts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                status, payload = stub.handle(body['messages'][0]['content'])
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.send_header('retry-after-ms', '10')
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def handle(self, prompt):
+        with self.lock:
+            self.prompts.append(prompt)
+            failing = len(self.prompts) <= self.fail_first
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+
+        if failing:
+            return 529, {'type': 'error', 'error': {'type': 'overloaded_error', 'message': 'Overloaded'}}
+        return 200, {
+            'id': 'msg_stub', 'type': 'message', 'role': 'assistant', 'model': 'stub',
+            'content': [{'type': 'text', 'text': self.reply(prompt)}],
+            'stop_reason': 'end_turn', 'stop_sequence': None,
+            'usage': {'input_tokens': 1, 'output_tokens': 1}
+        }
+
+
+def test_stories_are_generated_concurrently():
+    """Requests overlap up to the concurrency limit; empty categories need no request."""
+    api = StubApi(lambda prompt: 'A story.', delay=0.2)
+    generator = StoryGenerator(max_concurrency=2, api_key='test', base_url=api.url)
+
+    stories = dict(generator.iter_stories(ARTIFACTS, CATEGORIES))
+
+    assert set(stories) == {'excavation_summary', 'dead_code_story', 'todos_story', 'hall_of_shame_story'}
+    assert stories['hall_of_shame_story'] == 'No artifacts found in this category.'
+    assert stories['dead_code_story'] == 'A story.'
+    assert len(api.prompts) == 3
+    assert api.max_in_flight == 2
+    assert generator.failures == 0
+
+
+def test_overloaded_calls_are_retried():
+    """A failing call is retried with backoff before falling back to placeholder text."""
+    api = StubApi(lambda prompt: 'A story.', fail_first=1)
+    generator = StoryGenerator(max_concurrency=1, max_retries=1, api_key='test', base_url=api.url)
+
+    assert generator.generate_artifact_story('todos', ARTIFACTS['todos']) == 'A story.'
+    assert len(api.prompts) == 2
+
+    api.fail_first = 10
+    story = generator.generate_artifact_story('todos', ARTIFACTS['todos'])
+    assert story.startswith('The ancient texts are too weathered to read')
+    assert generator.failures == 1
+
+
+def test_batched_mode_uses_one_request_for_all_categories():
+    """All category stories come from one JSON reply; a category missing from it is asked for separately."""
+    def reply(prompt):
+        if 'JSON object' in prompt:
+            return '```json\n{"dead_code": "Batched dead code story."}\n```'
+        return 'Single story.'
+
+    api = StubApi(reply)
+    generator = StoryGenerator(batched=True, api_key='test', base_url=api.url)
+
+    stories = dict(generator.iter_stories(ARTIFACTS, CATEGORIES))
+
+    assert stories['dead_code_story'] == 'Batched dead code story.'
+    assert stories['todos_story'] == 'Single story.'
+    assert stories['hall_of_shame_story'] == 'No artifacts found in this category.'
+    # Summary, batch and the one story missing from the batch
+    assert len(api.prompts) == 3
+
+
+def test_replies_are_cached_but_failures_are_not():
+    """An identical prompt is answered from the cache; placeholder text after a failure is not stored."""
+    api = StubApi(lambda prompt: 'A story.', fail_first=1)
+    cache = MemoryCache()
+    generator = StoryGenerator(max_retries=0, api_key='test', base_url=api.url, cache=cache)
+
+    story = generator.generate_artifact_story('todos', ARTIFACTS['todos'])
+    assert story.startswith('The ancient texts are too weathered to read')
+    assert cache.stats()['entries'] == 0
+
+    assert generator.generate_artifact_story('todos', ARTIFACTS['todos']) == 'A story.'
+    assert generator.generate_artifact_story('todos', ARTIFACTS['todos']) == 'A story.'
+    assert len(api.prompts) == 2
+    assert cache.stats()['hits'] == 1
@@ -0,0 +1,59 @@
+"""
+Tests for the repository-wide symbol index behind dead code detection.
+"""
+
+from git import Repo
+from detectors import DeadCodeDetector
+from git_analyzer import GitArchaeologist
+
+
+def make_repo(tmp_path, files):
+    """Create a git repository containing the given {path: content} files."""
+    for path, content in files.items():
+        full_path = tmp_path / path
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        full_path.write_text(content)
+    Repo.init(tmp_path)
+    return str(tmp_path)
+
+
+def test_cross_file_references_keep_functions_alive(tmp_path):
+    """A function called from another module is not dead; an unreferenced one is."""
+    repo_path = make_repo(tmp_path, {
+        'lib/helpers.py': 'def used_helper():\n    pass\n\n\ndef forgotten_helper():\n    pass\n',
+        'main.py': 'from lib import helpers\n\nhelpers.used_helper()\n',
+    })
+
+    dead = GitArchaeologist(repo_path).find_dead_code()
+
+    assert [(item['name'], item['file']) for item in dead] == [('forgotten_helper', '/lib/helpers.py')]
+
+
+def test_methods_classes_and_exports(tmp_path):
+    """Async methods and classes are indexed; __all__ exports and non-Python references count as uses."""
+    repo_path = make_repo(tmp_path, {
+        'service.py': (
+            '__all__ = ["PublicApi"]\n\n\n'
+            'class PublicApi:\n    pass\n\n\n'
+            'class Worker:\n'
+            '    async def fetch(self):\n        pass\n\n'
+            '    def from_template(self):\n        pass\n'
+        ),
+        'templates/page.html': '<div>{{ worker.from_template() }}</div>\n',
+    })
+
+    dead = GitArchaeologist(repo_path)._scan(DeadCodeDetector())['dead_code']
+
+    assert {(item['type'], item['name']) for item in dead} == {('class', 'Worker'), ('method', 'fetch')}
+
+
+def test_deeply_nested_modules_still_reference_names(tmp_path):
+    """A module too deeply nested for the AST walk still keeps the functions it calls alive."""
+    repo_path = make_repo(tmp_path, {
+        'lib.py': 'def weight():\n    return 1\n\n\ndef unused():\n    pass\n',
+        'table.py': 'from lib import weight\n\ntotal = ' + ' + '.join(['weight()'] * 600) + '\n',
+    })
+
+    dead = GitArchaeologist(repo_path).find_dead_code()
+
+    assert [item['name'] for item in dead] == ['unused']
@@ -42,6 +42,66 @@ const deleteRepo = (repo) => {
   }
 }
 
+const API_URL = 'http://localhost:5000'
+
+// Artifacts start empty and fill in as the backend streams them
+const emptyResults = () => ({
+  artifacts: {
+    dead_code: [],
+    commented_code: [],
+    todos: [],
+    oldest_code: [],
+    oldest_files: [],
+    hall_of_shame: [],
+    complexity_heatmap: [],
+    hotspots: [],
+    duplicate_code: [],
+    timeline: [],
+    complexity_history: { commits: [], files: [] },
+  },
+  stories: {},
+  metadata: {},
+})
+
+// Stream an analysis from the backend, calling onEvent for each NDJSON event
+const streamAnalysis = async (payload, onEvent) => {
+  const response = await fetch(`${API_URL}/api/analyze/stream`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'Accept': 'application/x-ndjson',
+    },
+    body: JSON.stringify(payload),
+  })
+
+  if (!response.ok) {
+    const errorData = await response.json()
+    throw new Error(errorData.error || 'Analysis failed')
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+
+    buffer += decoder.decode(value, { stream: true })
+    const lines = buffer.split('\n')
+    buffer = lines.pop() // Keep any partial line for the next chunk
+
+    for (const line of lines) {
+      if (!line.trim()) continue
+      const event = JSON.parse(line)
+      if (event.event === 'error') {
+        throw new Error(event.error)
+      }
+      onEvent(event)
+    }
+  }
+}
+
 function App() {
   const [repoInput, setRepoInput] = useState('')
   const [isLocal, setIsLocal] = useState(false)
@@ -53,7 +113,7 @@ function App() {
   const [savedRepos, setSavedRepos] = useState([])
   const [showSavedRepos, setShowSavedRepos] = useState(false)
 
-  const exhibits = ['summary', 'dead_code', 'commented_code', 'todos', 'oldest_code', 'hall_of_shame', 'complexity_heatmap', 'timeline']
+  const exhibits = ['summary', 'dead_code', 'commented_code', 'todos', 'oldest_code', 'hall_of_shame', 'complexity_heatmap', 'hotspots', 'duplicate_code', 'timeline']
 
   // Load saved repos on mount
   useEffect(() => {
@@ -67,38 +127,52 @@ function App() {
     setActiveExhibit(newExhibit)
   }
 
-  const handleAnalyze = async () => {
-    if (!repoInput.trim()) {
-      setError('Please enter a repository path or URL')
-      return
-    }
-
+  // Run an excavation, rendering each artifact and story as it arrives
+  const runExcavation = async (payload) => {
     setLoading(true)
     setError(null)
     setResults(null)
+    setActiveExhibit('summary')
 
     try {
-      const payload = isLocal
-        ? { repo_path: repoInput }
-        : { repo_url: repoInput }
-
-      const response = await fetch('http://localhost:5000/api/analyze', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(payload),
+      await streamAnalysis(payload, (event) => {
+        if (event.event === 'artifact') {
+          setResults(prev => {
+            const base = prev || emptyResults()
+            return { ...base, artifacts: { ...base.artifacts, [event.category]: event.data } }
+          })
+        } else if (event.event === 'story') {
+          setResults(prev => {
+            const base = prev || emptyResults()
+            return { ...base, stories: { ...base.stories, [event.key]: event.data } }
+          })
+        } else if (event.event === 'metadata') {
+          setResults(prev => ({ ...(prev || emptyResults()), metadata: event.data }))
+        }
       })
+      return true
+    } catch (err) {
+      setResults(null)
+      setError(err.message)
+      return false
+    } finally {
+      setLoading(false)
+    }
+  }
 
-      if (!response.ok) {
-        const errorData = await response.json()
-        throw new Error(errorData.error || 'Analysis failed')
-      }
+  const handleAnalyze = async () => {
+    if (!repoInput.trim()) {
+      setError('Please enter a repository path or URL')
+      return
+    }
+
+    const payload = isLocal
+      ? { repo_path: repoInput }
+      : { repo_url: repoInput }
 
-      const data = await response.json()
-      setResults(data)
-      setActiveExhibit('summary')
+    const succeeded = await runExcavation(payload)
 
+    if (succeeded) {
       // Save repo to localStorage after successful analysis
       const repoToSave = {
         path: repoInput,
@@ -108,10 +182,6 @@ function App() {
       }
       const updated = saveRepo(repoToSave)
       setSavedRepos(updated)
-    } catch (err) {
-      setError(err.message)
-    } finally {
-      setLoading(false)
     }
   }
 
@@ -121,36 +191,11 @@ function App() {
     setShowSavedRepos(false)
 
     // Automatically start analysis
-    setLoading(true)
-    setError(null)
-    setResults(null)
-
-    try {
-      const payload = repo.isLocal
-        ? { repo_path: repo.path }
-        : { repo_url: repo.path }
-
-      const response = await fetch('http://localhost:5000/api/analyze', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(payload),
-      })
+    const payload = repo.isLocal
+      ? { repo_path: repo.path }
+      : { repo_url: repo.path }
 
-      if (!response.ok) {
-        const errorData = await response.json()
-        throw new Error(errorData.error || 'Analysis failed')
-      }
-
-      const data = await response.json()
-      setResults(data)
-      setActiveExhibit('summary')
-    } catch (err) {
-      setError(err.message)
-    } finally {
-      setLoading(false)
-    }
+    await runExcavation(payload)
   }
 
   const handleDeleteSavedRepo = (repo) => {
@@ -161,14 +206,23 @@ function App() {
   const renderExhibit = () => {
     if (!results) return null
 
-    const { artifacts, stories } = results
+    const { artifacts } = results
+    // Stories stream in after the artifacts; show a placeholder until each arrives
+    const story = (key) => results.stories[key] ?? '🔍 Deciphering the ancient texts...'
+
+    // First and latest score of a file across the sampled commits
+    const trend = (file) => {
+      const series = artifacts.complexity_history?.files?.find((entry) => entry.file === file)
+      const scores = (series?.scores ?? []).filter((score) => score !== null)
+      return scores.length > 1 ? `${scores[0]} → ${scores[scores.length - 1]} over history` : null
+    }
 
     switch (activeExhibit) {
       case 'summary':
         return (
           <div className="exhibit">
             <h2>🏛️ Excavation Summary</h2>
-            <div className="story-text">{stories.excavation_summary}</div>
+            <div className="story-text">{story('excavation_summary')}</div>
             <div className="stats-grid">
               <div className="stat-card">
                 <div className="stat-number">{artifacts.dead_code.length}</div>
@@ -202,7 +256,7 @@ function App() {
         return (
           <div className="exhibit">
             <h2>💀 The Graveyard: Dead Code</h2>
-            <div className="story-text">{stories.dead_code_story}</div>
+            <div className="story-text">{story('dead_code_story')}</div>
             <div className="artifacts-list">
               {artifacts.dead_code.map((item, idx) => (
                 <div key={idx} className="artifact-card">
@@ -222,7 +276,7 @@ function App() {
         return (
           <div className="exhibit">
             <h2>🦴 Fossilized Code</h2>
-            <div className="story-text">{stories.commented_code_story}</div>
+            <div className="story-text">{story('commented_code_story')}</div>
             <div className="artifacts-list">
               {artifacts.commented_code.map((item, idx) => (
                 <div key={idx} className="artifact-card">
@@ -241,7 +295,7 @@ function App() {
         return (
           <div className="exhibit">
             <h2>📜 The Scroll of Broken Promises</h2>
-            <div className="story-text">{stories.todos_story}</div>
+            <div className="story-text">{story('todos_story')}</div>
             <div className="artifacts-list">
               {artifacts.todos.map((item, idx) => (
                 <div key={idx} className="artifact-card">
@@ -260,13 +314,13 @@ function App() {
         return (
           <div className="exhibit">
             <h2>🏺 Ancient Relics</h2>
-            <div className="story-text">{stories.oldest_code_story}</div>
+            <div className="story-text">{story('oldest_code_story')}</div>
             <div className="artifacts-list">
               {artifacts.oldest_code.map((item, idx) => (
                 <div key={idx} className="artifact-card">
                   <div className="artifact-title">🗿 {item.file}</div>
                   <div className="artifact-detail">
-                    📅 First seen: {item.first_commit_date} ({item.age_days} days ago)
+                    📅 Line {item.line} first seen: {item.first_commit_date} ({item.age_days} days ago)
                   </div>
                   <div className="artifact-text">"{item.first_commit_message}"</div>
                 </div>
@@ -275,6 +329,21 @@ function App() {
                 <div className="empty-state">No ancient code found.</div>
               )}
             </div>
+            {artifacts.oldest_files.length > 0 && (
+              <>
+                <h3>📜 Founding Files</h3>
+                <div className="artifacts-list">
+                  {artifacts.oldest_files.map((item, idx) => (
+                    <div key={idx} className="artifact-card">
+                      <div className="artifact-title">🏛️ {item.file}</div>
+                      <div className="artifact-detail">
+                        📅 Added {item.introduced} in {item.commit} ({item.age_days} days ago)
+                      </div>
+                    </div>
+                  ))}
+                </div>
+              </>
+            )}
           </div>
         )
 
@@ -282,7 +351,7 @@ function App() {
         return (
           <div className="exhibit">
             <h2>🐉 Hall of Shame: Monstrous Functions</h2>
-            <div className="story-text">{stories.hall_of_shame_story}</div>
+            <div className="story-text">{story('hall_of_shame_story')}</div>
             <div className="artifacts-list">
               {artifacts.hall_of_shame.map((item, idx) => (
                 <div key={idx} className="artifact-card">
@@ -302,7 +371,7 @@ function App() {
         return (
           <div className="exhibit">
             <h2>🌡️ Complexity Heatmap</h2>
-            <div className="story-text">{stories.complexity_heatmap_story}</div>
+            <div className="story-text">{story('complexity_heatmap_story')}</div>
             <div className="heatmap-grid">
               {artifacts.complexity_heatmap.map((item, idx) => (
                 <div key={idx} className={`heatmap-card complexity-${item.level}`}>
@@ -324,6 +393,20 @@ function App() {
                       <span className="metric-icon">🪜</span>
                       <span className="metric-value">{item.max_depth} depth</span>
                     </div>
+                    {trend(item.file) && (
+                      <div className="metric">
+                        <span className="metric-icon">📈</span>
+                        <span className="metric-value">{trend(item.file)}</span>
+                      </div>
+                    )}
+                    {item.functions && item.functions.length > 0 && (
+                      <div className="metric">
+                        <span className="metric-icon">🧩</span>
+                        <span className="metric-value">
+                          {item.functions[0].name}() complexity {item.functions[0].complexity}
+                        </span>
+                      </div>
+                    )}
                   </div>
                   <div className={`complexity-badge badge-${item.level}`}>
                     {item.level.toUpperCase()}
@@ -337,6 +420,53 @@ function App() {
           </div>
         )
 
+      case 'hotspots':
+        return (
+          <div className="exhibit">
+            <h2>🔥 Hotspots: Complex and Always Changing</h2>
+            <div className="artifacts-list">
+              {artifacts.hotspots.map((item, idx) => (
+                <div key={idx} className="artifact-card">
+                  <div className="artifact-title">🔥 {item.file}</div>
+                  <div className="artifact-detail">
+                    🔁 {item.commits} commits (+{item.lines_added} / -{item.lines_removed}) by {item.authors} authors, last on {item.last_touched}
+                  </div>
+                  <div className="artifact-badge">
+                    Hotspot {item.score} · complexity {item.complexity} ({item.level})
+                  </div>
+                </div>
+              ))}
+              {artifacts.hotspots.length === 0 && (
+                <div className="empty-state">No hotspots found.</div>
+              )}
+            </div>
+          </div>
+        )
+
+      case 'duplicate_code':
+        return (
+          <div className="exhibit">
+            <h2>🪞 Copy-Paste Fossils</h2>
+            <div className="story-text">{story('duplicate_code_story')}</div>
+            <div className="artifacts-list">
+              {artifacts.duplicate_code.map((item, idx) => (
+                <div key={idx} className="artifact-card">
+                  <div className="artifact-title">🪞 {item.lines} lines, {item.copies} copies</div>
+                  {item.locations.map((location, i) => (
+                    <div key={i} className="artifact-detail">
+                      📁 {location.file}:{location.start_line}-{location.end_line}
+                    </div>
+                  ))}
+                  <div className="artifact-badge">{item.duplicated_lines} duplicated lines</div>
+                </div>
+              ))}
+              {artifacts.duplicate_code.length === 0 && (
+                <div className="empty-state">No copy-pasted code found.</div>
+              )}
+            </div>
+          </div>
+        )
+
       case 'timeline':
         return (
           <div className="exhibit">
@@ -454,7 +584,7 @@ function App() {
           </div>
         )}
 
-        {loading && (
+        {loading && !results && (
           <div className="loading">
             <div className="loading-spinner"></div>
             <div className="loading-text">
@@ -467,6 +597,12 @@ function App() {
 
         {results && (
           <div className="museum">
+            {loading && (
+              <div className="excavation-progress">
+                ⛏️ Still excavating... new finds appear as they are unearthed
+              </div>
+            )}
+
             <div className="museum-nav">
               <button
                 className={`nav-btn ${activeExhibit === 'summary' ? 'active' : ''}`}
@@ -510,6 +646,18 @@ function App() {
               >
                 🌡️ Heatmap
               </button>
+              <button
+                className={`nav-btn ${activeExhibit === 'hotspots' ? 'active' : ''}`}
+                onClick={() => handleExhibitChange('hotspots')}
+              >
+                🔥 Hotspots
+              </button>
+              <button
+                className={`nav-btn ${activeExhibit === 'duplicate_code' ? 'active' : ''}`}
+                onClick={() => handleExhibitChange('duplicate_code')}
+              >
+                🪞 Copy-Paste
+              </button>
               <button
                 className={`nav-btn ${activeExhibit === 'timeline' ? 'active' : ''}`}
                 onClick={() => handleExhibitChange('timeline')}